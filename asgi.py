@@ -0,0 +1,269 @@
+"""
+ASGI serving mode. Expressions posted to the index page and the API (except sessions, whose state lives
+in the server process) are evaluated on a pool of worker processes with a limited concurrency and a deadline;
+a worker running past the deadline is killed and replaced, the user gets an error message.
+All routes are served by the Flask application through a WSGI bridge.
+Run with any ASGI server, e.g.
+    uvicorn asgi:application
+or python asgi.py (uvicorn must be installed)
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+
+from calculator import app
+from metrics import metrics
+
+app.config.setdefault("EVALUATION_WORKERS", None)    # None means one process per core
+app.config.setdefault("EVALUATION_TIMEOUT", 5.0)     # Seconds
+
+
+def evaluate_expressions(connection, function=None):
+    """
+    The loop of a worker process: receives expressions (with keyword arguments, possibly other functions
+    to call and whether to collect metrics) and sends back results of function with the metrics collected
+    while computing them, so they are served by the server process
+    :param connection: end of a multiprocessing.Pipe
+    :param function: evaluate_infix if None
+    :return:
+    """
+    if function is None:
+        from engine import evaluate_infix as function
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        expression, job_function, kwargs, collect_metrics = message
+        metrics.enabled = collect_metrics
+        try:
+            result = (job_function or function)(expression, **kwargs)
+        except Exception as e:
+            result = -1, -1, "Something has gone terribly wrong: %s" % e, expression
+        connection.send((result, metrics.drain()))
+
+
+class PoolFailure(tuple):
+    # Result of an expression the pool failed to evaluate (busy, timed out or crashed worker),
+    # such results depend on the load of the server rather than on the expression and mustn't be cached
+    transient = True
+
+
+class Worker:
+    def __init__(self, context, function):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=evaluate_expressions, args=(child_connection, function), daemon=True)
+        self.process.start()
+        child_connection.close()
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
+
+
+class WorkerPool:
+    # Evaluates expressions in worker processes, a worker exceeding the deadline is killed
+    def __init__(self, workers=None, timeout=5.0, function=None, context=None):
+        """
+        :param workers: the number of processes, i.e. the number of expressions evaluated at once,
+        os.cpu_count() if None
+        :param timeout: seconds given to a request (including waiting for a free worker)
+        :param function: function evaluating an expression, must return a tuple like evaluate_infix,
+        evaluate_infix if None
+        :param context: multiprocessing context used to start workers
+        :return:
+        """
+        self.workers = workers if workers is not None else os.cpu_count()
+        if self.workers < 1:
+            raise ValueError("Number of workers must be positive")
+        self.timeout = timeout
+        self.function = function
+        self.context = context if context is not None else multiprocessing.get_context()
+        self.__slots = BoundedSemaphore(self.workers)
+        self.__idle = []
+        self.__lock = Lock()
+
+    def evaluate(self, expression, timeout=None, function=None, **kwargs):
+        """
+        :param expression: string (or any argument of function)
+        :param timeout: overrides the timeout of the pool if given
+        :param function: overrides the evaluating function of the pool if given, it is sent to a worker,
+        so it must be defined on the top level of a module (e.g. engine.evaluate_system)
+        :param kwargs: keyword arguments of the evaluating function, e.g. budget
+        :return: err_start, err_end, message, interpreted expression as evaluate_infix does,
+        a PoolFailure if the expression wasn't evaluated. Metrics collected by the worker are added to metrics
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        if not self.__slots.acquire(timeout=timeout):
+            metrics.count_error("Error: the server is busy, try again later.")
+            return PoolFailure((-1, -1, "Error: the server is busy, try again later.", expression))
+        try:
+            worker = self.__take_worker()
+            try:
+                worker.connection.send((expression, function, kwargs, metrics.enabled))
+                if worker.connection.poll(max(0., deadline - time.monotonic())):
+                    result, collected = worker.connection.recv()
+                    with self.__lock:
+                        self.__idle.append(worker)
+                    metrics.merge(collected)
+                    return result
+                message = "Error: evaluation took more than %g seconds and was cancelled." % timeout
+            except (EOFError, OSError):  # The worker died
+                message = "Something has gone terribly wrong"
+            # The next request gets a fresh worker
+            worker.kill()
+            metrics.count_error(message)
+            return PoolFailure((-1, -1, message, expression))
+        finally:
+            self.__slots.release()
+
+    def map(self, expressions, timeout=None, **kwargs):
+        """
+        Evaluates expressions on all workers at once, each of them with its own deadline
+        :param expressions: list of strings
+        :param timeout, kwargs: as evaluate takes them
+        :return: list of results as evaluate returns them, in the order of expressions
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(lambda expression: self.evaluate(expression, timeout, **kwargs), expressions))
+
+    def shutdown(self):
+        with self.__lock:
+            workers, self.__idle = self.__idle, []
+        for worker in workers:
+            worker.kill()
+
+    def __take_worker(self):
+        with self.__lock:
+            if self.__idle:
+                return self.__idle.pop()
+        return Worker(self.context, self.function)
+
+
+class ASGIApplication:
+    # Serves a WSGI application over ASGI, WSGI calls are run on threads
+    def __init__(self, wsgi_application, pool, threads=None):
+        """
+        :param wsgi_application: e.g. the Flask application
+        :param pool: WorkerPool given to the WSGI application as environ["calculator.worker_pool"]
+        :param threads: the number of requests handled at once, twice the number of workers if None
+        (so requests not evaluating anything aren't queued behind slow evaluations)
+        :return:
+        """
+        self.wsgi_application = wsgi_application
+        self.pool = pool
+        self.executor = ThreadPoolExecutor(max_workers=threads if threads is not None else 2 * pool.workers)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.__lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.__http(scope, receive, send)
+        else:
+            raise NotImplementedError("Only HTTP is supported")
+
+    async def __lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.pool.shutdown()
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def __http(self, scope, receive, send):
+        body = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+
+        environ = self.build_environ(scope, b"".join(body))
+        environ["calculator.worker_pool"] = self.pool
+        loop = asyncio.get_running_loop()
+        status, headers, content = await loop.run_in_executor(self.executor, self.call_wsgi, environ)
+        await send({"type": "http.response.start",
+                    "status": status,
+                    "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]})
+        await send({"type": "http.response.body", "body": content})
+
+    @staticmethod
+    def build_environ(scope, body):
+        """
+        :return: WSGI environment of an ASGI HTTP request
+        """
+        server = scope.get("server") or ("localhost", 80)
+        environ = {"REQUEST_METHOD": scope["method"],
+                   "SCRIPT_NAME": scope.get("root_path", ""),
+                   "PATH_INFO": scope["path"],
+                   "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+                   "SERVER_NAME": str(server[0]),
+                   "SERVER_PORT": str(server[1]),
+                   "SERVER_PROTOCOL": "HTTP/%s" % scope.get("http_version", "1.1"),
+                   "CONTENT_LENGTH": str(len(body)),
+                   "wsgi.version": (1, 0),
+                   "wsgi.url_scheme": scope.get("scheme", "http"),
+                   "wsgi.input": io.BytesIO(body),
+                   "wsgi.errors": sys.stderr,
+                   "wsgi.multithread": True,
+                   "wsgi.multiprocess": False,
+                   "wsgi.run_once": False}
+        if scope.get("client"):
+            environ["REMOTE_ADDR"] = scope["client"][0]
+        for name, value in scope.get("headers", []):
+            name, value = name.decode("latin-1").upper().replace("-", "_"), value.decode("latin-1")
+            if name == "CONTENT_LENGTH":
+                continue
+            if name != "CONTENT_TYPE":
+                name = "HTTP_" + name
+            environ[name] = environ[name] + "," + value if name in environ else value
+        return environ
+
+    def call_wsgi(self, environ):
+        """
+        :return: status code, list of headers, body
+        """
+        response = {}
+        content = []
+
+        def start_response(status, headers, exc_info=None):
+            response["status"], response["headers"] = status, headers
+            return content.append
+
+        iterable = self.wsgi_application(environ, start_response)
+        try:
+            content.extend(iterable)
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+        return int(response["status"].split()[0]), response["headers"], b"".join(content)
+
+
+application = ASGIApplication(app, WorkerPool(workers=app.config["EVALUATION_WORKERS"],
+                                              timeout=app.config["EVALUATION_TIMEOUT"]))
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="ASGI Server Help")
+    parser.add_argument("-p", "--port", dest="port",
+                        help="port of server (default:%(default)s)", type=int, default=5000)
+    cmd_args = parser.parse_args()
+    try:
+        import uvicorn
+    except ImportError:
+        parser.error("uvicorn is needed to run the ASGI server, any other ASGI server may be used instead")
+    uvicorn.run(application, port=cmd_args.port)
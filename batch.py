@@ -0,0 +1,185 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from threading import Lock
+
+from engine import evaluate_infix
+from postfixexpression import DEFAULT_BUDGET
+
+
+def result_to_dict(result):
+    """
+    Converts an output of evaluate_infix to a JSON serializable dictionary
+    :param result: tuple err_start, err_end, message, interpreted_expression
+    :return: {"expression": ..., "result": ...} or {"expression": ..., "error": {"message", "start", "end"}}
+    """
+    err_start, err_end, message, expression = result
+    if err_start is None:
+        return {"expression": expression, "result": message}
+    return {"expression": expression, "error": {"message": message, "start": err_start, "end": err_end}}
+
+
+def evaluate_chunk(expressions, budget=DEFAULT_BUDGET):
+    """
+    Evaluates a list of expressions (runs in worker processes)
+    :param expressions: list of strings
+    :param budget: a Budget applied to each expression
+    :return: list of dictionaries produced by result_to_dict, an expression which fails gives an error
+    instead of failing the whole batch
+    """
+    results = []
+    for expression in expressions:
+        try:
+            result = evaluate_infix(expression, budget)
+        except Exception as e:
+            result = -1, -1, "Something has gone terribly wrong: %s" % e, expression
+        results.append(result_to_dict(result))
+    return results
+
+
+class BatchEvaluator:
+    # Spreads evaluation of many expressions over a pool of processes
+    def __init__(self, workers=None, chunk_size=64, budget=DEFAULT_BUDGET):
+        """
+        :param workers: number of worker processes, os.cpu_count() if None,
+        0 means evaluation in the calling process
+        :param chunk_size: number of expressions sent to a worker at once
+        :param budget: a Budget applied to each expression
+        :return:
+        """
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be positive")
+        self.workers = os.cpu_count() if workers is None else workers
+        self.chunk_size = chunk_size
+        self.budget = budget
+        self.__executor = None
+        self.__lock = Lock()
+
+    def evaluate(self, expressions):
+        """
+        :param expressions: list of strings (expressions and equations)
+        :return: list of dictionaries produced by result_to_dict, in the order of expressions.
+        If a chunk kills its worker, its expressions get errors and the rest goes on
+        """
+        chunks = -(-len(expressions) // self.chunk_size)
+        if self.workers == 0 or chunks <= 1:
+            return evaluate_chunk(expressions, self.budget)
+        # All chunks are submitted at once, stream recovers from a worker killed by any of them
+        return list(self.stream(expressions, max_pending_chunks=chunks))
+
+    def stream(self, expressions, max_pending_chunks=None):
+        """
+        Evaluates expressions lazily, so an input of any size is processed in constant memory
+        :param expressions: iterable of strings (expressions and equations)
+        :param max_pending_chunks: number of chunks submitted to workers and not yet consumed,
+        twice the number of workers if None
+        :return: generator of dictionaries produced by result_to_dict, in the order of expressions.
+        If a chunk kills its worker, its expressions get errors and the rest goes on
+        """
+        expressions = iter(expressions)
+        if self.workers == 0:
+            while True:
+                chunk = list(islice(expressions, self.chunk_size))
+                if not chunk:
+                    return
+                yield from evaluate_chunk(chunk, self.budget)
+
+        max_pending_chunks = max_pending_chunks if max_pending_chunks is not None else 2 * self.workers
+        pending = deque()   # (chunk, future, whether the chunk was resubmitted)
+        while True:
+            while len(pending) < max_pending_chunks:
+                chunk = list(islice(expressions, self.chunk_size))
+                if not chunk:
+                    break
+                pending.append((chunk, self.__submit(chunk), False))
+            if not pending:
+                return
+            chunk, future, resubmitted = pending.popleft()
+            try:
+                results = future.result()
+            except BrokenProcessPool as e:
+                # Any chunk of the pool may have killed its worker, each of them is submitted again to a new pool
+                # when its turn comes, and a chunk failing twice gets errors
+                if not resubmitted:
+                    pending.appendleft((chunk, self.__submit(chunk), True))
+                    continue
+                results = [result_to_dict((-1, -1, "Something has gone terribly wrong: %s" % e, expression))
+                           for expression in chunk]
+            yield from results
+
+    def shutdown(self):
+        with self.__lock:
+            if self.__executor is not None:
+                self.__executor.shutdown()
+                self.__executor = None
+
+    def __submit(self, chunk):
+        try:
+            return self.__get_executor().submit(evaluate_chunk, chunk, self.budget)
+        except BrokenProcessPool:   # A worker died, the failures of its chunks are handled when they are consumed
+            self.shutdown()
+            return self.__get_executor().submit(evaluate_chunk, chunk, self.budget)
+
+    def __get_executor(self):
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self.__executor
+
+
+def evaluate_lines(source, target, evaluator, progress=None, interval=1.0):
+    """
+    Evaluates an expression on every line of source and writes results to target as JSON lines
+    (an empty line gives an error, so the n-th output line always belongs to the n-th input line)
+    :param source: file-like object opened for reading text
+    :param target: file-like object opened for writing text
+    :param evaluator: BatchEvaluator
+    :param progress: None or a file-like object receiving the throughput every interval seconds
+    :param interval: seconds
+    :return: number of lines evaluated
+    """
+    start = last_report = time.monotonic()
+    count = 0
+    for result in evaluator.stream(line.rstrip("\r\n") for line in source):
+        target.write(json.dumps(result) + "\n")
+        count += 1
+        if progress is not None:
+            now = time.monotonic()
+            if now - last_report >= interval:
+                last_report = now
+                progress.write("%d expressions, %.1f per second\n" % (count, count / (now - start)))
+                progress.flush()
+    if progress is not None:
+        elapsed = time.monotonic() - start
+        progress.write("%d expressions in %.2f seconds, %.1f per second\n" %
+                       (count, elapsed, count / elapsed if elapsed > 0 else 0.))
+    return count
+
+
+if __name__ == "__main__":
+    # The same as calculator.py --batch, but neither Flask nor the web application is imported
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Evaluates every line of a file and writes JSON lines to stdout")
+    parser.add_argument("file", nargs="?", default="-", help="file of expressions, '-' for stdin (default)")
+    parser.add_argument("--workers", dest="workers", type=int, default=None,
+                        help="number of processes (default: number of cores, 0: no processes)")
+    parser.add_argument("--chunk-size", dest="chunk_size", type=int, default=64,
+                        help="number of expressions sent to a process at once (default:%(default)s)")
+    parser.add_argument("--progress", action="store_true", dest="progress",
+                        help="report throughput to stderr", default=False)
+    cmd_args = parser.parse_args()
+
+    evaluator = BatchEvaluator(workers=cmd_args.workers, chunk_size=cmd_args.chunk_size)
+    try:
+        if cmd_args.file == "-":
+            evaluate_lines(sys.stdin, sys.stdout, evaluator, sys.stderr if cmd_args.progress else None)
+        else:
+            with open(cmd_args.file) as source:
+                evaluate_lines(source, sys.stdout, evaluator, sys.stderr if cmd_args.progress else None)
+    finally:
+        evaluator.shutdown()
@@ -0,0 +1,234 @@
+"""
+Compares the table-driven ExpressionChecker with the former checker dispatching states through PDA,
+and its single-pass parse with the former check followed by a separate Shunting-yard pass.
+Run from the repository root: python benchmarks/checkerbenchmark.py
+"""
+import os
+import re
+import sys
+import timeit
+from functools import partial
+from itertools import compress, count, islice
+from operator import eq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from expressionchecker import ExpressionChecker
+from pda import PDA
+from postfixexpression import PostfixExpression
+
+
+class LegacyExpressionChecker(PDA):
+    def __init__(self, operators, functions):
+        """
+        The checker as it was before the table-driven rewrite
+        It has three states: awaiting operand, awaiting operator and awaiting parenthesis (after function)
+        By now supports expressions with only variable
+        :param operators: a dictionary (operator_name: string, operator_function: function)
+        :param functions: a dictionary (function_name: string, function_body: function)
+        :return:
+        """
+        states = {"operator": self.__state_operator,
+                  "operand": self.__state_operand,
+                  "parenthesis": self.__state_parenthesis}
+        super().__init__(states, current_state="operand")
+
+        self.operators = operators
+        self.functions = functions
+        self.variable_name = ""
+
+    def consume_token_array(self, token_array):
+        """
+        Checks whether a string given belongs to the language recognized by a PDA
+        :param token_array:
+        :return: (None, None) if a string does belong and tuple (error string, token number) otherwise
+        if an error appears at the end of a token array, instead of token number -1 is returned
+        """
+
+        def nth_item(num, item, iterable):
+            indices = compress(count(), map(partial(eq, item), iterable))
+            return next(islice(indices, num, None), -1)
+
+        self.current_state = "operand"
+        self.stack = []
+        self.variable_name = ""
+
+        for i, token in enumerate(token_array):
+            if len(re.findall(r"[^A-Za-z0-9+~\-*/.,()]", token)) != 0:
+                raise ValueError("Unallowed character in token array: %s.", token)
+            if token.count(".") > 1:
+                return "Error: invalid number.", i
+            result = self.consume_token(token)
+            if result is not None:
+                return result, i
+        if self.current_state == "parenthesis":
+            return "Error: '(' is expected after a function name, but the end of the expression reached.", -1
+        if self.current_state == "operand":
+            return "Error: operand is expected, but the end of the expression reached.", -1
+        if len(self.stack) > 0:
+            if self.stack[-1] == "(":
+                n = token_array.count("(") - token_array.count(")") - 1
+                pos = nth_item(n, "(", token_array)
+                return "Error: unbalanced parentheses.", pos
+            elif self.stack[-1] == "A":
+                last_function_name, idx = "", -1
+                for i in range(1, len(self.stack) + 1):
+                    if self.stack[-i] in self.functions:
+                        last_function_name = self.stack[-i]
+                        idx = len(self.stack) - i - 1
+                        break
+                return "Error: wrong number of arguments for function %s." % last_function_name, idx
+        return None, None
+
+    def __state_operator(self, token):
+        if token in self.operators:
+            self.current_state = "operand"
+        elif token == ",":
+            if len(self.stack) == 0:
+                return "Error: ',' is put out of a function."
+            elif self.stack[-1] == "(":
+                if len(self.stack) > 1:
+                    if self.stack[-2] in self.functions:
+                        return "Error: wrong number of arguments for function %s." % self.stack[-2]
+                return "Error: ',' is put out of a function."
+            elif self.stack[-1] == "A":
+                self.stack.pop()
+                self.current_state = "operand"
+        elif token == ")":
+            if len(self.stack) == 0:
+                return "Error: unbalanced parentheses."
+            if self.stack[-1] == "A":
+                last_function = [token for token in self.stack[::-1] if token in self.functions][0]
+                return "Error: wrong number of arguments for function %s." % last_function
+            self.stack.pop()
+            if len(self.stack) > 0 and self.stack[-1] in self.functions:
+                self.stack.pop()
+        else:
+            return "Error: expected operator, but '%s' is given." % token
+
+    def __state_operand(self, token):
+        if token in self.functions:
+            if len(self.stack) > 0 and self.stack[-1] == "~":
+                self.stack.pop()
+            self.stack.append(token)
+            self.stack.append("(")
+            for _ in range(self.functions[token].__code__.co_argcount - 1):
+                self.stack.append("A")
+            self.current_state = "parenthesis"
+        elif token.replace(".", "").isalnum():
+            if token.isalpha():
+                if self.variable_name == "":
+                    self.variable_name = token
+                else:
+                    if token != self.variable_name:
+                        return "Error: several names for variable: %s and %s." % (self.variable_name, token)
+            if len(self.stack) > 0 and self.stack[-1] == "~":
+                self.stack.pop()
+            self.current_state = "operator"
+        elif token == "~":
+            if len(self.stack) > 0 and self.stack[-1] == "~":
+                return "Error: two unary '-' found for one operand."
+            self.stack.append("~")
+        elif token == "(":
+            self.stack.append("(")
+        else:
+            return "Error: expected operand, but '%s' is given." % token
+
+    def __state_parenthesis(self, token):
+        if token == "(":
+            self.current_state = "operand"
+        else:
+            return "Error: '(' is expected after a function name, but '%s' is given." % token
+
+
+
+def legacy_convert_to_postfix(token_array, token_places, operators, functions, operator_precedences):
+    # Shunting-yard algorithm as it was run after the check
+    result = []
+    stack = []
+    postfix_places = []
+    token_places_stack = []
+    for token, token_place in zip(token_array, token_places):
+        if token.replace(".", "").isalnum() and token not in functions:
+            result.append(token)
+            postfix_places.append(token_place)
+
+        elif token in operators:
+            while len(stack) > 0 and stack[-1] in operators and \
+                            operator_precedences[token] <= operator_precedences[stack[-1]]:
+                result.append(stack.pop())
+                postfix_places.append(token_places_stack.pop())
+            stack.append(token)
+            token_places_stack.append(token_place)
+
+        elif token in functions:
+            stack.append(token)
+            token_places_stack.append(token_place)
+
+        elif token == "(":
+            stack.append(token)
+            token_places_stack.append(token_place)
+
+        elif token == ")":
+            while len(stack) > 0 and stack[-1] != "(":
+                result.append(stack.pop())
+                postfix_places.append(token_places_stack.pop())
+            stack.pop()  # Get rid of left parenthesis
+            token_places_stack.pop()
+            if len(stack) > 0 and stack[-1] in functions:
+                result.append(stack.pop())
+                postfix_places.append(token_places_stack.pop())
+
+        elif token == ",":
+            while len(stack) > 0 and stack[-1] != "(":
+                result.append(stack.pop())
+                postfix_places.append(token_places_stack.pop())
+
+    while len(stack) > 0:
+        result.append(stack.pop())
+        postfix_places.append(token_places_stack.pop())
+    return result, postfix_places
+
+
+def legacy_front_end(checker, tokens, token_places, precedences):
+    result, error_place = checker.consume_token_array(tokens)
+    if result is not None:
+        return [], [], result, error_place
+    return legacy_convert_to_postfix(tokens, token_places, checker.operators, checker.functions,
+                                     precedences) + (None, None)
+
+
+def main(length=10000, repeat=5, number=20):
+    expression = PostfixExpression("0")
+    operators, functions = expression.operators, expression.functions
+    inputs = {"arithmetic": ["3", "*", "(", "2.5", "+", "41", ")", "/", "7", "-", "~", "2",
+                             "+"] * (length // 13) + ["1"],
+              "functions": ["2", "*", "log", "(", "2", ",", "x", ")", "-", "ln", "(", "3", ")", "*", "4", "*", "x",
+                            "+"] * (length // 18) + ["1"],
+              "error at the end": ["x", "+"] * (length // 2) + ["y"]}
+
+    precedences = expression.operator_precedences
+    legacy_checker = LegacyExpressionChecker(operators, functions)
+    checker = ExpressionChecker(operators, functions, precedences)
+    print("%-25s %12s %12s %8s" % ("input (%d tokens)" % length, "legacy, ms", "table, ms", "speedup"))
+    for name, tokens in inputs.items():
+        assert legacy_checker.consume_token_array(tokens) == checker.consume_token_array(tokens)
+        legacy = min(timeit.repeat(lambda: legacy_checker.consume_token_array(tokens),
+                                   repeat=repeat, number=number)) / number
+        table = min(timeit.repeat(lambda: checker.consume_token_array(tokens), repeat=repeat, number=number)) / number
+        print("%-25s %12.3f %12.3f %7.1fx" % (name, legacy * 1000, table * 1000, legacy / table))
+
+    print()
+    print("%-25s %12s %12s %8s" % ("check and postfix", "two passes", "parse, ms", "speedup"))
+    for name, tokens in inputs.items():
+        places = [(i, i) for i in range(len(tokens))]
+        legacy_result = legacy_front_end(legacy_checker, tokens, places, precedences)
+        result = checker.parse(tokens, places)
+        assert legacy_result[2:] == result[2:] and (result[2] is not None or legacy_result == result)
+        legacy = min(timeit.repeat(lambda: legacy_front_end(legacy_checker, tokens, places, precedences),
+                                   repeat=repeat, number=number)) / number
+        single = min(timeit.repeat(lambda: checker.parse(tokens, places), repeat=repeat, number=number)) / number
+        print("%-25s %12.3f %12.3f %7.1fx" % (name, legacy * 1000, single * 1000, legacy / single))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares the single-pass tokenizer of PostfixExpression with the former regular expression chain.
+Run from the repository root: python benchmarks/lexerbenchmark.py
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from postfixexpression import PostfixExpression
+
+FUNCTIONS = ("log", "ln")
+
+
+def legacy_tokenize(expr):
+    # The tokenizer as it was before the single-pass rewrite
+    result = expr.replace(" ", "")
+    match = re.finditer(r'([A-Za-z]+)\(', result)
+    for m in match:
+        if m.group(0)[:-1] not in FUNCTIONS:
+            result = result[:m.end() - 1] + "*" + result[m.end() - 1:]
+
+    result = re.sub(r'((?<=\d)([A-Za-z(]))', r'*\1', result)
+    result = re.sub(r'(^|\(|,)-([A-Za-z0-9])', r'\1~\2', result)
+    result = re.sub(r'([(),*/+=~-])', r' \1 ', result)
+    result = re.sub(r'([A-Za-z]+)', r' \1 ', result)
+    result = re.sub(r'(\s{2,})', r' ', result)
+    result = result.split()
+    interpreted_expression = "".join(result).replace("~", "-")
+    start_pos = 0
+
+    token_places = []
+    for token in result:
+        end_pos = start_pos + len(token) - 1
+        token_places.append((start_pos, end_pos))
+        start_pos = end_pos + 1
+    return result, token_places, interpreted_expression
+
+
+def make_input(pattern, length):
+    return (pattern * (length // len(pattern) + 1))[:length]
+
+
+def main(length=10000, repeat=5, number=20):
+    tokenize = PostfixExpression("0")._PostfixExpression__tokenize
+    inputs = {"arithmetic": make_input("3*(2.5 + 41) / 7 - -2 + ", length),
+              "functions": make_input("2log(2, 8) - ln(3) * 4x + ", length),
+              "implicit multiplication": make_input("2x(x + 1) - ", length)}
+
+    print("%-25s %12s %12s %8s" % ("input (%d chars)" % length, "legacy, ms", "single, ms", "speedup"))
+    for name, expr in inputs.items():
+        legacy = min(timeit.repeat(lambda: legacy_tokenize(expr), repeat=repeat, number=number)) / number
+        single = min(timeit.repeat(lambda: tokenize(expr), repeat=repeat, number=number)) / number
+        print("%-25s %12.3f %12.3f %7.1fx" % (name, legacy * 1000, single * 1000, legacy / single))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Drives the web application with a weighted mix of expressions, equations and erroneous inputs
+at a target request rate and reports throughput, latency percentiles, error rates and the slowest inputs.
+The application is run in-process through the Flask test client, or a running server is given by --url.
+Run from the repository root:
+    python benchmarks/loadtest.py --rate 200 --duration 10 --output load.json
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --rate 50 --baseline load.json
+Requests are sent on schedule whether or not earlier ones have finished, and latencies are measured
+from the scheduled time, so a server falling behind shows up in the percentiles instead of lowering the rate.
+The exit code is 1 if any percentile regressed by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from suite import random_expression
+
+DEFAULT_WEIGHTS = {"expressions": 0.5, "equations": 0.3, "systems": 0.05, "errors": 0.15}
+PERCENTILES = (50, 95, 99)
+MISTAKE_MARKER = b'id="mistake"'    # Pages explaining an error of the input contain it
+
+
+def generate_corpus(seed=0, size=100):
+    """
+    Generates groups of inputs a user may send
+    :param seed: the corpus depends only on the seed and the size
+    :param size: the number of inputs in a group
+    :return: a dictionary (group name: list of strings)
+    """
+    rng = random.Random(seed)
+
+    def equation():
+        if rng.random() < 0.5:     # Linear and quadratic equations are the most common ones
+            return "%dx %s %d = %s" % (rng.randint(1, 9), rng.choice("+-"), rng.randint(0, 99),
+                                       random_expression(rng, 1))
+        return "%s = %s" % (random_expression(rng, 3), random_expression(rng, 2))
+
+    def system():
+        names = rng.sample("xyzuvw", rng.randint(2, 4))
+        return "; ".join(" + ".join("%d%s" % (rng.randint(1, 9), name) for name in names) +
+                         " = %d" % rng.randint(0, 99) for _ in names)
+
+    def error():
+        expression = random_expression(rng, 3)
+        choice = rng.random()
+        if choice < 0.2:
+            return "(" + expression
+        elif choice < 0.4:
+            return expression + " +"
+        elif choice < 0.6:
+            return expression + " / 0"
+        elif choice < 0.8:
+            return expression + " ? 1"
+        return "x = %s = 1" % expression
+
+    def expression():
+        # Expressions with a variable are equations without '=' for the calculator, so it is replaced
+        return random_expression(rng, rng.randint(1, 6)).replace("x", "(%d)" % rng.randint(1, 9))
+
+    return {"expressions": [expression() for _ in range(size)],
+            "equations": [equation() for _ in range(size)],
+            "systems": [system() for _ in range(size)],
+            "errors": [error() for _ in range(size)]}
+
+
+def schedule(corpus, weights, count, seed=0):
+    """
+    :param weights: a dictionary (group name: weight), groups are chosen with these probabilities,
+    popular inputs of a group are chosen more often (Zipf's law), as real traffic repeats itself
+    :return: list of (group name, input) in the order they are sent
+    """
+    rng = random.Random(seed)
+    groups = [group for group in weights if weights[group] > 0 and corpus.get(group)]
+    if not groups:
+        raise ValueError("No group of the corpus has a positive weight")
+    popularity = {group: [1. / rank for rank in range(1, len(corpus[group]) + 1)] for group in groups}
+    chosen = rng.choices(groups, [weights[group] for group in groups], k=count)
+    return [(group, rng.choices(corpus[group], popularity[group])[0]) for group in chosen]
+
+
+class InProcessTarget:
+    # Sends requests through Flask test clients, one for every thread
+    def __init__(self, route="post"):
+        from calculator import app
+        self.app = app
+        self.route = route
+        self.local = threading.local()
+
+    def send(self, expression):
+        """
+        :return: tuple (HTTP status, body)
+        """
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        if self.route == "get":
+            response = client.get("/evaluate", query_string={"expression": expression})
+        else:
+            response = client.post("/", data={"expression": expression})
+        return response.status_code, response.get_data()
+
+
+class HTTPTarget:
+    # Sends requests to a running server
+    def __init__(self, url, route="post", timeout=30.):
+        self.url = url.rstrip("/")
+        self.route = route
+        self.timeout = timeout
+
+    def send(self, expression):
+        query = urllib.parse.urlencode({"expression": expression})
+        if self.route == "get":
+            request = urllib.request.Request(self.url + "/evaluate?" + query)
+        else:
+            request = urllib.request.Request(self.url + "/", data=query.encode())
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def percentile(sorted_values, p):
+    """
+    :return: the p-th percentile (nearest rank) of a sorted list, None if it is empty
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def run_load(target, requests, rate=0., concurrency=16):
+    """
+    Sends the requests and measures them
+    :param target: InProcessTarget or HTTPTarget
+    :param requests: list of (group name, input)
+    :param rate: requests per second, 0 means as fast as the workers manage (each sends the next request
+    when the previous one is answered)
+    :param concurrency: the number of requests in flight at most
+    :return: tuple (list of samples (group, input, latency in seconds, status), wall time in seconds)
+    where status is "ok", "invalid" (the calculator explained an error of the input),
+    "http <code>" or the name of an exception
+    """
+    samples = [None] * len(requests)
+    slots = threading.BoundedSemaphore(concurrency)     # Workers free to send the next request (closed loop)
+
+    def send(i, scheduled):
+        group, expression = requests[i]
+        try:
+            code, body = target.send(expression)
+            status = "http %d" % code if code >= 400 else "invalid" if MISTAKE_MARKER in body else "ok"
+        except Exception as e:
+            status = type(e).__name__
+        samples[i] = (group, expression, time.perf_counter() - scheduled, status)
+        if rate <= 0:
+            slots.release()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i in range(len(requests)):
+            if rate > 0:
+                scheduled = start + i / rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                slots.acquire()
+                scheduled = time.perf_counter()
+            executor.submit(send, i, scheduled)
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, wall_time, slowest=10):
+    """
+    :return: a JSON serializable dictionary with throughput, latency percentiles (in milliseconds),
+    counts of statuses and the slowest inputs, overall and for every group
+    """
+    def latencies(part):
+        values = sorted(sample[2] * 1000 for sample in part)
+        summary = {"p%d_ms" % p: percentile(values, p) for p in PERCENTILES}
+        summary["max_ms"] = values[-1] if values else None
+        summary["mean_ms"] = sum(values) / len(values) if values else None
+        return summary
+
+    def statuses(part):
+        counts = {}
+        for sample in part:
+            counts[sample[3]] = counts.get(sample[3], 0) + 1
+        return counts
+
+    failed = sum(1 for sample in samples if sample[3] not in ("ok", "invalid"))
+    groups = {}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+    return {"requests": len(samples),
+            "seconds": wall_time,
+            "throughput_rps": len(samples) / wall_time if wall_time > 0 else None,
+            "failure_rate": failed / len(samples) if samples else 0.,
+            "latency": latencies(samples),
+            "statuses": statuses(samples),
+            "groups": {group: dict(latencies(part), requests=len(part), statuses=statuses(part))
+                       for group, part in sorted(groups.items())},
+            "slowest": [{"group": group, "input": expression, "ms": latency * 1000, "status": status}
+                        for group, expression, latency, status in
+                        sorted(samples, key=lambda sample: -sample[2])[:slowest]]}
+
+
+def run(target, seed=0, size=100, rate=0., duration=None, count=1000, concurrency=16, weights=None,
+        warmup=0):
+    """
+    :param duration: seconds the load lasts (at the given rate), overrides count
+    :param warmup: the number of requests sent (and not measured) before the run
+    :return: a JSON serializable dictionary
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    if duration is not None and rate > 0:
+        count = max(1, int(duration * rate))
+    corpus = generate_corpus(seed, size)
+    if warmup:
+        run_load(target, schedule(corpus, weights, warmup, seed + 1), 0., concurrency)
+    samples, wall_time = run_load(target, schedule(corpus, weights, count, seed), rate, concurrency)
+    return {"meta": {"seed": seed, "size": size, "rate": rate, "concurrency": concurrency, "weights": weights,
+                     "target": getattr(target, "url", "in-process"), "route": target.route,
+                     "python": platform.python_version(), "platform": platform.platform(),
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": summarize(samples, wall_time)}
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    :param threshold: the relative growth of a latency percentile reported as a regression
+    :return: list of names of regressed percentiles
+    """
+    regressions = []
+    print("%-16s %12s %12s %9s" % ("metric", "baseline", "current", "change"))
+    for name in ["p%d_ms" % p for p in PERCENTILES]:
+        old, new = baseline["results"]["latency"][name], results["results"]["latency"][name]
+        if old is None or new is None:
+            continue
+        change = new / old - 1 if old > 0 else 0.
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print("%-16s %12.2f %12.2f %+8.1f%%%s" % (name, old, new, change * 100, flag))
+    for name in ("throughput_rps", "failure_rate"):
+        old, new = baseline["results"][name], results["results"][name]
+        print("%-16s %12.3f %12.3f" % (name, old or 0., new or 0.))
+    return regressions
+
+
+def report(results):
+    summary = results["results"]
+    print("%d requests in %.2f s, %.1f requests/s, %.2f%% failed" %
+          (summary["requests"], summary["seconds"], summary["throughput_rps"] or 0., summary["failure_rate"] * 100))
+    print("%-12s %8s %9s %9s %9s %9s" % ("group", "requests", "p50, ms", "p95, ms", "p99, ms", "max, ms"))
+    rows = list(summary["groups"].items()) + [("all", dict(summary["latency"], requests=summary["requests"]))]
+    for group, part in rows:
+        print("%-12s %8d %9.2f %9.2f %9.2f %9.2f" % (group, part["requests"], part["p50_ms"], part["p95_ms"],
+                                                     part["p99_ms"], part["max_ms"]))
+    print("statuses: " + ", ".join("%s %d" % item for item in sorted(summary["statuses"].items())))
+    print("slowest inputs:")
+    for sample in summary["slowest"]:
+        print("%9.2f ms  %-8s %-10s %s" % (sample["ms"], sample["status"], sample["group"], sample["input"][:80]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the web application.")
+    parser.add_argument("--url", help="address of a running server (default: the application is run in-process)")
+    parser.add_argument("--route", choices=("post", "get"), default="post",
+                        help="POST to the index page or GET /evaluate (default:%(default)s)")
+    parser.add_argument("--rate", type=float, default=0.,
+                        help="requests per second (default: as fast as possible)")
+    parser.add_argument("--duration", type=float, help="seconds of load at the given rate (overrides --requests)")
+    parser.add_argument("--requests", type=int, default=1000, help="number of requests (default:%(default)s)")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight at most (default:%(default)s)")
+    parser.add_argument("--warmup", type=int, default=100, help="requests sent before measuring (default:%(default)s)")
+    parser.add_argument("--weight", action="append", default=[], metavar="GROUP=WEIGHT",
+                        help="weight of a group of the corpus (%s), may be repeated" % ", ".join(DEFAULT_WEIGHTS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, default=100, help="number of inputs in a group of the corpus")
+    parser.add_argument("--output", help="file the JSON results are written to")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in args.weight:
+        group, _, weight = item.partition("=")
+        if group not in weights:
+            parser.error("unknown group %s" % group)
+        weights[group] = float(weight)
+
+    target = HTTPTarget(args.url, args.route) if args.url else InProcessTarget(args.route)
+    results = run(target, args.seed, args.size, args.rate, args.duration, args.requests, args.concurrency,
+                  weights, args.warmup)
+    report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"]["seed"] != args.seed or baseline["meta"]["weights"] != weights:
+            print("Warning: the baseline was measured on another mix of inputs.")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
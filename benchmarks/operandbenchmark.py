@@ -0,0 +1,65 @@
+"""
+Times multiplication of polynomials of various degrees with Operand and with the former list-based
+schoolbook implementation (only for degrees where it finishes in reasonable time).
+Run from the repository root: python benchmarks/operandbenchmark.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from operand import Operand
+
+LEGACY_MAX_DEGREE = 1000
+
+
+def legacy_multiply(first, second):
+    # Operand.__mul__ as it was before coefficients moved to arrays
+    result = [0] * (len(first) + len(second) - 1)
+    for i, term in enumerate(first):
+        tmp_poly = [0] * i + \
+                   [t * term for t in second] + \
+                   [0] * (len(result) - len(second))
+
+        result = [r + t for r, t in zip(result, tmp_poly)]
+    while len(result) > 1 and result[-1] == 0:
+        result.pop()
+    return result
+
+
+def measure(function, min_time=0.2):
+    timer = timeit.Timer(function)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / elapsed))
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def main(degrees=(10, 100, 1000, 10000, 100000)):
+    random.seed(0)
+    print("%-8s %14s %14s %8s" % ("degree", "Operand, ms", "legacy, ms", "speedup"))
+    for degree in degrees:
+        first = [random.randint(-9, 9) for _ in range(degree + 1)]
+        second = [random.randint(-9, 9) for _ in range(degree + 1)]
+        first_operand, second_operand = Operand(first), Operand(second)
+        current = measure(lambda: first_operand * second_operand)
+        if degree <= LEGACY_MAX_DEGREE:
+            legacy = measure(lambda: legacy_multiply(first, second))
+            print("%-8d %14.3f %14.3f %7.1fx" % (degree, current * 1000, legacy * 1000, legacy / current))
+        else:
+            print("%-8d %14.3f %14s %8s" % (degree, current * 1000, "-", "-"))
+
+    factor = Operand([1, 1])
+
+    def product_of_linear_factors():
+        result = Operand([1])
+        for _ in range(1000):
+            result = result * factor
+        return result
+
+    print("(x+1)*(x+1)*...*(x+1), 1000 factors: %.1f ms" % (measure(product_of_linear_factors, min_time=0) * 1000))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Times every stage of the calculator on a reproducible corpus and writes the results as JSON.
+Run from the repository root:
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --baseline results.json   # flags stages which became slower
+The exit code is 1 if any stage regressed by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from calculator import app, evaluate_infix
+from expressionchecker import ExpressionChecker
+from operand import Operand
+from polynomialsolver import PolynomialSolver
+from postfixexpression import PostfixExpression, plan_cache
+
+
+def random_leaf(rng, variable):
+    choice = rng.random()
+    if choice < 0.4:
+        return str(rng.randint(0, 100))
+    elif choice < 0.6:
+        return "%.2f" % rng.uniform(0, 100)
+    elif choice < 0.8:
+        return variable
+    return "%d%s" % (rng.randint(2, 9), variable)  # Implicit multiplication
+
+
+def random_expression(rng, depth, function_density=0.1, variable="x"):
+    """
+    :param rng: random.Random
+    :param depth: the maximal nesting depth
+    :param function_density: the probability of a function call at every node
+    :param variable: the name of the variable
+    :return: string
+    """
+    if depth == 0 or rng.random() < 0.25:
+        return random_leaf(rng, variable)
+    choice = rng.random()
+    if choice < function_density:
+        if rng.random() < 0.5:
+            return "ln(%s)" % random_expression(rng, depth - 1, function_density, variable)
+        return "log(%s, %s)" % (random_leaf(rng, variable),
+                                random_expression(rng, depth - 1, function_density, variable))
+    elif choice < function_density + 0.15:
+        return "(%s)" % random_expression(rng, depth - 1, function_density, variable)
+    elif choice < function_density + 0.2:
+        return "(-%s)" % random_expression(rng, depth - 1, function_density, variable)
+    return "%s %s %s" % (random_expression(rng, depth - 1, function_density, variable),
+                         rng.choice("+-*/"),
+                         random_expression(rng, depth - 1, function_density, variable))
+
+
+def generate_corpus(seed=0, size=50):
+    """
+    Generates groups of expressions of various shapes
+    :param seed: the corpus depends only on the seed and the size
+    :param size: the number of expressions in a group
+    :return: a dictionary (group name: list of strings)
+    """
+    rng = random.Random(seed)
+
+    def long_sum(length):
+        terms = []
+        while sum(map(len, terms)) < length:
+            terms.append(random_expression(rng, 2))
+        return " + ".join(terms)
+
+    def equation():
+        left, right = random_expression(rng, 3), random_expression(rng, 2)
+        return "%s = %s" % (left, right)
+
+    return {"short": [random_expression(rng, 2) for _ in range(size)],
+            "nested": [random_expression(rng, 8) for _ in range(size)],
+            "functions": [random_expression(rng, 4, function_density=0.5) for _ in range(size)],
+            "long": [long_sum(length) for length in (100, 1000, 10000) for _ in range(max(1, size // 10))],
+            "equations": [equation() for _ in range(size)]}
+
+
+def random_polynomial(rng, degree):
+    return [float(rng.randint(-9, 9)) for _ in range(degree)] + [float(rng.randint(1, 9))]
+
+
+def prepare_stages(corpus, seed=0):
+    """
+    :return: a dictionary (stage name: (function running the stage on the whole workload, number of items))
+    """
+    rng = random.Random(seed)
+    expressions = [expression for group in corpus.values() for expression in group if "=" not in expression]
+    everything = [expression for group in corpus.values() for expression in group]
+
+    host = PostfixExpression("0")
+    tokenize = host._PostfixExpression__tokenize
+    fold_constants = host._PostfixExpression__fold_constants
+    process_plan = host._PostfixExpression__process_plan
+    parser = ExpressionChecker(host.operators, host.functions, host.operator_precedences)
+
+    tokenized = []
+    for expression in expressions:
+        tokens = tokenize(expression)
+        tokenized.append((tokens, host.token_places))
+    parsed = [parser.parse(tokens, places)[:2] for tokens, places in tokenized]
+    parsed = [(postfix, places) for postfix, places in parsed if postfix]
+    plans = [host.compile(expression) for expression in expressions]
+    plans = [plan for plan in plans if plan.error_msg is None]
+    # Plans without programs are always interpreted, the others are compiled (if they evaluate without errors)
+    # before timing
+    interpreted_plans = [plan._replace(program=None) for plan in plans]
+    for plan in plans:
+        for _ in range(plan.program.threshold):
+            process_plan(plan)
+
+    def run_fold():
+        for postfix, places in parsed:
+            host.token_places = places
+            fold_constants(postfix)
+
+    def run_evaluation(plans):
+        for plan in plans:
+            host.varname = None
+            process_plan(plan)
+
+    factors = [(Operand(random_polynomial(rng, degree)), Operand(random_polynomial(rng, degree)))
+               for degree in (3, 10, 100, 1000) for _ in range(5)]
+    divisions = [(x * y, y) for x, y in factors]
+
+    def run_operand():
+        for x, y in factors:
+            x + y, x - y, x * y
+        for x, y in divisions:
+            divmod(x, y)
+
+    polynomials = [random_polynomial(rng, degree) for degree in (1, 2, 3, 5, 10, 50, 200) for _ in range(5)]
+
+    def run_evaluate_infix():
+        plan_cache.clear()  # Every expression is compiled from scratch
+        for expression in everything:
+            evaluate_infix(expression)
+
+    client = app.test_client()
+
+    def run_flask():
+        plan_cache.clear()
+        for expression in everything:
+            client.post("/", data={"expression": expression})
+
+    return {"tokenize": (lambda: [tokenize(expression) for expression in expressions], len(expressions)),
+            "parse": (lambda: [parser.parse(tokens, places) for tokens, places in tokenized], len(tokenized)),
+            "fold_constants": (run_fold, len(parsed)),
+            "evaluate_interpreted": (lambda: run_evaluation(interpreted_plans), len(interpreted_plans)),
+            "evaluate_compiled": (lambda: run_evaluation(plans), len(plans)),
+            "operand": (run_operand, 3 * len(factors) + len(divisions)),
+            "polynomial_solver": (lambda: [PolynomialSolver.solve(p) for p in polynomials], len(polynomials)),
+            "evaluate_infix": (run_evaluate_infix, len(everything)),
+            "flask_round_trip": (run_flask, len(everything))}
+
+
+def run(seed=0, size=50, repeat=5, stages=None):
+    """
+    Times the stages, every stage is run repeat times and the best time is taken
+    :return: a JSON serializable dictionary
+    """
+    corpus = generate_corpus(seed, size)
+    results = {}
+    for name, (function, items) in prepare_stages(corpus, seed).items():
+        if stages and name not in stages:
+            continue
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        results[name] = {"seconds": best, "items": items, "per_item_us": best / max(items, 1) * 1e6}
+    return {"meta": {"seed": seed, "size": size, "repeat": repeat,
+                     "corpus": {group: len(expressions) for group, expressions in corpus.items()},
+                     "python": platform.python_version(), "platform": platform.platform(),
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "stages": results}
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    :param threshold: the relative slowdown reported as a regression
+    :return: list of names of regressed stages
+    """
+    regressions = []
+    print("%-20s %14s %14s %9s" % ("stage", "baseline, us", "current, us", "change"))
+    for name, stage in results["stages"].items():
+        if name not in baseline["stages"]:
+            print("%-20s %14s %14.1f" % (name, "-", stage["per_item_us"]))
+            continue
+        old = baseline["stages"][name]["per_item_us"]
+        change = stage["per_item_us"] / old - 1 if old > 0 else 0.
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print("%-20s %14.1f %14.1f %+8.1f%%%s" % (name, old, stage["per_item_us"], change * 100, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks every stage of the calculator.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, default=50, help="number of expressions in a group of the corpus")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stage", action="append", help="run only the stage given (may be repeated)")
+    parser.add_argument("--output", help="file the JSON results are written to")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    results = run(args.seed, args.size, args.repeat, args.stage)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"]["seed"] != args.seed or baseline["meta"]["size"] != args.size:
+            print("Warning: the baseline was measured on another corpus.")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+    else:
+        print("%-20s %8s %14s" % ("stage", "items", "per item, us"))
+        for name, stage in results["stages"].items():
+            print("%-20s %8d %14.1f" % (name, stage["items"], stage["per_item_us"]))
+
+if __name__ == "__main__":
+    main()
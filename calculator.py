@@ -1,93 +1,234 @@
-from flask import Flask, render_template, request
+import hashlib
+import math
+import uuid
+from threading import Lock
 
-from equations import Equations
-from postfixexpression import *
-from polynomialsolver import *
+import numpy
+from flask import Flask, Response, jsonify, render_template, request
+
+from batch import BatchEvaluator, result_to_dict
+from engine import evaluate_infix, evaluate_system
+from lrucache import LRUCache
+from metrics import metrics
+from postfixexpression import DEFAULT_BUDGET, Budget, PostfixExpression
+from vectorized import evaluate_array
 
 app = Flask(__name__)
+app.config.setdefault("BATCH_WORKERS", None)        # None means one process per core
+app.config.setdefault("BATCH_CHUNK_SIZE", 64)
+app.config.setdefault("BATCH_MAX_SIZE", 100000)
+app.config.setdefault("EVALUATION_BUDGET", DEFAULT_BUDGET)   # Limits of the work one expression may cause
+app.config.setdefault("SYSTEM_MAX_EQUATIONS", 10000)
+app.config.setdefault("SESSIONS_MAX", 10000)   # Incremental sessions kept, the least recently used are dropped
+app.config.setdefault("SESSION_MAX_LENGTH", 1000)   # Characters of an expression a session accepts
+# Sessions are evaluated in the server process even in ASGI mode, so their work is kept small instead of limited in time
+app.config.setdefault("SESSION_BUDGET", Budget(max_tokens=1000, max_depth=100, max_degree=100,
+                                               max_coefficients=10000))
+app.config.setdefault("RESPONSES_MAX", 4096)   # Pages rendered by /evaluate kept in memory
+app.config.setdefault("RESPONSES_MAX_BYTES", 64 * 2 ** 20)   # Their total size (expressions and pages)
+app.config.setdefault("RESPONSE_MAX_AGE", 3600)    # Seconds browsers and proxies may reuse a page of /evaluate
+
+batch_evaluator = None
+sessions = None     # LRUCache of (Lock, PostfixExpression in incremental mode) keyed by session ids
+responses = None    # LRUCache of (page, ETag) keyed by normalized expressions and budgets
 
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'GET':
-        return render_template('index.html')
+        return render_index()
     elif request.method == 'POST':
-        err_start, err_end, message, expression = evaluate_infix(request.form['expression'])
-        if err_start is None:
-            return render_template('index.html', solution=message, expression=expression)
-        else:
-            if err_start != -1:
-                return render_template('index.html',
-                                       explanation=message,
-                                       before_mistake=expression[:err_start],
-                                       mistake=expression[err_start:err_end + 1],
-                                       after_mistake=expression[err_end + 1:])
-            else:
-                return render_template('index.html',
-                                       explanation=message,
-                                       before_mistake=expression,
-                                       mistake="",
-                                       after_mistake="")
-
-
-def evaluate_infix(expression):
-    """
-    The highest level function for evaluation of expressions
-    :param expression: string representing an infix expression
-    :return: err_start, err_end, message, interpreted expression in case of any error,
-    None, None, solution, interpreted_expression otherwise
-    """
-    pat_unallowed = re.compile(r'([^A-Za-z0-9+\-*/=.,\s()])')
-    if len(pat_unallowed.findall(expression)) > 0:
-        pos = next(pat_unallowed.finditer(expression)).start()
-        return pos, pos, "Unallowed symbol detected: %s" % expression[pos], expression
-
-    if "=" in expression:  # Solve an equation
-        if expression.count("=") > 1:
-            pos = expression.index("=") + expression[expression.index("=") + 1:].index("=") + 1
-            return pos, pos, "More than one '=' symbols in expression can't be interpreted", expression
-
-        result = Equations.solve(*expression.split("="))
-        if len(result) == 4:
-            return result
-        else:
-            try:
-                varname = result[0]
-                polynomial = result[1]
-                interpreted_expression = result[2]
-            except (TypeError, IndexError):
-                return -1, -1, "Something has gone terribly wrong", expression
-    else:
-        postfix_expression = PostfixExpression(expression)
-        interpreted_expression = postfix_expression.interpreted_expression
-        if postfix_expression.error_msg is not None:
-            pos = postfix_expression.error_place
-            return pos[0], pos[1], postfix_expression.error_msg, interpreted_expression
-        else:
-            varname = ""
-            polynomial = postfix_expression.result.polynomial
-
-    solver = PolynomialSolver()
+        return render_result(*evaluate_request(request.form['expression']))
+
+
+@app.route('/evaluate')
+def evaluate_page():
+    """
+    Evaluates the expression given as the query parameter 'expression'. Pages are cached by the expression
+    without spaces, so popular expressions are neither evaluated nor rendered again; browsers and proxies
+    may cache them too and revalidate them by ETags
+    """
+    global responses
+    expression = request.args.get("expression")
+    if expression is None:
+        return render_index()
+    if responses is None:
+        # Pages contain their expressions, whose length is limited only by the length of URLs
+        responses = LRUCache(maxsize=app.config["RESPONSES_MAX"], maxweight=app.config["RESPONSES_MAX_BYTES"],
+                             weigh=lambda key, response: len(key[0]) + len(response[0]))
+
+    key = (expression.replace(" ", ""), app.config["EVALUATION_BUDGET"])
+    page, etag = responses.get(key, lambda key: render_page(key[0]))
+    response = Response(page, mimetype="text/html")
+    if etag is None:    # A failure of the server rather than a result
+        responses.discard(key)
+        response.cache_control.no_store = True
+        return response
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config["RESPONSE_MAX_AGE"]
+    return response.make_conditional(request)
+
+
+def render_page(expression):
+    """
+    :return: page with the result of the expression, its ETag or None if the page mustn't be cached
+    """
+    result = evaluate_request(expression)
+    page = render_result(*result)
+    if getattr(result, "transient", False):     # See asgi.PoolFailure
+        return page, None
+    return page, hashlib.sha1(page.encode()).hexdigest()
+
+
+def render_result(err_start, err_end, message, expression):
+    if err_start is None:
+        return render_index(solution=message, expression=expression)
+    if err_start != -1:
+        return render_index(explanation=message,
+                            before_mistake=expression[:err_start],
+                            mistake=expression[err_start:err_end + 1],
+                            after_mistake=expression[err_end + 1:])
+    return render_index(explanation=message,
+                        before_mistake=expression,
+                        mistake="",
+                        after_mistake="")
+
+
+def evaluate_request(expression):
+    """
+    Evaluates an expression posted by a user. In ASGI mode (see asgi.py) it is evaluated
+    by a pool of worker processes with a deadline, otherwise in the current thread
+    """
+    budget = app.config["EVALUATION_BUDGET"]
+    pool = request.environ.get("calculator.worker_pool")
+    if pool is not None:
+        return pool.evaluate(expression, budget=budget)
+    return evaluate_infix(expression, budget)
+
+
+def evaluate_job(function, argument, **kwargs):
+    """
+    Calls function(argument, budget=..., **kwargs) for an API request, in ASGI mode on the pool of worker
+    processes with a deadline (like evaluate_request), otherwise in the current thread
+    """
+    budget = app.config["EVALUATION_BUDGET"]
+    pool = request.environ.get("calculator.worker_pool")
+    if pool is not None:
+        return pool.evaluate(argument, function=function, budget=budget, **kwargs)
+    return function(argument, budget=budget, **kwargs)
+
+
+def render_index(**context):
+    with metrics.timer("render"):
+        return render_template('index.html', **context)
+
+
+@app.route('/metrics')
+def metrics_api():
+    """
+    Latencies of stages, sizes of inputs and counts of errors in Prometheus text format.
+    Nothing is collected unless the server is run with --metrics (or metrics.enable() is called)
+    """
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/api/evaluate_array', methods=['POST'])
+def evaluate_array_api():
+    """
+    Evaluates an expression for many values of its variable.
+    Expects JSON {"expression": string, "values": array of numbers}
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("expression"), str) or "values" not in data:
+        return jsonify(error={"message": "Expected JSON object with 'expression' and 'values'."}), 400
     try:
-        # Take the first (and the only) solution
-        result = solver.solve(polynomial)[0]
-    except NotImplementedError as e:
-        return -1, -1, e.args[0], expression
-    if result[1] == 0:
-        if '=' in expression:
-            return -1, -1, "The expression doesn't have a variable " + \
-                   "(or the coefficient before it is 0), but " + \
-                   "has a '=' sign. It cannot be interpreted.", expression
-        # Formatting the result
-        num_result = result[0] if math.floor(result[0]) != result[0] else math.floor(result[0])
-        return None, None, str(num_result), interpreted_expression
-    else:
-        if '=' not in expression:
-            return -1, -1, "The expression has variables but doesn't have '=' sign." + \
-                   "Should it be treated as equation?", expression
-        # Formatting the result
-        num_result = result[0] if math.floor(result[0]) != result[0] else math.floor(result[0])
-        return None, None, varname + ' = ' + str(num_result), interpreted_expression
+        values = numpy.asarray(data["values"], dtype=float)
+    except (TypeError, ValueError):
+        return jsonify(error={"message": "'values' must be an array of numbers."}), 400
+    err_start, err_end, message, expression = evaluate_job(evaluate_array, data["expression"], values=values)
+
+    if err_start is not None:
+        return jsonify(expression=expression,
+                       error={"message": message, "start": err_start, "end": err_end}), 400
+    # nan and inf aren't representable in JSON
+    return jsonify(expression=expression,
+                   result=[value if math.isfinite(value) else None for value in message.ravel().tolist()])
+
+
+@app.route('/api/batch', methods=['POST'])
+def batch_api():
+    """
+    Evaluates many expressions and equations at once.
+    Expects a JSON array of strings, returns an array of results in the same order.
+    In ASGI mode expressions are evaluated on the pool of worker processes, each with the deadline of the pool
+    """
+    global batch_evaluator
+    expressions = request.get_json(silent=True)
+    if not isinstance(expressions, list) or not all(isinstance(e, str) for e in expressions):
+        return jsonify(error={"message": "Expected JSON array of strings."}), 400
+    if len(expressions) > app.config["BATCH_MAX_SIZE"]:
+        return jsonify(error={"message": "Too many expressions in one batch (at most %d are allowed)." %
+                                         app.config["BATCH_MAX_SIZE"]}), 413
+
+    pool = request.environ.get("calculator.worker_pool")
+    if pool is not None:
+        return jsonify([result_to_dict(result) for result in pool.map(expressions,
+                                                                      budget=app.config["EVALUATION_BUDGET"])])
+    if batch_evaluator is None:
+        batch_evaluator = BatchEvaluator(workers=app.config["BATCH_WORKERS"],
+                                         chunk_size=app.config["BATCH_CHUNK_SIZE"],
+                                         budget=app.config["EVALUATION_BUDGET"])
+    return jsonify(batch_evaluator.evaluate(expressions))
+
+
+@app.route('/api/system', methods=['POST'])
+def system_api():
+    """
+    Solves a system of linear equations.
+    Expects a JSON array of strings, one equation each
+    """
+    equations = request.get_json(silent=True)
+    if not isinstance(equations, list) or not all(isinstance(e, str) for e in equations):
+        return jsonify(error={"message": "Expected JSON array of strings."}), 400
+    if len(equations) > app.config["SYSTEM_MAX_EQUATIONS"]:
+        return jsonify(error={"message": "Too many equations in one system (at most %d are allowed)." %
+                                         app.config["SYSTEM_MAX_EQUATIONS"]}), 413
+    result = evaluate_job(evaluate_system, equations)
+    if not isinstance(result[3], str):  # Failures of the pool keep the argument
+        result = result[:3] + ("; ".join(equations),)
+    return jsonify(result_to_dict(result))
+
+
+@app.route('/api/session', methods=['POST'])
+def session_api():
+    """
+    Evaluates an expression as it is typed.
+    Expects JSON {"expression": string, "session": string returned with the previous result (optional)},
+    only the part of the expression changed since the previous request of the session is processed again.
+    Sessions are kept in the server process, so they aren't evaluated on the pool of worker processes
+    even in ASGI mode: their expressions are limited by SESSION_MAX_LENGTH and SESSION_BUDGET instead
+    """
+    global sessions
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("expression"), str):
+        return jsonify(error={"message": "Expected JSON object with 'expression'."}), 400
+    if len(data["expression"]) > app.config["SESSION_MAX_LENGTH"]:
+        return jsonify(error={"message": "Expressions of a session are limited to %d characters." %
+                                         app.config["SESSION_MAX_LENGTH"]}), 413
+    if sessions is None:
+        sessions = LRUCache(maxsize=app.config["SESSIONS_MAX"])
+
+    session_id = data.get("session")
+    if not isinstance(session_id, str) or session_id not in sessions:
+        session_id = uuid.uuid4().hex
+    budget = app.config["SESSION_BUDGET"]
+    lock, session = sessions.get(session_id, lambda key: (Lock(), PostfixExpression("", budget=budget,
+                                                                                    incremental=True)))
+    with lock:
+        result = evaluate_infix(data["expression"], budget, session)
+    return jsonify(dict(result_to_dict(result), session=session_id))
+
 
 if __name__ == '__main__':
     import argparse
@@ -96,9 +237,37 @@ if __name__ == '__main__':
                         help="run in debug mode (for use with PyCharm)", default=False)
     parser.add_argument("-p", "--port", dest="port",
                         help="port of server (default:%(default)s)", type=int, default=5000)
+    parser.add_argument("--metrics", action="store_true", dest="metrics",
+                        help="collect metrics served on /metrics", default=False)
+    parser.add_argument("--batch", dest="batch", metavar="FILE",
+                        help="evaluate every line of FILE ('-' for stdin) and write JSON lines to stdout "
+                             "instead of starting the server")
+    parser.add_argument("--workers", dest="workers", type=int, default=None,
+                        help="number of processes evaluating a batch (default: number of cores, 0: no processes)")
+    parser.add_argument("--chunk-size", dest="chunk_size", type=int, default=app.config["BATCH_CHUNK_SIZE"],
+                        help="number of expressions sent to a process at once (default:%(default)s)")
+    parser.add_argument("--progress", action="store_true", dest="progress",
+                        help="report throughput of a batch to stderr", default=False)
 
     cmd_args = parser.parse_args()
+    if cmd_args.batch is not None:
+        import sys
+        from batch import evaluate_lines
+        evaluator = BatchEvaluator(workers=cmd_args.workers, chunk_size=cmd_args.chunk_size,
+                                   budget=app.config["EVALUATION_BUDGET"])
+        try:
+            if cmd_args.batch == "-":
+                evaluate_lines(sys.stdin, sys.stdout, evaluator, sys.stderr if cmd_args.progress else None)
+            else:
+                with open(cmd_args.batch) as source:
+                    evaluate_lines(source, sys.stdout, evaluator, sys.stderr if cmd_args.progress else None)
+        finally:
+            evaluator.shutdown()
+        sys.exit()
+
     app_options = {"port": cmd_args.port }
+    if cmd_args.metrics:
+        metrics.enable()
 
     if cmd_args.debug_mode:
         app_options["debug"] = True
@@ -0,0 +1,80 @@
+"""
+Compiles postfix programs into Python functions, so that a program evaluated many times isn't interpreted
+token by token. The generated function is straight-line code: one assignment per operation, operands are
+kept in local variables named after their depth in the stack (so the nesting of the expression doesn't
+matter), constants are created once, when the function is compiled. A result of an operation is referred to by
+its variable only, so operators are applied to it in place (with augmented assignments) when it is the left
+operand; the functions given must return new objects for that reason.
+"""
+from itertools import count
+
+# Tokens whose functions are the Python operators, they are written inline instead of calls
+PYTHON_OPERATORS = {"+": "+", "-": "-", "*": "*", "/": "/", "^": "**"}
+
+
+def compile_postfix(postfix, callables, constant, variables=(), python_operators=PYTHON_OPERATORS):
+    """
+    :param postfix: tokens in postfix form (a correct program)
+    :param callables: a dictionary (token: function) of operators and functions, arities are taken from them
+    :param constant: a function making the value of a number token
+    :param variables: names of variables, they become the arguments of the function in this order
+    :param python_operators: a dictionary (token: Python binary operator) of operators written inline
+    :return: a function of the variables returning the value of the program
+    """
+    namespace = {}
+    names = {}      # Token (or callable) -> name in the namespace
+    arguments = {name: "v%d" % i for i, name in enumerate(variables)}
+    numbering = count()
+
+    def name_of(key, value, prefix):
+        if key not in names:
+            names[key] = "%s%d" % (prefix, next(numbering))
+            namespace[names[key]] = value
+        return names[key]
+
+    lines = []
+    stack = []  # Names holding the operands
+    for token in postfix:
+        if token not in callables:
+            stack.append(arguments[token] if token in arguments else name_of(token, constant(token), "c"))
+            continue
+        function = callables[token]
+        argcount = function.__code__.co_argcount
+        operands = stack[-argcount:]
+        del stack[-argcount:]
+        slot = "s%d" % len(stack)
+        if token in python_operators and argcount == 2 and operands[0] == slot:
+            lines.append("    %s %s= %s" % (slot, python_operators[token], operands[1]))
+        elif token in python_operators and argcount == 2:
+            lines.append("    %s = %s %s %s" % (slot, operands[0], python_operators[token], operands[1]))
+        else:
+            lines.append("    %s = %s(%s)" % (slot, name_of(token, function, "f"), ", ".join(operands)))
+        stack.append(slot)
+    if len(stack) != 1:
+        raise ValueError("Incorrect postfix program")
+
+    source = "def program(%s):\n%s\n    return %s\n" % (", ".join(arguments[name] for name in variables),
+                                                      "\n".join(lines), stack[0])
+    exec(compile(source, "<postfix program>", "exec"), namespace)
+    return namespace["program"]
+
+
+class LazyProgram:
+    # The compiled form of a postfix program, built once the program has been evaluated successfully
+    # a number of times (compilation costs about as much as a few interpretations)
+    __slots__ = ("function", "evaluations", "threshold")
+
+    def __init__(self, threshold=2):
+        self.function = None
+        self.evaluations = 0
+        self.threshold = threshold
+
+    def evaluated(self, build):
+        """
+        Counts a successful interpretation, the program is compiled when the threshold is reached
+        :param build: a function without arguments returning the compiled function
+        :return:
+        """
+        self.evaluations += 1
+        if self.function is None and self.evaluations >= self.threshold:
+            self.function = build()
@@ -0,0 +1,197 @@
+"""
+Evaluation of expressions and equations without the web application, so that it can be imported quickly
+(by command line tools, worker processes etc.): neither Flask nor numpy is imported here.
+"""
+import math
+import re
+
+from equations import Equations
+from metrics import metrics
+from numericsolver import MAX_PROGRAM_LENGTH, SEARCH_LIMIT, NumericSolver, compile_dual, evaluate_rational, \
+    relative_value
+from polynomialsolver import RESIDUAL_TOLERANCE, PolynomialSolver
+from postfixexpression import DEFAULT_BUDGET, PostfixExpression, plan_cache
+
+pat_unallowed = re.compile(r'([^A-Za-z0-9+\-*/^=.,;\s()])')
+pat_unallowed_equation = re.compile(r'([^A-Za-z0-9+\-*/^=.,\s()])')     # Equations of a system have no ';'
+
+
+def evaluate_infix(expression, budget=DEFAULT_BUDGET, session=None):
+    """
+    The highest level function for evaluation of expressions
+    :param expression: string representing an infix expression
+    :param budget: a Budget, exceeding any limit is reported as an error
+    :param session: a PostfixExpression in incremental mode, expressions and equations
+    are evaluated by its update if given
+    :return: err_start, err_end, message, interpreted expression in case of any error,
+    None, None, solution, interpreted_expression otherwise
+    """
+    if not metrics.enabled:
+        return evaluate_infix_unmeasured(expression, budget, session)
+    metrics.observe_size("characters", len(expression))
+    with metrics.timer("evaluate_infix"):
+        result = evaluate_infix_unmeasured(expression, budget, session)
+    if result[0] is not None:
+        metrics.count_error(result[2])
+    return result
+
+
+def evaluate_infix_unmeasured(expression, budget, session=None):
+    match = pat_unallowed.search(expression)
+    if match is not None:
+        pos = match.start()
+        return pos, pos, "Unallowed symbol detected: %s" % expression[pos], expression
+
+    if ";" in expression:  # Solve a system of equations
+        return evaluate_system(expression.split(";"), budget)
+    # Equations are parsed as one expression with '=' of the lowest precedence, the result is lhs - rhs
+    if session is not None:
+        session.update(expression)
+        postfix_expression = session
+    else:
+        postfix_expression = PostfixExpression(expression, plan_cache=plan_cache, budget=budget)
+    interpreted_expression = postfix_expression.interpreted_expression
+    is_equation = postfix_expression.is_equation
+    if postfix_expression.error_msg is not None:
+        if is_equation and postfix_expression.error_unsupported:
+            # Logarithms of the variable, division by polynomials etc. aren't polynomials, but may be solved numerically
+            result = solve_numerically(postfix_expression, expression, budget)
+            if result is not None:
+                return result
+        pos = postfix_expression.error_place
+        pos = pos if pos != (None, None) else (-1, -1)    # An empty expression has no place of the error
+        return pos[0], pos[1], postfix_expression.error_msg, interpreted_expression
+    if is_equation:
+        result = Equations.polynomial(postfix_expression)
+        if len(result) == 4:
+            return result
+        varname, polynomial, interpreted_expression = result
+    else:
+        varname = ""
+        polynomial = postfix_expression.result.polynomial
+
+    solver = PolynomialSolver()
+    try:
+        with metrics.timer("solve"):
+            solutions = solver.solve(polynomial)
+    except NotImplementedError as e:
+        return -1, -1, e.args[0], expression
+    if solutions[0][1] == 0:
+        if is_equation:
+            return -1, -1, "The expression doesn't have a variable " + \
+                   "(or the coefficient before it is 0), but " + \
+                   "has a '=' sign. It cannot be interpreted.", expression
+        return None, None, format_number(solutions[0][0]), interpreted_expression
+    else:
+        if not is_equation:
+            return -1, -1, "The expression has variables but doesn't have '=' sign." + \
+                   "Should it be treated as equation?", expression
+        return None, None, format_roots(varname, [root for root, _ in solutions]), interpreted_expression
+
+
+def solve_numerically(postfix_expression, expression, budget):
+    """
+    Finds real roots of an equation with one variable the polynomial arithmetic failed on
+    :param postfix_expression: the PostfixExpression of the equation (with the error)
+    :param expression: the equation
+    :param budget: a Budget of the equation
+    :return: the result as evaluate_infix returns it, None if the equation can't be solved numerically either
+    """
+    plan = postfix_expression.plan
+    if plan is None:    # Sessions don't keep plans
+        plan = PostfixExpression(expression, plan_cache=plan_cache, budget=budget).plan
+    if len(plan.variables) != 1:
+        return None
+    rational = evaluate_rational(plan.postfix, plan.varname, budget.max_degree)
+    if rational is not None:
+        return solve_rational(plan, *rational)
+    if len(plan.postfix) > MAX_PROGRAM_LENGTH:
+        return None
+    with metrics.timer("solve_numerically"):
+        roots, defined = NumericSolver.solve(compile_dual(plan.postfix, plan.varname))
+    if not defined:
+        return None
+    if roots is None:
+        return -1, -1, "The equation holds for every value of %s where it is defined." % plan.varname, \
+            plan.interpreted_expression
+    if not roots:
+        return -1, -1, "Error: no real roots were found between %g and %g, but the numerical search may miss " \
+                       "some." % (-SEARCH_LIMIT, SEARCH_LIMIT), plan.interpreted_expression
+    return None, None, "%s (found by a numerical search between %g and %g, other roots may be missed)" % \
+        (format_roots(plan.varname, roots), -SEARCH_LIMIT, SEARCH_LIMIT), plan.interpreted_expression
+
+
+def solve_rational(plan, numerator, denominator):
+    """
+    Solves an equation numerator / denominator = 0 exactly as a polynomial one, roots of the numerator
+    where the denominator vanishes too are dropped
+    :param plan: the ExpressionPlan of the equation
+    :param numerator, denominator: dense Operands, as evaluate_rational returns them
+    :return: the result as evaluate_infix returns it
+    """
+    if not any(numerator.polynomial):
+        return -1, -1, "The equation holds for every value of %s where it is defined." % plan.varname, \
+            plan.interpreted_expression
+    try:
+        with metrics.timer("solve"):
+            solutions = PolynomialSolver.solve(numerator.polynomial)
+    except NotImplementedError as e:
+        return -1, -1, e.args[0], plan.interpreted_expression
+    roots = [root for root, variable in solutions
+             if variable and relative_value(denominator.polynomial, root) > RESIDUAL_TOLERANCE]
+    if not roots:
+        return -1, -1, "Error: the equation has no roots.", plan.interpreted_expression
+    return None, None, format_roots(plan.varname, roots), plan.interpreted_expression
+
+
+def format_roots(varname, roots):
+    """
+    :return: string like "x = 1, x = 2", every root is reported once, even if it is a multiple one
+    """
+    formatted = []
+    for root in roots:
+        root = varname + ' = ' + format_number(root)
+        if root not in formatted:
+            formatted.append(root)
+    return ", ".join(formatted)
+
+
+def evaluate_system(equations, budget=DEFAULT_BUDGET):
+    """
+    Solves a system of linear equations
+    :param equations: list of strings, one equation each
+    :param budget: a Budget applied to each equation
+    :return: err_start, err_end, message, interpreted system in case of any error,
+    None, None, solution, interpreted system otherwise. Error places refer to the equations joined with "; "
+    """
+    offset = 0
+    for equation in equations:
+        match = pat_unallowed_equation.search(equation)
+        if match is not None:
+            pos = offset + match.start()
+            return pos, pos, "Unallowed symbol detected: %s" % equation[match.start()], "; ".join(equations)
+        offset += len(equation) + 2
+
+    with metrics.timer("solve_system"):
+        result = Equations.solve_system(equations, budget)
+    if len(result) == 4:
+        return result
+    names, values, interpreted_expression = result
+    if not all(map(math.isfinite, values)):
+        return -1, -1, "Error: values of the solution are too large.", interpreted_expression
+    return None, None, ", ".join(name + " = " + format_number(value) for name, value in zip(names, values)), \
+        interpreted_expression
+
+
+def format_number(number):
+    """
+    :param number: float or complex
+    :return: string representation with integral values written without fractional part
+    """
+    if isinstance(number, complex):
+        real, imag = format_number(number.real), format_number(abs(number.imag))
+        imag = (imag if imag != "1" else "") + "i"
+        if number.real == 0:
+            return imag if number.imag > 0 else "-" + imag
+        return real + (" + " if number.imag > 0 else " - ") + imag
+    return str(number if math.floor(number) != number else math.floor(number))
@@ -1,57 +1,118 @@
-from postfixexpression import *
+from linearsystem import solve_linear_system
+from postfixexpression import DEFAULT_BUDGET, PostfixExpression, plan_cache
 
 
 class Equations:
     @staticmethod
-    def solve(left_part_string, right_part_string):
+    def solve(equation_string, budget=DEFAULT_BUDGET):
         """
-        Given two infix strings does all processing related to solving an equation
-        :param left_part_string:
-        :param right_part_string:
+        Given an infix string with '=' does all processing related to solving an equation
+        :param equation_string:
+        :param budget: a Budget of the equation
         :return: err_start, err_end, err_message, interpreted_expression in case of any error
         and (varname, array representation of a polynomial, interpreted_expression otherwise)
         """
-        left_part_string = left_part_string.replace(" ", "")
-        right_part_string = right_part_string.replace(" ", "")
-
-        left_side_expression = PostfixExpression(left_part_string)
-        right_side_expression = PostfixExpression(right_part_string)
-        left_interpreted = left_side_expression.interpreted_expression
-        right_interpreted = right_side_expression.interpreted_expression
-        if left_side_expression.get_error() is None:
-            left_operand = left_side_expression.result
-            assert left_operand is not None
-        else:
-            pos = left_side_expression.error_place
-            return pos[0], pos[1], left_side_expression.error_msg, \
-                left_interpreted + " = " + right_interpreted
-
-        if right_side_expression.get_error() is None:
-            right_operand = right_side_expression.result
-            assert right_operand is not None
-        else:
-            shift = len(left_interpreted) + 3
-            pos = right_side_expression.error_place
+        return Equations.polynomial(PostfixExpression(equation_string, plan_cache=plan_cache, budget=budget))
+
+    @staticmethod
+    def polynomial(equation):
+        """
+        :param equation: an evaluated PostfixExpression of an equation, it is parsed as one expression
+        in which '=' has the lowest precedence, so its result is the difference of the sides.
+        Sides may contain several variables, as long as all of them but one cancel out
+        :return: err_start, err_end, err_message, interpreted_expression in case of any error
+        and (varname, array representation of a polynomial, interpreted_expression otherwise)
+        """
+        interpreted_expression = equation.interpreted_expression
+        if equation.error_msg is not None:
+            pos = equation.error_place
             pos = pos if pos != (None, None) else (-1, -1)
-            return pos[0] + shift, pos[1] + shift, right_side_expression.error_msg, \
-                left_interpreted + " = " + right_interpreted
-
-        if left_side_expression.varname == right_side_expression.varname:
-            if left_side_expression.varname is None:
-                return None, None, "None of sides of the expression has a variable.", \
-                    left_interpreted + " = " + right_interpreted
-            else:
-                varname = left_side_expression.varname
-        else:
-            if left_side_expression.varname is None:
-                varname = right_side_expression.varname
-            elif right_side_expression.varname is None:
-                varname = left_side_expression.varname
-            else:
-                pos = right_interpreted.index(right_side_expression.varname)
-                return pos, pos, "Several names for variable %s and %s" % \
-                    (left_side_expression.varname, right_side_expression.varname), \
-                    left_interpreted + " = " + right_interpreted
-
-        return varname, (left_operand - right_operand).polynomial, \
-            left_side_expression.interpreted_expression + " = " + right_side_expression.interpreted_expression
+            return pos[0], pos[1], equation.error_msg, interpreted_expression
+        if not equation.variables:
+            return -1, -1, "None of sides of the expression has a variable.", interpreted_expression
+        difference = equation.result
+        if len(equation.variables) == 1:
+            return equation.varname, difference.to_dense(equation.varname).polynomial, interpreted_expression
+
+        # Variables may cancel out, the equation is solvable if only one of them remains
+        remaining = difference.variable_names()
+        if len(remaining) > 1:
+            listed = ", ".join(remaining[:10]) + (", ..." if len(remaining) > 10 else "")
+            return -1, -1, "Error: the equation has several variables (%s), it can't be solved alone." % listed, \
+                interpreted_expression
+        varname = remaining[0] if remaining else equation.varname
+        return varname, difference.to_dense(varname).polynomial, interpreted_expression
+
+    @staticmethod
+    def solve_system(equation_strings, budget=DEFAULT_BUDGET):
+        """
+        Solves a system of linear equations
+        :param equation_strings: list of strings with one '=' sign each, blank strings are skipped
+        (equations are numbered by their places in the list anyway)
+        :param budget: a Budget applied to each equation
+        :return: err_start, err_end, err_message, interpreted_expression in case of any error
+        and (names of variables, their values, interpreted_expression) otherwise.
+        Equations are joined with "; " in interpreted_expression, error places refer to it
+        """
+        numbered = [(number, string) for number, string in enumerate(equation_strings, 1)
+                    if not string.isspace() and string]
+        interpreted = []    # Interpreted equations processed so far
+        offset = 0          # Position of the current equation in the interpreted system
+
+        def error(start, end, message, interpreted_equation):
+            rest = [string.replace(" ", "") for _, string in numbered[len(interpreted) + 1:]]
+            if start is not None and start >= 0:
+                start, end = start + offset, end + offset
+            return start, end, message, "; ".join(interpreted + [interpreted_equation] + rest)
+
+        if not numbered:
+            return -1, -1, "Error: the system contains no equations.", ""
+        rows, rhs, spans = [], [], []
+        columns = {}    # Variable name -> column
+        for number, string in numbered:
+            equation = PostfixExpression(string, plan_cache=plan_cache, budget=budget)
+            interpreted_equation = equation.interpreted_expression
+            if equation.error_msg is not None:
+                pos = equation.error_place
+                return error(pos[0], pos[1], equation.error_msg, interpreted_equation)
+            if not equation.is_equation:
+                return error(0, len(interpreted_equation) - 1, "Error: equation %d has no '=' sign." % number,
+                             interpreted_equation)
+            difference = equation.result.to_sparse(equation.varname)
+            if difference.degree > 1:
+                return error(0, len(interpreted_equation) - 1, "Error: equation %d isn't linear." % number,
+                             interpreted_equation)
+
+            row, constant = {}, 0.
+            terms = difference.terms if difference.terms is not None else {(): difference.polynomial[0]}
+            for monomial, coefficient in terms.items():
+                if monomial:
+                    row[columns.setdefault(monomial[0][0], len(columns))] = coefficient
+                else:
+                    constant = coefficient
+            for name in equation.variables:
+                columns.setdefault(name, len(columns))  # Variables which cancel out still need values
+            rows.append(row)
+            rhs.append(-constant)
+            spans.append((offset, offset + len(interpreted_equation) - 1, number))
+            interpreted.append(interpreted_equation)
+            offset += len(interpreted_equation) + 2
+
+        interpreted_expression = "; ".join(interpreted)
+        if not columns:
+            return -1, -1, "None of equations of the system has a variable.", interpreted_expression
+        try:
+            solution, inconsistent, free = solve_linear_system(rows, rhs, len(columns))
+        except NotImplementedError as e:
+            return -1, -1, e.args[0], interpreted_expression
+        names = sorted(columns, key=columns.get)
+        if inconsistent is not None:
+            start, end, number = spans[inconsistent]
+            return start, end, "Error: equation %d contradicts the others." % number, interpreted_expression
+        if free:
+            free_names = [names[column] for column in free]
+            listed = ", ".join(free_names[:10]) + (", ..." if len(free_names) > 10 else "")
+            return -1, -1, "Error: the system is underdetermined, values of (%s) may be chosen freely." % listed, \
+                interpreted_expression
+        values = dict(zip(names, solution))
+        return sorted(values), [values[name] for name in sorted(values)], interpreted_expression
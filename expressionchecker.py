@@ -1,28 +1,91 @@
-from itertools import compress, count, islice
+import re
 from functools import partial
+from itertools import compress, count, islice, repeat
 from operator import eq
-from pda import PDA
-import re
 
+# Classes of tokens
+OPERATOR, UNARY_MINUS, FUNCTION, NUMBER, VARIABLE, LEFT_PARENTHESIS, RIGHT_PARENTHESIS, COMMA, OTHER = range(9)
+
+# States
+AWAITING_OPERAND, AWAITING_OPERATOR, AWAITING_PARENTHESIS = range(3)
+
+# Actions
+(OPEN_FUNCTION, TAKE_NUMBER, TAKE_VARIABLE, PUSH_UNARY_MINUS, PUSH_PARENTHESIS, TAKE_OPERATOR, TAKE_COMMA,
+ CLOSE_PARENTHESIS, OPEN_ARGUMENTS, EXPECTED_OPERAND, EXPECTED_OPERATOR, EXPECTED_PARENTHESIS) = range(12)
+
+# TRANSITIONS[state][token class] is the action taken
+TRANSITIONS = (
+    # AWAITING_OPERAND
+    (EXPECTED_OPERAND, PUSH_UNARY_MINUS, OPEN_FUNCTION, TAKE_NUMBER, TAKE_VARIABLE, PUSH_PARENTHESIS,
+     EXPECTED_OPERAND, EXPECTED_OPERAND, EXPECTED_OPERAND),
+    # AWAITING_OPERATOR (unary '-' is taken as an operator only if it is one of the operators given)
+    (TAKE_OPERATOR, EXPECTED_OPERATOR, EXPECTED_OPERATOR, EXPECTED_OPERATOR, EXPECTED_OPERATOR, EXPECTED_OPERATOR,
+     CLOSE_PARENTHESIS, TAKE_COMMA, EXPECTED_OPERATOR),
+    # AWAITING_PARENTHESIS
+    (EXPECTED_PARENTHESIS,) * LEFT_PARENTHESIS + (OPEN_ARGUMENTS,) +
+    (EXPECTED_PARENTHESIS,) * (OTHER - LEFT_PARENTHESIS),
+)
+
+pat_unallowed = re.compile(r"[^A-Za-z0-9+~\-*/^=.,()]")
+
+
+def linked_items(node):
+    """
+    :param node: a persistent stack of tuples (item, ..., rest), () is the empty one
+    :return: an iterator over its nodes from the top
+    """
+    while node:
+        yield node
+        node = node[-1]
 
-class ExpressionChecker(PDA):
-    def __init__(self, operators, functions):
+
+class ExpressionChecker:
+    def __init__(self, operators, functions, precedences=None, max_depth=None, several_variables=False,
+                 right_associative=(), relations=()):
         """
-        Creates an arithmetic expression checker based on push-down automaton
+        Creates an arithmetic expression checker based on push-down automaton driven by a transition table
         It has three states: awaiting operand, awaiting operator and awaiting parenthesis (after function)
-        By now supports expressions with only variable
         :param operators: a dictionary (operator_name: string, operator_function: function)
         :param functions: a dictionary (function_name: string, function_body: function)
+        :param precedences: a dictionary (operator_name: string, precedence: int) used by parse,
+        all operators have the same precedence if None
+        :param max_depth: the maximal nesting of parentheses (including function calls), None means no limit
+        :param several_variables: expressions with only one variable name are accepted if False
+        :param right_associative: names of right-associative operators (e.g. power), others are left-associative
+        :param relations: names of relational operators (e.g. '='), an expression may contain one of them
+        outside of parentheses and is an equation then: variables may have several names in equations
         :return:
         """
-        states = {"operator": self.__state_operator,
-                  "operand": self.__state_operand,
-                  "parenthesis": self.__state_parenthesis}
-        super().__init__(states, current_state="operand")
-
         self.operators = operators
         self.functions = functions
+        self.precedences = precedences if precedences is not None else dict.fromkeys(operators, 0)
+        self.max_depth = max_depth
+        self.several_variables = several_variables
+        self.right_associative = frozenset(right_associative)
+        self.relations = frozenset(relations)
+        # Registry of function arities, so they aren't looked up during checking
+        self.arities = {name: function.__code__.co_argcount for name, function in functions.items()}
+        # Classes of all tokens which don't depend on the expression
+        self.token_classes = {name: OPERATOR for name in operators}
+        self.token_classes.update({name: FUNCTION for name in functions})
+        self.token_classes.update({"~": UNARY_MINUS, "(": LEFT_PARENTHESIS, ")": RIGHT_PARENTHESIS, ",": COMMA})
+        self.transitions = [list(actions) for actions in TRANSITIONS]
+        if "~" in operators:
+            self.transitions[AWAITING_OPERATOR][UNARY_MINUS] = TAKE_OPERATOR
+
+        self.current_state = AWAITING_OPERAND
+        self.stack = ()             # Persistent stack of tuples (item, rest), snapshots share it instead of copying
         self.variable_name = ""
+        self.relation = None        # Number of the relation token
+        self.name_mismatch = None   # (error string, token number) of the first other variable name
+
+    def classify(self, token):
+        token_class = self.token_classes.get(token)
+        if token_class is not None:
+            return token_class
+        if token.replace(".", "").isalnum():
+            return VARIABLE if token.isalpha() else NUMBER
+        return OTHER
 
     def consume_token_array(self, token_array):
         """
@@ -31,98 +94,202 @@ class ExpressionChecker(PDA):
         :return: (None, None) if a string does belong and tuple (error string, token number) otherwise
         if an error appears at the end of a token array, instead of token number -1 is returned
         """
+        return self.parse(token_array)[2:]
+
+    def parse(self, token_array, token_places=None, snapshots=None, resume=0):
+        """
+        Checks an expression and rewrites it in postfix form (Shunting-yard algorithm) in the same pass
+        :param token_array:
+        :param token_places: (start_pos, end_pos) of each token, None if they aren't needed
+        :param snapshots: None or a list receiving the state of the parser before every token
+        (and after the last one), so that parsing of an edited expression may be resumed
+        :param resume: the number of the first token which differs from the previous call with the same
+        snapshots, the state is restored from its snapshot (which must exist)
+        :return: tuple (postfix tokens, their places, error string, token number), the error
+        and the token number are None if the expression is correct (as in consume_token_array)
+        """
+        postfix, postfix_places, error, error_token = self.__parse(token_array, token_places, snapshots, resume)
+        # Several variable names are an error of expressions (without relations) only, which is known at the end
+        mismatch = self.name_mismatch
+        if mismatch is not None and self.relation is None and \
+                (error is None or error_token < 0 or error_token > mismatch[1]):
+            return postfix, postfix_places, mismatch[0], mismatch[1]
+        return postfix, postfix_places, error, error_token
+
+    def __parse(self, token_array, token_places, snapshots, resume):
 
         def nth_item(num, item, iterable):
             indices = compress(count(), map(partial(eq, item), iterable))
             return next(islice(indices, num, None), -1)
 
-        self.current_state = "operand"
-        self.stack = []
-        self.variable_name = ""
+        if resume:
+            (self.current_state, stack, self.variable_name, depth, postfix_length, pending,
+             self.relation, self.name_mismatch) = snapshots[resume]
+            postfix, postfix_places = self.postfix, self.postfix_places
+            del postfix[postfix_length:], postfix_places[postfix_length:], snapshots[resume:]
+        else:
+            self.current_state = AWAITING_OPERAND
+            stack = ()
+            self.variable_name = ""
+            self.relation, self.name_mismatch = None, None
+            depth = 0
+            postfix, postfix_places = [], []
+            pending = ()    # The operator stack of Shunting-yard algorithm, nodes (token, place, rest)
+            if snapshots is not None:
+                del snapshots[:]
+        self.postfix, self.postfix_places = postfix, postfix_places
+        if token_places is None:
+            token_places = repeat(None, len(token_array))
 
-        for i, token in enumerate(token_array):
-            if len(re.findall(r"[^A-Za-z0-9+~\-*/.,()]", token)) != 0:
-                raise ValueError("Unallowed character in token array: %s.", token)
+        # The whole input is validated at once, the error is raised when the checker reaches the token
+        unallowed_token = len(token_array)
+        match = pat_unallowed.search("".join(token_array[resume:]))
+        if match is not None:
+            position = match.start()
+            for unallowed_token in range(resume, len(token_array)):
+                if position < len(token_array[unallowed_token]):
+                    break
+                position -= len(token_array[unallowed_token])
+
+        transitions = self.transitions
+        precedences = self.precedences
+        right_associative = self.right_associative
+        max_depth = self.max_depth if self.max_depth is not None else len(token_array)
+
+        def pop_until_parenthesis(pending):
+            while pending[0] != "(":
+                top, top_place, pending = pending
+                postfix.append(top)
+                postfix_places.append(top_place)
+            return pending
+
+        for i, token, token_place in zip(range(resume, unallowed_token), islice(token_array, resume, None),
+                                         islice(token_places, resume, None)):
+            if snapshots is not None:
+                snapshots.append((self.current_state, stack, self.variable_name, depth, len(postfix),
+                                  pending, self.relation, self.name_mismatch))
             if token.count(".") > 1:
-                return "Error: invalid number.", i
-            result = self.consume_token(token)
-            if result is not None:
-                return result, i
-        if self.current_state == "parenthesis":
-            return "Error: '(' is expected after a function name, but the end of the expression reached.", -1
-        if self.current_state == "operand":
-            return "Error: operand is expected, but the end of the expression reached.", -1
-        if len(self.stack) > 0:
-            if self.stack[-1] == "(":
+                return postfix, postfix_places, "Error: invalid number.", i
+            action = transitions[self.current_state][self.classify(token)]
+
+            if action == TAKE_NUMBER or action == TAKE_VARIABLE:
+                if action == TAKE_VARIABLE:
+                    if self.variable_name == "":
+                        self.variable_name = token
+                    elif token != self.variable_name and not self.several_variables and self.name_mismatch is None:
+                        self.name_mismatch = \
+                            "Error: several names for variable: %s and %s." % (self.variable_name, token), i
+                        if not self.relations:
+                            return postfix, postfix_places, self.name_mismatch[0], i
+                if stack and stack[0] == "~":
+                    stack = stack[1]
+                postfix.append(token)
+                postfix_places.append(token_place)
+                self.current_state = AWAITING_OPERATOR
+            elif action == TAKE_OPERATOR or action == PUSH_UNARY_MINUS:
+                if action == PUSH_UNARY_MINUS:
+                    if stack and stack[0] == "~":
+                        return postfix, postfix_places, "Error: two unary '-' found for one operand.", i
+                    stack = ("~", stack)
+                else:   # A prefix operator has no left operand, so nothing is popped for it
+                    if token in self.relations:
+                        if self.relation is not None:
+                            return postfix, postfix_places, \
+                                "More than one '%s' symbols in expression can't be interpreted" % token, i
+                        if depth:
+                            return postfix, postfix_places, "Error: '%s' can't be put inside parentheses." % token, i
+                        self.relation = i
+                    self.current_state = AWAITING_OPERAND
+                    precedence = precedences.get(token, 0)
+                    while pending and pending[0] in precedences and \
+                            (precedence < precedences[pending[0]] or
+                             (precedence == precedences[pending[0]] and token not in right_associative)):
+                        top, top_place, pending = pending
+                        postfix.append(top)
+                        postfix_places.append(top_place)
+                pending = (token, token_place, pending)
+            elif action == PUSH_PARENTHESIS or action == OPEN_ARGUMENTS:
+                depth += 1
+                if depth > max_depth:
+                    return postfix, postfix_places, \
+                        "Error: parentheses are nested too deep (more than %d levels)." % max_depth, i
+                if action == PUSH_PARENTHESIS:
+                    stack = ("(", stack)
+                else:
+                    self.current_state = AWAITING_OPERAND
+                pending = (token, token_place, pending)
+            elif action == OPEN_FUNCTION:
+                if stack and stack[0] == "~":
+                    stack = stack[1]
+                stack = ("(", (token, stack))
+                for _ in range(self.arities[token] - 1):
+                    stack = ("A", stack)
+                pending = (token, token_place, pending)
+                self.current_state = AWAITING_PARENTHESIS
+            elif action == TAKE_COMMA:
+                if not stack:
+                    return postfix, postfix_places, "Error: ',' is put out of a function.", i
+                elif stack[0] == "(":
+                    if stack[1] and stack[1][0] in self.arities:
+                        return postfix, postfix_places, \
+                            "Error: wrong number of arguments for function %s." % stack[1][0], i
+                    return postfix, postfix_places, "Error: ',' is put out of a function.", i
+                elif stack[0] == "A":
+                    stack = stack[1]
+                    pending = pop_until_parenthesis(pending)
+                    self.current_state = AWAITING_OPERAND
+            elif action == CLOSE_PARENTHESIS:
+                if not stack:
+                    return postfix, postfix_places, "Error: unbalanced parentheses.", i
+                if stack[0] == "A":
+                    last_function = [node[0] for node in linked_items(stack) if node[0] in self.arities][0]
+                    return postfix, postfix_places, \
+                        "Error: wrong number of arguments for function %s." % last_function, i
+                stack = stack[1]
+                depth -= 1
+                pending = pop_until_parenthesis(pending)[2]    # Get rid of left parenthesis
+                if stack and stack[0] in self.arities:
+                    stack = stack[1]
+                    top, top_place, pending = pending
+                    postfix.append(top)
+                    postfix_places.append(top_place)
+            elif action == EXPECTED_OPERAND:
+                return postfix, postfix_places, "Error: expected operand, but '%s' is given." % token, i
+            elif action == EXPECTED_OPERATOR:
+                return postfix, postfix_places, "Error: expected operator, but '%s' is given." % token, i
+            else:
+                return postfix, postfix_places, \
+                    "Error: '(' is expected after a function name, but '%s' is given." % token, i
+
+        if unallowed_token < len(token_array):
+            raise ValueError("Unallowed character in token array: %s.", token_array[unallowed_token])
+        self.stack = stack
+        if snapshots is not None:
+            snapshots.append((self.current_state, stack, self.variable_name, depth, len(postfix),
+                              pending, self.relation, self.name_mismatch))
+
+        if self.current_state == AWAITING_PARENTHESIS:
+            return postfix, postfix_places, \
+                "Error: '(' is expected after a function name, but the end of the expression reached.", -1
+        if self.current_state == AWAITING_OPERAND:
+            return postfix, postfix_places, "Error: operand is expected, but the end of the expression reached.", -1
+        if stack:
+            if stack[0] == "(":
                 n = token_array.count("(") - token_array.count(")") - 1
                 pos = nth_item(n, "(", token_array)
-                return "Error: unbalanced parentheses.", pos
-            elif self.stack[-1] == "A":
+                return postfix, postfix_places, "Error: unbalanced parentheses.", pos
+            elif stack[0] == "A":
                 last_function_name, idx = "", -1
-                for i in range(1, len(self.stack) + 1):
-                    if self.stack[-i] in self.functions:
-                        last_function_name = self.stack[-i]
-                        idx = len(self.stack) - i - 1
+                items = [node[0] for node in linked_items(stack)][::-1]
+                for i in range(1, len(items) + 1):
+                    if items[-i] in self.functions:
+                        last_function_name = items[-i]
+                        idx = len(items) - i - 1
                         break
-                return "Error: wrong number of arguments for function %s." % last_function_name, idx
-        return None, None
-
-    def __state_operator(self, token):
-        if token in self.operators:
-            self.current_state = "operand"
-        elif token == ",":
-            if len(self.stack) == 0:
-                return "Error: ',' is put out of a function."
-            elif self.stack[-1] == "(":
-                if len(self.stack) > 1:
-                    if self.stack[-2] in self.functions:
-                        return "Error: wrong number of arguments for function %s." % self.stack[-2]
-                return "Error: ',' is put out of a function."
-            elif self.stack[-1] == "A":
-                self.stack.pop()
-                self.current_state = "operand"
-        elif token == ")":
-            if len(self.stack) == 0:
-                return "Error: unbalanced parentheses."
-            if self.stack[-1] == "A":
-                last_function = [token for token in self.stack[::-1] if token in self.functions][0]
-                return "Error: wrong number of arguments for function %s." % last_function
-            self.stack.pop()
-            if len(self.stack) > 0 and self.stack[-1] in self.functions:
-                self.stack.pop()
-        else:
-            return "Error: expected operator, but '%s' is given." % token
-
-    def __state_operand(self, token):
-        if token in self.functions:
-            if len(self.stack) > 0 and self.stack[-1] == "~":
-                self.stack.pop()
-            self.stack.append(token)
-            self.stack.append("(")
-            for _ in range(self.functions[token].__code__.co_argcount - 1):
-                self.stack.append("A")
-            self.current_state = "parenthesis"
-        elif token.replace(".", "").isalnum():
-            if token.isalpha():
-                if self.variable_name == "":
-                    self.variable_name = token
-                else:
-                    if token != self.variable_name:
-                        return "Error: several names for variable: %s and %s." % (self.variable_name, token)
-            if len(self.stack) > 0 and self.stack[-1] == "~":
-                self.stack.pop()
-            self.current_state = "operator"
-        elif token == "~":
-            if len(self.stack) > 0 and self.stack[-1] == "~":
-                return "Error: two unary '-' found for one operand."
-            self.stack.append("~")
-        elif token == "(":
-            self.stack.append("(")
-        else:
-            return "Error: expected operand, but '%s' is given." % token
+                return postfix, postfix_places, \
+                    "Error: wrong number of arguments for function %s." % last_function_name, idx
 
-    def __state_parenthesis(self, token):
-        if token == "(":
-            self.current_state = "operand"
-        else:
-            return "Error: '(' is expected after a function name, but '%s' is given." % token
+        for top, top_place, _ in linked_items(pending):
+            postfix.append(top)
+            postfix_places.append(top_place)
+        return postfix, postfix_places, None, None
@@ -0,0 +1,148 @@
+"""
+Solves systems of linear equations given as sparse rows (dictionaries column: coefficient).
+Small systems are solved by Gauss-Jordan elimination vectorized with numpy, large ones (or any system
+if numpy isn't available) by sparse Gaussian elimination choosing pivots by Markowitz' rule, so that
+little fill-in is created. Both report which equation contradicts the others and which variables
+can't be determined. Every row is scaled by its largest coefficient first, so tolerances don't depend
+on the magnitudes of other equations or of the right-hand sides.
+"""
+import heapq
+
+DENSE_MAX_COLUMNS = 200         # Systems with more variables are solved by sparse elimination
+ELIMINATION_TOLERANCE = 1e-10   # Coefficients below this share of the largest one of their row are rounding noise
+PIVOT_THRESHOLD = 0.1           # A pivot may be this much smaller than the largest coefficient of its row
+MAX_ELIMINATION_UPDATES = 2000000   # Coefficients sparse elimination may update (about a second of work)
+
+
+def solve_linear_system(rows, rhs, columns):
+    """
+    :param rows: list of dictionaries (column number: coefficient), one for each equation
+    :param rhs: list of right-hand sides
+    :param columns: the number of variables
+    :return: tuple (solution, inconsistent, free): solution is a list of values of the variables or None,
+    inconsistent is the number of an equation contradicting the others or None,
+    free is the list of columns which can't be determined
+    :raise NotImplementedError: if sparse elimination would take too long (because of too much fill-in)
+    """
+    numpy = None
+    if columns <= DENSE_MAX_COLUMNS:
+        try:
+            import numpy
+        except ImportError:
+            pass
+    if numpy is not None:
+        return _solve_dense(rows, rhs, columns, numpy)
+    return _solve_sparse(rows, rhs, columns)
+
+
+def _solve_dense(rows, rhs, columns, numpy):
+    matrix = numpy.zeros((len(rows), columns + 1))     # The last column is the right-hand side
+    for i, row in enumerate(rows):
+        for column, coefficient in row.items():
+            matrix[i, column] = coefficient
+    matrix[:, columns] = rhs
+    scales = numpy.abs(matrix[:, :columns]).max(axis=1) if columns else numpy.zeros(len(rows))
+    scales[scales == 0] = 1.
+    matrix /= scales[:, None]
+    magnitudes = numpy.abs(matrix[:, columns])     # Bounds of the right-hand sides the rows are combined from
+    order = numpy.arange(len(rows))     # Equations the rows came from
+    pivots = []
+    for column in range(columns):
+        top = len(pivots)
+        if top == len(rows):
+            break
+        k = top + int(numpy.argmax(numpy.abs(matrix[top:, column])))
+        if abs(matrix[k, column]) <= ELIMINATION_TOLERANCE:
+            continue
+        matrix[[top, k]] = matrix[[k, top]]
+        order[[top, k]] = order[[k, top]]
+        magnitudes[[top, k]] = magnitudes[[k, top]]
+        magnitudes[top] /= abs(matrix[top, column])
+        matrix[top] /= matrix[top, column]
+        factors = matrix[:, column].copy()
+        factors[top] = 0
+        matrix -= numpy.outer(factors, matrix[top])
+        magnitudes += numpy.abs(factors) * magnitudes[top]
+        pivots.append(column)
+
+    # Rows without pivots have no coefficients left, their right-hand sides must be rounding noise
+    rest = slice(len(pivots), None)
+    contradictions = order[rest][numpy.abs(matrix[rest, columns]) > ELIMINATION_TOLERANCE * magnitudes[rest]]
+    if len(contradictions):
+        return None, int(contradictions.min()), []
+    free = sorted(set(range(columns)) - set(pivots))
+    if free:
+        return None, None, free
+    solution = [0.] * columns
+    for i, column in enumerate(pivots):
+        solution[column] = float(matrix[i, columns])
+    return solution, None, []
+
+
+def _solve_sparse(rows, rhs, columns):
+    scales = [max(map(abs, row.values()), default=0.) or 1. for row in rows]
+    rows = [{column: coefficient / scale for column, coefficient in row.items()
+             if abs(coefficient) > ELIMINATION_TOLERANCE * scale} for row, scale in zip(rows, scales)]
+    rhs = [value / scale for value, scale in zip(rhs, scales)]
+    magnitudes = list(map(abs, rhs))    # Bounds of the right-hand sides the rows are combined from
+    updates = 0
+    column_rows = [set() for _ in range(columns)]     # Rows without pivots containing every column
+    for i, row in enumerate(rows):
+        for column in row:
+            column_rows[column].add(i)
+    heap = [(len(row), i) for i, row in enumerate(rows)]
+    heapq.heapify(heap)
+    pivoted = [False] * len(rows)
+    pivots = []     # (row, column) in order of elimination
+
+    while heap:
+        length, p = heapq.heappop(heap)
+        if pivoted[p] or length != len(rows[p]):
+            continue    # Outdated entry
+        if length == 0:
+            continue
+        row = rows[p]
+        largest = max(map(abs, row.values()))
+        # Markowitz' rule: the column occurring in the fewest rows among large enough coefficients
+        column = min((c for c, coefficient in row.items() if abs(coefficient) >= PIVOT_THRESHOLD * largest),
+                     key=lambda c: len(column_rows[c]))
+        pivoted[p] = True
+        pivots.append((p, column))
+        for c in row:
+            column_rows[c].discard(p)
+        pivot = row[column]
+        updates += len(row) * len(column_rows[column])
+        if updates > MAX_ELIMINATION_UPDATES:
+            raise NotImplementedError("Error: the system is too large to be solved, its elimination fills in "
+                                      "too many coefficients.")
+        for r in list(column_rows[column]):
+            target = rows[r]
+            factor = target[column] / pivot
+            for c, coefficient in row.items():
+                value = target.get(c, 0.) - factor * coefficient
+                if c == column or abs(value) <= ELIMINATION_TOLERANCE:
+                    if c in target:
+                        del target[c]
+                        column_rows[c].discard(r)
+                else:
+                    if c not in target:
+                        column_rows[c].add(r)
+                    target[c] = value
+            rhs[r] -= factor * rhs[p]
+            magnitudes[r] += abs(factor) * magnitudes[p]
+            heapq.heappush(heap, (len(target), r))
+
+    contradictions = [i for i, row in enumerate(rows)
+                      if not pivoted[i] and abs(rhs[i]) > ELIMINATION_TOLERANCE * magnitudes[i]]
+    if contradictions:
+        return None, contradictions[0], []
+    pivot_columns = {column for _, column in pivots}
+    free = [column for column in range(columns) if column not in pivot_columns]
+    if free:
+        return None, None, free
+    solution = [0.] * columns
+    for p, column in reversed(pivots):
+        row = rows[p]
+        solution[column] = (rhs[p] - sum(coefficient * solution[c] for c, coefficient in row.items()
+                                         if c != column)) / row[column]
+    return solution, None, []
@@ -0,0 +1,88 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    # Size-bounded mapping which forgets the least recently used entries first
+    def __init__(self, maxsize=1024, maxweight=None, weigh=None):
+        """
+        Creates an empty cache
+        :param maxsize: the maximal number of entries kept, 0 disables caching at all
+        :param maxweight: the maximal total weight of entries kept, None means no limit.
+        An entry heavier than that alone isn't cached
+        :param weigh: function of two arguments (key, value) computing the weight of an entry, 1 by default
+        :return:
+        """
+        if maxsize < 0:
+            raise ValueError("Cache size can't be negative")
+        self.maxsize = maxsize
+        self.maxweight = maxweight
+        self.weigh = weigh if weigh is not None else lambda key, value: 1
+        self.weight = 0     # Total weight of the entries kept
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__entries = OrderedDict()
+        self.__lock = Lock()
+
+    def get(self, key, factory):
+        """
+        Looks up a value, computes and stores it in case of a miss
+        :param key: any hashable object
+        :param factory: function of one argument (the key) computing the value
+        :return: the cached or freshly computed value
+        """
+        with self.__lock:
+            if key in self.__entries:
+                self.hits += 1
+                self.__entries.move_to_end(key)
+                return self.__entries[key][0]
+            self.misses += 1
+
+        value = factory(key)
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        if self.maxsize == 0:
+            return
+        weight = self.weigh(key, value)
+        with self.__lock:
+            self.weight -= self.__entries.pop(key, (None, 0))[1]
+            if self.maxweight is not None and weight > self.maxweight:
+                return
+            self.__entries[key] = value, weight
+            self.weight += weight
+            while len(self.__entries) > self.maxsize or \
+                    (self.maxweight is not None and self.weight > self.maxweight):
+                self.weight -= self.__entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def discard(self, key):
+        """
+        Removes an entry if it is cached
+        :param key:
+        :return:
+        """
+        with self.__lock:
+            self.weight -= self.__entries.pop(key, (None, 0))[1]
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.weight = 0
+            self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def stats(self):
+        """
+        :return: a dictionary with the current counters of the cache
+        """
+        return {"size": len(self.__entries), "maxsize": self.maxsize,
+                "weight": self.weight, "maxweight": self.maxweight,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def __len__(self):
+        return len(self.__entries)
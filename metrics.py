@@ -0,0 +1,199 @@
+from bisect import bisect_left
+from threading import Lock
+from time import perf_counter
+
+# Upper bounds of histogram buckets
+SECONDS_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5,
+                   1., 2.5, 5., 10.)
+SIZE_BUCKETS = (1, 3, 10, 30, 100, 300, 1000, 3000, 10000, 30000, 100000)
+
+
+class Histogram:
+    # Cumulative histogram in the sense of Prometheus: a value is counted in every bucket it doesn't exceed
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last one is +Inf
+        self.sum = 0.
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        # Adds observations of a histogram with the same buckets
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def cumulative_counts(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class Timer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe_stage(self.stage, perf_counter() - self.start)
+        return False
+
+
+class NullTimer:
+    # Used instead of Timer when metrics are disabled, so instrumented code pays only for one call
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class Metrics:
+    # Latencies of calculation stages, sizes of inputs and counts of errors
+    def __init__(self, enabled=False, prefix="calculator", max_error_labels=100):
+        """
+        :param enabled: nothing is recorded until enable() is called if False
+        :param prefix: prefix of names of all metrics
+        :param max_error_labels: the number of distinct error messages counted separately,
+        the others are counted together (messages may contain parts of expressions)
+        :return:
+        """
+        self.enabled = enabled
+        self.prefix = prefix
+        self.max_error_labels = max_error_labels
+        self.__stage_seconds = {}
+        self.__input_sizes = {}
+        self.__errors = {}
+        self.__lock = Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.__lock:
+            self.__stage_seconds.clear()
+            self.__input_sizes.clear()
+            self.__errors.clear()
+
+    def drain(self):
+        """
+        Takes everything recorded so far, e.g. to send it from a worker process to the server process
+        :return: data for merge, None if nothing was recorded
+        """
+        with self.__lock:
+            if not (self.__stage_seconds or self.__input_sizes or self.__errors):
+                return None
+            data = self.__stage_seconds, self.__input_sizes, self.__errors
+            self.__stage_seconds, self.__input_sizes, self.__errors = {}, {}, {}
+        return data
+
+    def merge(self, data):
+        """
+        :param data: result of drain of another Metrics
+        :return:
+        """
+        if not self.enabled or data is None:
+            return
+        stage_seconds, input_sizes, errors = data
+        with self.__lock:
+            for own, other in ((self.__stage_seconds, stage_seconds), (self.__input_sizes, input_sizes)):
+                for label, histogram in other.items():
+                    if label in own:
+                        own[label].merge(histogram)
+                    else:
+                        own[label] = histogram
+            for message, count in errors.items():
+                if message not in self.__errors and len(self.__errors) >= self.max_error_labels:
+                    message = "other"
+                self.__errors[message] = self.__errors.get(message, 0) + count
+
+    def timer(self, stage):
+        """
+        :param stage: name of a stage
+        :return: a context manager measuring the time spent within it
+        """
+        return Timer(self, stage) if self.enabled else NULL_TIMER
+
+    def observe_stage(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self.__lock:
+            if stage not in self.__stage_seconds:
+                self.__stage_seconds[stage] = Histogram(SECONDS_BUCKETS)
+            self.__stage_seconds[stage].observe(seconds)
+
+    def observe_size(self, unit, size):
+        """
+        :param unit: what is counted, e.g. "characters" or "tokens"
+        :param size:
+        :return:
+        """
+        if not self.enabled:
+            return
+        with self.__lock:
+            if unit not in self.__input_sizes:
+                self.__input_sizes[unit] = Histogram(SIZE_BUCKETS)
+            self.__input_sizes[unit].observe(size)
+
+    def count_error(self, message):
+        if not self.enabled:
+            return
+        with self.__lock:
+            if message not in self.__errors and len(self.__errors) >= self.max_error_labels:
+                message = "other"
+            self.__errors[message] = self.__errors.get(message, 0) + 1
+
+    def render(self):
+        """
+        :return: all metrics in Prometheus text exposition format
+        """
+        def escape(value):
+            return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+        def format_bound(bound):
+            return "+Inf" if bound == float("inf") else repr(float(bound))
+
+        def render_histograms(name, help_text, label, histograms):
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s histogram" % name)
+            for label_value, histogram in sorted(histograms.items()):
+                label_value = escape(label_value)
+                for bound, count in histogram.cumulative_counts():
+                    lines.append('%s_bucket{%s="%s",le="%s"} %d' % (name, label, label_value, format_bound(bound),
+                                                                    count))
+                lines.append('%s_sum{%s="%s"} %r' % (name, label, label_value, histogram.sum))
+                lines.append('%s_count{%s="%s"} %d' % (name, label, label_value, histogram.count))
+
+        lines = []
+        with self.__lock:
+            render_histograms(self.prefix + "_stage_seconds", "Time spent in a stage of calculation.",
+                              "stage", self.__stage_seconds)
+            render_histograms(self.prefix + "_input_size", "Size of inputs.", "unit", self.__input_sizes)
+            name = self.prefix + "_errors_total"
+            lines.append("# HELP %s Errors reported to users." % name)
+            lines.append("# TYPE %s counter" % name)
+            for message, count in sorted(self.__errors.items()):
+                lines.append('%s{message="%s"} %d' % (name, escape(message), count))
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()  # Shared by all modules, disabled by default
@@ -0,0 +1,316 @@
+"""
+Numeric solution of equations the polynomial arithmetic can't handle (logarithms of the variable, division
+by polynomials, fractional powers etc.). A postfix program is compiled to work on dual numbers, so every
+evaluation gives the exact derivative too (forward-mode automatic differentiation), and roots are found by
+Newton's method safeguarded by bisection inside brackets where the function or its derivative changes its sign.
+Equations with division by polynomials only are rational, they are reduced to polynomials instead.
+"""
+import math
+
+from codegen import PYTHON_OPERATORS, compile_postfix
+from operand import Operand
+
+SEARCH_LIMIT = 1e6      # Roots are looked for in [-SEARCH_LIMIT, SEARCH_LIMIT]
+SMALLEST_STEP = 1e-6    # The grid of brackets is logarithmic from this distance to 0 up to SEARCH_LIMIT
+STEPS_PER_DECADE = 20
+MAX_ITERATIONS = 100
+TOLERANCE = 1e-12       # Relative accuracy of roots
+MAX_PROGRAM_LENGTH = 2000   # Longer programs would take too long to evaluate on the whole grid
+
+
+class Dual:
+    # A number a + b*e where e*e = 0: functions of Dual(x, 1) give their value at x and their derivative
+    __slots__ = ("value", "derivative")
+
+    def __init__(self, value, derivative=0.):
+        self.value = value
+        self.derivative = derivative
+
+    def __add__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value + other.value, self.derivative + other.derivative)
+        return Dual(self.value + other, self.derivative)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value - other.value, self.derivative - other.derivative)
+        return Dual(self.value - other, self.derivative)
+
+    def __rsub__(self, other):
+        return Dual(other - self.value, -self.derivative)
+
+    def __neg__(self):
+        return Dual(-self.value, -self.derivative)
+
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value * other.value, self.derivative * other.value + self.value * other.derivative)
+        return Dual(self.value * other, self.derivative * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value / other.value,
+                        (self.derivative * other.value - self.value * other.derivative) / (other.value * other.value))
+        return Dual(self.value / other, self.derivative / other)
+
+    def __rtruediv__(self, other):
+        return Dual(other / self.value, -other * self.derivative / (self.value * self.value))
+
+    def __pow__(self, other):
+        return dual_power(self, other)
+
+    def __rpow__(self, other):
+        return dual_power(other, self)
+
+    def __repr__(self):
+        return "Dual(%r, %r)" % (self.value, self.derivative)
+
+
+def dual_power(base, exponent):
+    """
+    Raises numbers or Duals to powers, invalid powers (like fractional powers of negative numbers)
+    raise ValueError, as math.pow does
+    """
+    if not isinstance(exponent, Dual):
+        if not isinstance(base, Dual):
+            return math.pow(base, exponent)
+        if exponent == 0:
+            return Dual(1.)
+        if base.value == 0 and 0 < exponent < 1:
+            # Roots like sqrt(x) are defined at 0, but their derivative is infinite there
+            return Dual(0., math.copysign(math.inf, base.derivative) if base.derivative else 0.)
+        return Dual(math.pow(base.value, exponent),
+                    exponent * math.pow(base.value, exponent - 1) * base.derivative)
+    if not isinstance(base, Dual):
+        base = Dual(base)
+    value = math.pow(base.value, exponent.value)
+    return Dual(value, value * (exponent.derivative * math.log(base.value) +
+                                exponent.value * base.derivative / base.value))
+
+
+def dual_log(x):
+    if isinstance(x, Dual):
+        return Dual(math.log(x.value), x.derivative / x.value)
+    return math.log(x)
+
+
+DUAL_OPERATORS = {"+": lambda x, y: x + y,
+                  "-": lambda x, y: x - y,
+                  "*": lambda x, y: x * y,
+                  "/": lambda x, y: x / y,
+                  "^": dual_power,
+                  "~": lambda x: -x,
+                  "=": lambda x, y: x - y}
+
+DUAL_FUNCTIONS = {"log": lambda x, y: dual_log(y) / dual_log(x),
+                  "ln": dual_log}
+
+# Python's '**' makes complex numbers of fractional powers of negative numbers, so powers are called
+DUAL_PYTHON_OPERATORS = {token: operator for token, operator in PYTHON_OPERATORS.items() if token != "^"}
+
+
+def compile_dual(postfix, variable):
+    """
+    :param postfix: tokens of a correct program in postfix form
+    :param variable: the name of its only variable
+    :return: a function of a number returning the value of the program and its derivative there,
+    (nan, nan) where the program is undefined
+    """
+    program = compile_postfix(postfix, dict(DUAL_OPERATORS, **DUAL_FUNCTIONS), float, (variable,),
+                              DUAL_PYTHON_OPERATORS)
+
+    def function(x):
+        try:
+            result = program(Dual(x, 1.))
+        except (ArithmeticError, ValueError):   # Division by zero, overflow, logarithms of negative numbers
+            return math.nan, math.nan
+        if isinstance(result, Dual):
+            return result.value, result.derivative
+        return result, 0.
+    return function
+
+
+def evaluate_rational(postfix, variable, max_degree):
+    """
+    Evaluates a program of arithmetic operations and integer powers as a rational function
+    :param postfix: tokens of a correct program in postfix form
+    :param variable: the name of its only variable
+    :param max_degree: the largest degree of the numerator and the denominator
+    :return: tuple of dense Operands (numerator, denominator), they may have common factors,
+    or None if the program isn't a rational function of its variable (or its degree is too large)
+    """
+    one = Operand([1])
+
+    def fraction(numerator, denominator):
+        if max(numerator.degree, denominator.degree) > max_degree:
+            raise OverflowError("The degree is too large")
+        return numerator, denominator
+
+    def combine(x, y, operation):
+        if x[1] == y[1]:
+            return fraction(operation(x[0], y[0]), x[1])
+        return fraction(operation(x[0] * y[1], y[0] * x[1]), x[1] * y[1])
+
+    def divide(x, y):
+        if not any(y[0].polynomial):
+            raise ZeroDivisionError("Division by zero")
+        return fraction(x[0] * y[1], x[1] * y[0])
+
+    def power(x, y):
+        if y[0].degree > 0 or y[1].degree > 0:
+            raise ValueError("The exponent depends on the variable")
+        exponent = y[0].polynomial[0] / y[1].polynomial[0]
+        if x[0].degree == 0 and x[1].degree == 0:
+            return Operand([math.pow(x[0].polynomial[0] / x[1].polynomial[0], exponent)]), one
+        if not exponent.is_integer() or abs(exponent) > max_degree:
+            raise ValueError("The exponent isn't a small integer")
+        if exponent < 0:
+            x = divide((one, one), x)
+        exponent = Operand([abs(exponent)])
+        return fraction(x[0] ** exponent, x[1] ** exponent)
+
+    operators = {"+": lambda x, y: combine(x, y, Operand.__add__),
+                 "-": lambda x, y: combine(x, y, Operand.__sub__),
+                 "*": lambda x, y: fraction(x[0] * y[0], x[1] * y[1]),
+                 "/": divide,
+                 "^": power,
+                 "~": lambda x: (Operand([0]) - x[0], x[1]),
+                 "=": lambda x, y: combine(x, y, Operand.__sub__)}
+    if any(token in DUAL_FUNCTIONS for token in postfix):
+        return None
+    try:
+        program = compile_postfix(postfix, operators, lambda token: (Operand([float(token)]), one), (variable,),
+                                  {})
+        return program((Operand([0, 1]), one))
+    except (ArithmeticError, ValueError, NotImplementedError):
+        return None
+
+
+def relative_value(polynomial, x):
+    """
+    :param polynomial: coefficients, the lowest degree first
+    :param x: a real or complex number
+    :return: |p(x)| / sum(|c_i| |x|^i), it is about the rounding error where p(x) is 0
+    """
+    value, scale = 0, 0.
+    for coefficient in reversed(polynomial):
+        value = value * x + coefficient
+        scale = scale * abs(x) + abs(coefficient)
+    return abs(value) / scale if scale else 0.
+
+
+class NumericSolver:
+    @staticmethod
+    def solve(function, limit=SEARCH_LIMIT):
+        """
+        Finds real roots of a function where it changes its sign, and where it touches zero or changes its sign
+        twice between points of the grid, at extrema (where its derivative changes its sign).
+        Roots between points of the grid at which the derivative keeps its sign may still be missed
+        :param function: a function returning its value and derivative, like those compile_dual returns
+        :param limit: roots are looked for in [-limit, limit]
+        :return: tuple (sorted list of roots or None if the function is zero wherever it is defined,
+        True if the function is defined anywhere on the grid). Roots are rounded to their accuracy
+        """
+        grid = NumericSolver.grid(limit)
+        points = [function(x) for x in grid]
+        values = [value for value, _ in points]
+        # Zeros of the grid are roots, unless their neighbours are zero too (the function underflows there)
+        roots = [x for i, x in enumerate(grid) if values[i] == 0 and values[max(i - 1, 0)] and
+                 values[min(i + 1, len(values) - 1)]]
+        for low, high, (f_low, d_low), (f_high, d_high) in zip(grid, grid[1:], points, points[1:]):
+            if not (math.isfinite(f_low) and math.isfinite(f_high)):
+                continue
+            pieces = [(low, high, f_low, f_high)]
+            if d_low * d_high < 0:
+                extremum = NumericSolver.extremum(function, low, high, d_low)
+                f_extremum = function(extremum)[0] if extremum is not None else math.nan
+                if math.isfinite(f_extremum):
+                    pieces = [(low, extremum, f_low, f_extremum), (extremum, high, f_extremum, f_high)]
+                    if f_extremum * f_low >= 0 and f_extremum * f_high >= 0 and \
+                            abs(f_extremum) <= 1e-12 * (1 + max(abs(f_low), abs(f_high))):  # It touches zero
+                        roots.append(extremum)
+            for bracket in pieces:
+                if not bracket[2] * bracket[3] < 0:
+                    continue
+                root = NumericSolver.safeguarded_newton(function, *bracket)
+                # A sign change across a pole isn't a root
+                value = function(root)[0] if root is not None else math.nan
+                if abs(value) <= 1e-8 * (1 + max(abs(bracket[2]), abs(bracket[3]))):
+                    roots.append(root)
+        defined = [value for value in values if math.isfinite(value)]
+        if defined and not any(defined):
+            return None, True
+        return sorted({float("%.12g" % root) for root in roots}), bool(defined)
+
+    @staticmethod
+    def grid(limit=SEARCH_LIMIT):
+        """
+        :return: sorted points of [-limit, limit], dense near 0 and sparse far from it
+        """
+        decades = math.log10(limit / SMALLEST_STEP)
+        steps = max(1, int(math.ceil(decades * STEPS_PER_DECADE)))
+        positive = [SMALLEST_STEP * 10 ** (decades * i / steps) for i in range(steps + 1)]
+        return [-x for x in reversed(positive)] + [0.] + positive
+
+    @staticmethod
+    def extremum(function, low, high, d_low, max_iterations=MAX_ITERATIONS):
+        """
+        Finds an extremum by bisection on the derivative (the second derivative isn't known)
+        :param low, high: the bracket, the derivative must have opposite signs at its ends, d_low at low
+        :return: the extremum or None if the function is undefined somewhere inside the bracket
+        """
+        for _ in range(max_iterations):
+            middle = 0.5 * (low + high)
+            if abs(high - low) <= TOLERANCE * max(1., abs(middle)):
+                break
+            derivative = function(middle)[1]
+            if math.isnan(derivative):
+                return None
+            if derivative == 0:
+                return middle
+            if (derivative < 0) == (d_low < 0):
+                low = middle
+            else:
+                high = middle
+        return 0.5 * (low + high)
+
+    @staticmethod
+    def safeguarded_newton(function, low, high, f_low, f_high, max_iterations=MAX_ITERATIONS):
+        """
+        Newton's method which falls back to bisection whenever a step leaves the bracket
+        or doesn't shrink it fast enough, so it converges quadratically near simple roots and always converges
+        :param low, high: the bracket, the function must have opposite signs f_low and f_high at its ends
+        :return: the root or None if the function is undefined somewhere inside the bracket
+        """
+        if f_low > 0:   # The function is negative at low from now on
+            low, high = high, low
+        x = 0.5 * (low + high)
+        step = abs(high - low)
+        value, derivative = function(x)
+        for _ in range(max_iterations):
+            if not math.isfinite(value):
+                return None
+            if value == 0:
+                return x
+            if value < 0:
+                low = x
+            else:
+                high = x
+            previous_step, step = step, None
+            if math.isfinite(derivative) and derivative != 0:
+                candidate = x - value / derivative
+                # The step must stay inside the bracket and be at most half of the step before the previous one
+                if min(low, high) <= candidate <= max(low, high) and abs(2 * value) <= abs(previous_step * derivative):
+                    step = abs(candidate - x)
+            if step is None:
+                candidate = 0.5 * (low + high)
+                step = abs(high - low) / 2
+            if step <= TOLERANCE * max(1., abs(candidate)):
+                return candidate
+            x = candidate
+            value, derivative = function(x)
+        return x
@@ -1,90 +1,288 @@
 import math
+from array import array
+from itertools import repeat
+from operator import add, mul, sub
+
+KARATSUBA_THRESHOLD = 32    # Length of the shorter factor from which Karatsuba multiplication is used
+FFT_THRESHOLD = 64          # Length of the shorter factor from which FFT multiplication is used (needs numpy)
+NEWTON_DIVISION_THRESHOLD = 32  # Length of divisor and quotient from which division goes through a reciprocal
+REMAINDER_TOLERANCE = 1e-12     # Remainder terms below this share of the dividend are rounding noise
 
 
 class Operand:
     # We represent operands as polynomials.
-    # It is possible until we have to work with several variables.
+    # Polynomials of one variable are dense: coefficients are kept in a compact array of doubles,
+    # the lowest degree first, the variable itself is implicit.
+    # Polynomials of several variables are sparse: a dictionary (monomial: nonzero coefficient), where a monomial
+    # is a tuple of pairs (variable name, exponent) sorted by names, () is the constant term.
+    # Constants are always dense, so they mix with both kinds.
     def __init__(self, polynomial):
-        self.polynomial = []
-        self.polynomial.extend(list(polynomial))
+        self.terms = None
+        self.polynomial = array('d', polynomial)
+        self.__degree = None    # Cached degree and finiteness of a sparse polynomial, None if unknown
+        self.__finite = None
         while len(self.polynomial) > 1:
             if self.polynomial[-1] == 0:
                 self.polynomial.pop()
             else:
                 break
 
+    @classmethod
+    def sparse(cls, terms):
+        """
+        :param terms: a dictionary (monomial: coefficient), zero coefficients are dropped
+        :return: an Operand, it is dense if the polynomial is a constant
+        """
+        terms = {monomial: coefficient for monomial, coefficient in terms.items() if coefficient != 0}
+        if not terms or (len(terms) == 1 and () in terms):
+            return cls([terms.get((), 0.)])
+        operand = cls.__new__(cls)
+        operand.terms = terms
+        operand.polynomial = None
+        operand.__degree = None
+        operand.__finite = None
+        return operand
+
+    @classmethod
+    def variable(cls, name):
+        return cls.sparse({((name, 1),): 1.})
+
+    @property
+    def degree(self):
+        if self.terms is None:
+            return len(self.polynomial) - 1
+        if self.__degree is None:
+            self.__degree = max(map(_monomial_degree, self.terms))
+        return self.__degree
+
+    @property
+    def size(self):
+        """
+        :return: the number of coefficients kept
+        """
+        return len(self.polynomial) if self.terms is None else len(self.terms)
+
+    def is_finite(self):
+        """
+        :return: False if any coefficient is infinite or NaN (after an overflow)
+        """
+        if self.terms is None:
+            return all(map(math.isfinite, self.polynomial))
+        if self.__finite is None:
+            self.__finite = all(map(math.isfinite, self.terms.values()))
+        return self.__finite
+
+    def variable_names(self):
+        """
+        :return: sorted tuple of names of variables of a sparse polynomial, () for a dense one
+        """
+        if self.terms is None:
+            return ()
+        return tuple(sorted({name for monomial in self.terms for name, _ in monomial}))
+
+    def to_sparse(self, variable=None):
+        """
+        :param variable: the name of the variable of a dense polynomial (not needed for constants)
+        :return: the same polynomial as an Operand kept sparse (unless it is a constant)
+        """
+        if self.terms is not None or len(self.polynomial) == 1:
+            return self
+        if variable is None:
+            raise ValueError("The variable of a dense polynomial is needed to make it sparse")
+        return Operand.sparse({((variable, degree),) if degree else (): coefficient
+                               for degree, coefficient in enumerate(self.polynomial)})
+
+    def to_dense(self, variable):
+        """
+        :param variable: the only variable the polynomial may depend on
+        :return: the same polynomial as a dense Operand
+        """
+        if self.terms is None:
+            return self
+        polynomial = [0.] * (self.degree + 1)
+        for monomial, coefficient in self.terms.items():
+            if monomial and (len(monomial) > 1 or monomial[0][0] != variable):
+                raise ValueError("The polynomial depends on variables other than %s" % variable)
+            polynomial[monomial[0][1] if monomial else 0] = coefficient
+        return Operand(polynomial)
+
+    def __sparse_terms(self):
+        if self.terms is not None:
+            return self.terms
+        if len(self.polynomial) > 1:
+            raise ValueError("Dense and sparse polynomials may be combined only if the dense one is a constant")
+        return {(): self.polynomial[0]} if self.polynomial[0] != 0 else {}
+
     def __add__(self, other):
-        if len(self.polynomial) < len(other.polynomial):
-            tmp_self = self.polynomial + [0] * (len(other.polynomial) - len(self.polynomial))
-            result = list(map(lambda t: t[0] + t[1], zip(tmp_self, other.polynomial)))
-            while len(result) > 1 and result[-1] == 0:
-                result.pop()
-            return Operand(result)
-        else:
-            tmp_other = other.polynomial + [0] * (len(self.polynomial) - len(other.polynomial))
-            result = list(map(lambda t: t[0] + t[1], zip(self.polynomial, tmp_other)))
-            while len(result) > 1 and result[-1] == 0:
-                result.pop()
-            return Operand(result)
+        if self.terms is None and other.terms is None:
+            return Operand(self.__combine(self.polynomial, other.polynomial, add))
+        return Operand.sparse(_combine_terms(self.__sparse_terms(), other.__sparse_terms(), add))
 
     def __sub__(self, other):
-        if len(self.polynomial) < len(other.polynomial):
-            tmp_self = self.polynomial + [0] * (len(other.polynomial) - len(self.polynomial))
-            result = list(map(lambda t: t[0] - t[1], zip(tmp_self, other.polynomial)))
-            while len(result) > 1 and result[-1] == 0:
-                result.pop()
-            return Operand(result)
-        else:
-            tmp_other = other.polynomial + [0] * (len(self.polynomial) - len(other.polynomial))
-            result = list(map(lambda t: t[0] - t[1], zip(self.polynomial, tmp_other)))
-            while len(result) > 1 and result[-1] == 0:
-                result.pop()
-            return Operand(result)
+        if self.terms is None and other.terms is None:
+            return Operand(self.__combine(self.polynomial, other.polynomial, sub))
+        return Operand.sparse(_combine_terms(self.__sparse_terms(), other.__sparse_terms(), sub))
 
-    def __mul__(self, other):
-        result = [0] * (len(self.polynomial) + len(other.polynomial) - 1)
-        for i, term in enumerate(self.polynomial):
-            tmp_poly = [0] * i + \
-                       [t * term for t in other.polynomial] + \
-                       [0] * (len(result) - len(other.polynomial))
+    def __iadd__(self, other):
+        return self.__accumulate(other, add)
 
-            result = [r + t for r, t in zip(result, tmp_poly)]
-        while len(result) > 1 and result[-1] == 0:
-            result.pop()
-        return Operand(result)
+    def __isub__(self, other):
+        return self.__accumulate(other, sub)
+
+    def __accumulate(self, other, operation):
+        """
+        Adds or subtracts other changing a sparse polynomial in place, in time proportional to the number of terms
+        of other (so a long sum is built in linear time), the caller must be the only owner of the polynomial
+        :return: the result, this Operand unless it becomes a constant (or it is dense)
+        """
+        if self.terms is None:
+            return operation(self, other)
+        terms = self.terms
+        for monomial, coefficient in other.__sparse_terms().items():
+            coefficient = operation(terms.get(monomial, 0.), coefficient)
+            if coefficient != 0:
+                terms[monomial] = coefficient
+                if self.__degree is not None:
+                    self.__degree = max(self.__degree, _monomial_degree(monomial))
+                if self.__finite and not math.isfinite(coefficient):
+                    self.__finite = False
+            elif terms.pop(monomial, None) is not None and self.__degree == _monomial_degree(monomial):
+                self.__degree = None
+        if not terms or (len(terms) == 1 and () in terms):
+            return Operand.sparse(terms)
+        return self
+
+    @staticmethod
+    def __combine(first, second, operation):
+        result = array('d', map(operation, first, second))
+        if len(first) > len(second):
+            result.extend(first[len(second):])
+        elif len(second) > len(first):
+            result.extend(map(operation, repeat(0., len(second) - len(first)), second[len(first):]))
+        return result
+
+    def __mul__(self, other):
+        if self.terms is None and other.terms is None:
+            return Operand(_multiply(self.polynomial, other.polynomial))
+        return Operand.sparse(_multiply_terms(self.__sparse_terms(), other.__sparse_terms()))
 
     def __truediv__(self, other):
+        if self.terms is not None or other.terms is not None:
+            return self.__divide_sparse(other)
         if len(other.polynomial) > len(self.polynomial):
             raise NotImplementedError("Error: negative degrees aren't implemented yet.")
 
-        dividend = Operand(self.polynomial)
-        result = []
-        while len(dividend.polynomial) > len(other.polynomial):
-            try:
-                coef = dividend.polynomial[-1] / other.polynomial[-1]
-            except ZeroDivisionError:
-                raise ZeroDivisionError("Error: division by zero.")
-            result += [coef]
-            div_len = len(dividend.polynomial)
-            dividend -= Operand([coef]) * other * Operand([0] *
-                                                          (len(dividend.polynomial) - len(other.polynomial)) + [1])
-
-            # After subtraction the degree of dividend MUST decrease
-            if div_len - len(dividend.polynomial) == 0:
-                dividend.polynomial.pop()
+        quotient, remainder = divmod(self, other)
+        # Remainders of exact divisions may still contain rounding noise
+        scale = max(map(abs, self.polynomial))
+        if any(abs(term) > REMAINDER_TOLERANCE * scale for term in remainder.polynomial):
+            raise NotImplementedError("Error: division of polynomials leaves a remainder %s, "
+                                      "rational functions aren't implemented yet." % remainder)
+        return quotient
 
-        try:
-            coef = dividend.polynomial[-1] / other.polynomial[-1]
-        except ZeroDivisionError:
+    def __divide_sparse(self, other):
+        """
+        Divides polynomials of several variables, only constant and single-term divisors are supported
+        """
+        divisor = other.__sparse_terms()
+        if not divisor:
             raise ZeroDivisionError("Error: division by zero.")
-        result += [coef]
+        if len(divisor) > 1:
+            raise NotImplementedError("Error: division by polynomials of several terms isn't implemented "
+                                      "for several variables yet.")
+        (divisor_monomial, divisor_coefficient), = divisor.items()
+        divisor_exponents = dict(divisor_monomial)
+        terms = {}
+        for monomial, coefficient in self.__sparse_terms().items():
+            exponents = dict(monomial)
+            for name, exponent in divisor_exponents.items():
+                exponents[name] = exponents.get(name, 0) - exponent
+                if exponents[name] < 0:
+                    raise NotImplementedError("Error: negative degrees aren't implemented yet.")
+            monomial = tuple((name, exponent) for name, exponent in sorted(exponents.items()) if exponent)
+            terms[monomial] = coefficient / divisor_coefficient
+        return Operand.sparse(terms)
 
-        result = result[::-1]
-        while len(result) > 1 and result[-1] == 0:
-            result.pop()
-        return Operand(result)
+    def __divmod__(self, other):
+        """
+        Divides polynomials with a remainder (of one variable)
+        :param other: the divisor
+        :return: tuple of Operands (quotient, remainder), the degree of remainder is less than the divisor's one
+        """
+        if self.terms is not None or other.terms is not None:
+            raise NotImplementedError("Error: division with a remainder isn't implemented for several variables.")
+        divisor = other.polynomial
+        if len(divisor) == 0 or divisor[-1] == 0:
+            raise ZeroDivisionError("Error: division by zero.")
+        if len(divisor) > len(self.polynomial):
+            return Operand([0]), Operand(self.polynomial)
+
+        quotient_length = len(self.polynomial) - len(divisor) + 1
+        quotient = None
+        if len(divisor) >= NEWTON_DIVISION_THRESHOLD and quotient_length >= NEWTON_DIVISION_THRESHOLD:
+            quotient = _newton_divide(self.polynomial, divisor)
+            product = _multiply(divisor, quotient)
+            # The reciprocal series grows exponentially if the divisor has roots outside of the unit circle,
+            # in this case its result is inaccurate (which shows in the high terms) and long division is used
+            scale = max(map(abs, self.polynomial))
+            if any(not abs(term - expected) <= REMAINDER_TOLERANCE * scale
+                   for term, expected in zip(product[len(divisor) - 1:], self.polynomial[len(divisor) - 1:])):
+                quotient = None
+        if quotient is None:
+            quotient, remainder = _synthetic_divide(self.polynomial, divisor)
+        else:
+            remainder = array('d', map(sub, self.polynomial[:len(divisor) - 1], product))
+        return Operand(quotient), Operand(remainder or [0])
+
+    def __pow__(self, other):
+        """
+        :param other: the exponent, a constant; a polynomial may be raised only to a non-negative integer power
+        :return: an Operand, computed by binomial expansion for binomials and by repeated squaring otherwise
+        """
+        if other.terms is not None or len(other.polynomial) > 1:
+            raise NotImplementedError("Error: exponents must be numbers, not polynomials.")
+        exponent = other.polynomial[0]
+        if self.terms is None and len(self.polynomial) == 1:
+            return Operand([_power(self.polynomial[0], exponent)])
+        if exponent < 0 or not exponent.is_integer():
+            raise NotImplementedError("Error: polynomials may be raised only to non-negative integer powers.")
+        exponent = int(exponent)
+
+        terms = self.__sparse_terms() if self.terms is not None else \
+            {degree: coefficient for degree, coefficient in enumerate(self.polynomial) if coefficient != 0}
+        if len(terms) <= 2:
+            # (a + b)^n = sum of C(n, k) a^k b^(n - k), n + 1 terms instead of log(n) multiplications
+            (first, first_coefficient), (second, second_coefficient) = (list(terms.items()) + [(0, 0.)])[:2]
+            if self.terms is not None and len(terms) == 1:
+                second = ()
+            result = {}
+            for k in range(exponent + 1) if len(terms) == 2 else (exponent,):
+                coefficient = _binomial(exponent, k) * _power(first_coefficient, k) * \
+                    _power(second_coefficient, exponent - k)
+                if self.terms is None:
+                    monomial = first * k + second * (exponent - k)
+                else:
+                    monomial = _multiply_monomials(_power_monomial(first, k), _power_monomial(second, exponent - k))
+                result[monomial] = coefficient
+            if self.terms is not None:
+                return Operand.sparse(result)
+            polynomial = [0.] * (self.degree * exponent + 1)
+            for degree, coefficient in result.items():
+                polynomial[degree] = coefficient
+            return Operand(polynomial)
+
+        result, square = Operand([1]), self
+        while exponent:
+            if exponent & 1:
+                result = result * square
+            exponent >>= 1
+            if exponent:
+                square = square * square
+        return result
 
     def __eq__(self, other):
+        if self.terms is not None or other.terms is not None:
+            return self.terms == other.terms
         if len(self.polynomial) != len(other.polynomial):
             return False
         for term_s, term_o in zip(self.polynomial, other.polynomial):
@@ -93,11 +291,11 @@ class Operand:
         return True
 
     def log(self, base):
-        if len(self.polynomial) > 1:
+        if self.terms is not None or len(self.polynomial) > 1:
             raise NotImplementedError("Error: logarithms are supported only for plain numbers.")
 
         if isinstance(base, Operand):
-            if len(base.polynomial) > 1:
+            if base.terms is not None or len(base.polynomial) > 1:
                 raise NotImplementedError("Error: logarithms are supported only for plain numbers.")
             if base.polynomial[0] <= 0 or base.polynomial[0] == 1:
                 raise ValueError("Error: illegal base for logarithm.")
@@ -114,12 +312,16 @@ class Operand:
             raise ValueError("Error: unacceptable base for logarithm.")
 
     def __str__(self):
-        return str(self.polynomial)
+        if self.terms is not None:
+            return str({_format_monomial(monomial): coefficient for monomial, coefficient in sorted(self.terms.items())})
+        return str(self.polynomial.tolist())
 
     def __repr__(self):
-        return str(self.polynomial)
+        return str(self)
 
     def varstring(self, varname):
+        if self.terms is not None:
+            raise NotImplementedError("Error: several variables aren't supported here yet.")
         result = ""
         if self.polynomial[0] != 0:
             coefficient = self.polynomial[0]
@@ -135,3 +337,252 @@ class Operand:
         elif len(self.polynomial) > 2:
             raise NotImplementedError("Error: degrees higher than 1 aren't implemented yet.")
         return result
+
+
+def _format_monomial(monomial):
+    return "*".join(name if exponent == 1 else "%s^%d" % (name, exponent) for name, exponent in monomial) or "1"
+
+
+def _power(base, exponent):
+    """
+    Raises a number to a power, overflow gives an infinity as multiplication does
+    """
+    if base == 0 and exponent < 0:
+        raise ZeroDivisionError("Error: division by zero.")
+    if base < 0 and not float(exponent).is_integer():
+        raise NotImplementedError("Error: fractional powers of negative numbers aren't implemented yet.")
+    try:
+        return base ** exponent
+    except OverflowError:
+        return math.copysign(math.inf, base) if exponent % 2 == 1 else math.inf
+
+
+def _binomial(n, k):
+    try:
+        return float(math.comb(n, k))
+    except OverflowError:
+        return math.inf
+
+
+def _monomial_degree(monomial):
+    return sum(exponent for _, exponent in monomial)
+
+
+def _power_monomial(monomial, exponent):
+    return tuple((name, power * exponent) for name, power in monomial) if exponent else ()
+
+
+def _combine_terms(first, second, operation):
+    """
+    Adds or subtracts sparse polynomials in time proportional to the number of terms of the second one
+    (plus copying the first one)
+    :param first: dictionary (monomial: coefficient)
+    :param second: dictionary (monomial: coefficient)
+    :param operation: add or sub
+    :return: dictionary (monomial: coefficient), it may contain zeros
+    """
+    result = dict(first)
+    for monomial, coefficient in second.items():
+        result[monomial] = operation(result.get(monomial, 0.), coefficient)
+    return result
+
+
+def _multiply_monomials(first, second):
+    if not first:
+        return second
+    if not second:
+        return first
+    exponents = dict(first)
+    for name, exponent in second:
+        exponents[name] = exponents.get(name, 0) + exponent
+    return tuple(sorted(exponents.items()))
+
+
+def _multiply_terms(first, second):
+    """
+    Multiplies sparse polynomials term by term, only nonzero terms are visited
+    :param first: dictionary (monomial: coefficient)
+    :param second: dictionary (monomial: coefficient)
+    :return: dictionary (monomial: coefficient), it may contain zeros
+    """
+    if len(first) < len(second):
+        first, second = second, first
+    if len(second) == 1 and () in second:    # Multiplication by a constant
+        factor = second[()]
+        return {monomial: coefficient * factor for monomial, coefficient in first.items()}
+    result = {}
+    for monomial_s, coefficient_s in second.items():
+        for monomial_f, coefficient_f in first.items():
+            monomial = _multiply_monomials(monomial_f, monomial_s)
+            result[monomial] = result.get(monomial, 0.) + coefficient_f * coefficient_s
+    return result
+
+
+def _multiply(first, second):
+    """
+    Chooses the fastest multiplication algorithm for the lengths given
+    :param first: array of coefficients
+    :param second: array of coefficients
+    :return: array of coefficients of the product (not trimmed)
+    """
+    shorter = min(len(first), len(second))
+    if shorter == 0:
+        return array('d')
+    if shorter >= FFT_THRESHOLD:
+        result = _fft_multiply(first, second)
+        if result is not None:
+            return result
+    if shorter >= KARATSUBA_THRESHOLD:
+        return array('d', _karatsuba_multiply(first.tolist(), second.tolist()))
+    return _schoolbook_multiply(first, second)
+
+
+def _schoolbook_multiply(first, second):
+    """
+    Multiplies polynomials term by term, exactly as it is done by hand
+    :param first: sequence of coefficients
+    :param second: sequence of coefficients
+    :return: array of coefficients of the product
+    """
+    if len(first) > len(second):
+        first, second = second, first   # Fewer (but longer) rows are faster
+    result = array('d', bytes(8 * (len(first) + len(second) - 1)))
+    length = len(second)
+    for i, term in enumerate(first):
+        if term != 0:
+            result[i:i + length] = array('d', map(add, result[i:i + length], map(mul, repeat(term), second)))
+    return result
+
+
+def _karatsuba_multiply(first, second):
+    """
+    Multiplies polynomials with Karatsuba algorithm (three half-size products instead of four)
+    :param first: list of coefficients
+    :param second: list of coefficients
+    :return: list of coefficients of the product
+    """
+    if len(first) < len(second):
+        first, second = second, first
+    if len(second) < KARATSUBA_THRESHOLD:
+        return _schoolbook_multiply(first, second).tolist()
+
+    if len(second) <= len(first) // 2:
+        # Unbalanced factors: the longer one is processed by slices of the shorter one's length
+        result = [0.] * (len(first) + len(second) - 1)
+        for start in range(0, len(first), len(second)):
+            product = _karatsuba_multiply(first[start:start + len(second)], second)
+            result[start:start + len(product)] = map(add, result[start:start + len(product)], product)
+        return result
+
+    half = len(first) // 2
+    first_low, first_high = first[:half], first[half:]
+    second_low, second_high = second[:half], second[half:]
+    low = _karatsuba_multiply(first_low, second_low)
+    high = _karatsuba_multiply(first_high, second_high)
+    middle = _karatsuba_multiply(_add_lists(first_low, first_high), _add_lists(second_low, second_high))
+    middle = _sub_lists(_sub_lists(middle, low), high)
+
+    result = [0.] * (len(first) + len(second) - 1)
+    result[:len(low)] = low
+    result[2 * half:2 * half + len(high)] = high
+    result[half:half + len(middle)] = map(add, result[half:half + len(middle)], middle)
+    return result
+
+
+def _add_lists(first, second):
+    if len(first) < len(second):
+        first, second = second, first
+    return list(map(add, first, second)) + first[len(second):]
+
+
+def _sub_lists(first, second):
+    result = list(map(sub, first, second))
+    if len(first) > len(second):
+        result += first[len(second):]
+    return result
+
+
+def _fft_multiply(first, second):
+    """
+    Multiplies polynomials through the fast Fourier transform
+    :param first: array of coefficients
+    :param second: array of coefficients
+    :return: array of coefficients of the product or None if numpy isn't available.
+    Products of integer polynomials are rounded, so they stay exact while they fit in a double
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+
+    first, second = numpy.frombuffer(first, dtype=float), numpy.frombuffer(second, dtype=float)
+    length = len(first) + len(second) - 1
+    size = 1 << (length - 1).bit_length()
+    with numpy.errstate(all="ignore"):
+        result = numpy.fft.irfft(numpy.fft.rfft(first, size) * numpy.fft.rfft(second, size), size)[:length]
+        if not numpy.any(numpy.mod(first, 1)) and not numpy.any(numpy.mod(second, 1)) and \
+                numpy.abs(first).sum() * numpy.abs(second).max() < 2 ** 40:
+            result = numpy.rint(result)
+    return array('d', result.tobytes())
+
+
+def _synthetic_divide(dividend, divisor):
+    """
+    Long division performed in place on a copy of the dividend
+    :param dividend: array of coefficients
+    :param divisor: array of coefficients, the leading one is nonzero
+    :return: arrays (quotient, remainder)
+    """
+    lead = divisor[-1]
+    length = len(divisor) - 1
+    quotient = array('d', bytes(8 * (len(dividend) - length)))
+    numpy = None
+    if length >= NEWTON_DIVISION_THRESHOLD:    # Creating numpy arrays doesn't pay off for short divisors
+        try:
+            import numpy
+        except ImportError:
+            pass
+
+    if numpy is None:
+        work = array('d', dividend)
+        lower = divisor[:-1]
+        for k in range(len(quotient) - 1, -1, -1):
+            coef = work[k + length] / lead
+            quotient[k] = coef
+            if coef != 0 and length > 0:
+                work[k:k + length] = array('d', map(sub, work[k:k + length], map(mul, repeat(coef), lower)))
+        return quotient, work[:length]
+
+    work = numpy.array(dividend, dtype=float)
+    lower = numpy.frombuffer(divisor, dtype=float)[:-1]
+    for k in range(len(quotient) - 1, -1, -1):
+        coef = float(work[k + length]) / lead
+        quotient[k] = coef
+        if coef != 0:
+            work[k:k + length] -= coef * lower
+    return quotient, array('d', work[:length].tobytes())
+
+
+def _newton_divide(dividend, divisor):
+    """
+    Computes the quotient as the reversed dividend times the reciprocal of the reversed divisor,
+    the reciprocal is found with Newton's iteration g = g * (2 - f * g) doubling the number of correct terms
+    :param dividend: array of coefficients
+    :param divisor: array of coefficients, the leading one is nonzero
+    :return: array of coefficients of the quotient
+    """
+    length = len(dividend) - len(divisor) + 1
+    reversed_dividend = dividend[::-1][:length]
+    reversed_divisor = divisor[::-1][:length]
+
+    reciprocal = array('d', [1 / reversed_divisor[0]])
+    correct = 1
+    while correct < length:
+        correct = min(2 * correct, length)
+        error = _multiply(reversed_divisor[:correct], reciprocal)[:correct]   # f * g = 1 + O(x^k)
+        error[0] -= 1
+        correction = _multiply(reciprocal, error)[:correct]
+        reciprocal.frombytes(bytes(8 * (correct - len(reciprocal))))
+        reciprocal = array('d', map(sub, reciprocal, correction))
+
+    return _multiply(reversed_dividend, reciprocal)[:length][::-1]
@@ -1,3 +1,8 @@
+import math
+
+RESIDUAL_TOLERANCE = 1e-9   # The largest backward error |p(z)| / sum(|c_i| |z|^i) of a root which is reported
+
+
 class PolynomialSolver:
     @staticmethod
     def solve(polynomial):
@@ -6,13 +11,259 @@ class PolynomialSolver:
         :param polynomial: array of coefficients
         :return: an array of solutions
         solution is an array of two elements where the second value is
-        either 1 (in this case the first element represents a possible value of variable)
+        either 1 (in this case the first element represents a possible value of variable,
+        real roots are floats, complex roots are complex numbers)
         or 0 (in this case a solution is actually a simplification and all occurrences of variable were cancelled)
         """
         if len(polynomial) == 1:
             return [[polynomial[0], 0]]
+        if not all(map(math.isfinite, polynomial)):
+            raise NotImplementedError("Error: coefficients of the polynomial are too large to find its roots.")
+
+        # Zero roots are factored out
+        zero_roots = 0
+        while polynomial[zero_roots] == 0:
+            zero_roots += 1
+        polynomial = polynomial[zero_roots:]
+
+        if len(polynomial) == 1:
+            roots = []
         elif len(polynomial) == 2:
-            num_result = -polynomial[0] / polynomial[1]
-            return [[num_result, 1]]
+            roots = [-polynomial[0] / polynomial[1]]
+        elif len(polynomial) == 3:
+            roots = PolynomialSolver.solve_quadratic(*polynomial)
         else:
-            raise NotImplementedError("Only linear equations are supported by now!")
+            roots = PolynomialSolver.solve_power(polynomial)
+            if roots is None:
+                roots = PolynomialSolver.solve_aberth(polynomial)   # Checks its roots itself
+                polynomial = ()
+        if polynomial:
+            PolynomialSolver.check_roots(polynomial, roots)
+        roots = [0.] * zero_roots + roots
+        roots.sort(key=lambda root: (isinstance(root, complex), root.real, root.imag))
+        return [[root, 1] for root in roots]
+
+    @staticmethod
+    def solve_quadratic(c, b, a):
+        """
+        Solves a*x^2 + b*x + c = 0 avoiding cancellation of close values and overflows of the discriminant
+        :return: an array of two roots (infinite if they are beyond the range of floats)
+        """
+        h, c = b / (2 * a), c / a     # x^2 + 2h*x + c = 0
+        scale = max(abs(h), math.sqrt(abs(c)))
+        if scale == 0:  # b == 0 and c == 0
+            return [0., 0.]
+        discriminant = (h / scale) ** 2 - c / scale / scale    # Divided by scale^2
+        if discriminant < 0:
+            root = complex(-h, scale * math.sqrt(-discriminant))
+            return [root, root.conjugate()]
+        q = -(h + math.copysign(scale * math.sqrt(discriminant), h))
+        if q == 0:
+            return [0., 0.]
+        return [q, c / q]
+
+    @staticmethod
+    def check_roots(polynomial, roots):
+        """
+        Verifies roots found in closed form, like solve_aberth verifies its own
+        :param polynomial: array of coefficients (the lowest degree first)
+        :raise NotImplementedError: if a root isn't finite or its backward error exceeds RESIDUAL_TOLERANCE
+        """
+        for root in roots:
+            if not (math.isfinite(root.real) and math.isfinite(root.imag)):
+                raise NotImplementedError("Error: roots of the polynomial are too large.")
+            coefficients, z = (polynomial[::-1], 1 / root) if abs(root) > 1 else (polynomial, root)
+            value, scale = 0, 0.
+            for coefficient in reversed(coefficients):
+                value = value * z + coefficient
+                scale = scale * abs(z) + abs(coefficient)
+            if abs(value) > RESIDUAL_TOLERANCE * scale:
+                raise NotImplementedError("Error: roots of the polynomial can't be found accurately.")
+
+    @staticmethod
+    def solve_power(polynomial, tolerance=1e-9):
+        """
+        Recognizes a power of a binomial a*(x - r)^n, whose n-fold root no iteration finds accurately
+        :param polynomial: array of coefficients (the lowest degree first), the constant term must be nonzero
+        :param tolerance: the relative accuracy to which every coefficient must match
+        :return: an array of n roots r or None if the polynomial isn't such a power
+        """
+        degree = len(polynomial) - 1
+        root = -polynomial[-2] / (degree * polynomial[-1])
+        expected = polynomial[-1]
+        for i in range(degree, 0, -1):    # The coefficient of x^(i-1) is expected * C(n, i-1) / C(n, i) * (-root)
+            if not math.isfinite(expected) or abs(polynomial[i] - expected) > tolerance * abs(polynomial[i]):
+                return None
+            expected *= -root * i / (degree - i + 1)
+        if not math.isfinite(expected) or abs(polynomial[0] - expected) > tolerance * abs(polynomial[0]):
+            return None
+        return [root] * degree
+
+    @staticmethod
+    def solve_aberth(polynomial, max_iterations=100):
+        """
+        Finds all roots of a polynomial simultaneously with Aberth-Ehrlich iteration
+        :param polynomial: array of coefficients (the lowest degree first), the constant term must be nonzero
+        :param max_iterations:
+        :return: an array of roots, roots with negligible imaginary parts are returned as floats.
+        NotImplementedError is raised if some root isn't found accurately (see RESIDUAL_TOLERANCE)
+        The iteration costs O(n^2) per step and is vectorized, so degrees of several hundreds take milliseconds
+        """
+        import numpy
+
+        coefficients = numpy.asarray(polynomial, dtype=complex)
+        degree = len(coefficients) - 1
+        abs_coefficients = numpy.abs(coefficients)
+        powers = numpy.arange(degree + 1)
+        eps = numpy.finfo(float).eps
+
+        def newton_corrections(z):
+            """
+            :return: p(z) / p'(z) and the backward errors |p(z)| / sum(|c_i| |z|^i) for every point.
+            Points outside the unit circle are handled through the reversed polynomial in 1/z, so nothing overflows.
+            """
+            outside = numpy.abs(z) > 1
+            w = numpy.where(outside, 1 / numpy.where(outside, z, 1), z)
+            w_powers = numpy.empty((len(z), degree + 1), dtype=complex)
+            w_powers[:, 0] = 1
+            w_powers[:, 1:] = w[:, None]
+            numpy.cumprod(w_powers, axis=1, out=w_powers)
+
+            corrections = numpy.empty(len(z), dtype=complex)
+            residuals = numpy.empty(len(z))
+            for reverse in (False, True):
+                mask = outside if reverse else ~outside
+                coefs = coefficients[::-1] if reverse else coefficients
+                if not mask.any():
+                    continue
+                mask_powers = w_powers[mask]
+                value = mask_powers @ coefs
+                # Both p(z) and the sum are z^n times those of the reversed polynomial, so the ratio is the same
+                residuals[mask] = numpy.abs(value) / (numpy.abs(mask_powers) @ numpy.abs(coefs))
+                derivative = mask_powers[:, :-1] @ (powers[1:] * coefs[1:])
+                if reverse:
+                    # p(z) = z^n q(w), so p(z) / p'(z) = 1 / (w * (n - w q'(w) / q(w)))
+                    corrections[mask] = 1 / (w[mask] * (degree - w[mask] * derivative / value))
+                else:
+                    corrections[mask] = value / derivative
+            return corrections, residuals
+
+        # Initial approximations are spread over a circle of the mean absolute value of roots
+        radius = (abs_coefficients[0] / abs_coefficients[-1]) ** (1 / degree)
+        roots = radius * numpy.exp(1j * (2 * numpy.pi * numpy.arange(degree) / degree + 0.4))
+        active = numpy.arange(degree)
+        with numpy.errstate(all="ignore"):
+            for _ in range(max_iterations):
+                current = roots[active]
+                corrections, residuals = newton_corrections(current)
+                differences = current[:, None] - roots[None, :]
+                differences[numpy.arange(len(active)), active] = numpy.inf
+                steps = corrections / (1 - corrections * (1 / differences).sum(axis=1))
+                # Roots exact up to rounding errors aren't improved any more (approximations of a multiple root
+                # would wander around it forever)
+                steps[~numpy.isfinite(steps) | (residuals <= degree * eps)] = 0
+                roots[active] = current - steps
+                active = active[(numpy.abs(steps) > 2 * eps * numpy.abs(current))]
+                if len(active) == 0:
+                    break
+            corrections, residuals = newton_corrections(roots)
+        if not (numpy.isfinite(roots).all() and (residuals <= RESIDUAL_TOLERANCE).all()):
+            raise NotImplementedError("Error: roots of the polynomial can't be found accurately.")
+
+        # Newton's method would still move approximations of multiple roots by a share of their distance to the root
+        unsettled = ~(numpy.abs(corrections) <= 1e-10 * numpy.maximum(1., numpy.abs(roots)))
+        roots = PolynomialSolver.merge_multiple_roots(coefficients, roots, unsettled)
+
+        # The last digits are noise of the iteration, so roots are rounded to 12 significant digits
+        result = []
+        for root in roots.tolist():
+            real = float("%.12g" % root.real) if abs(root.real) > 1e-9 * abs(root) else 0.
+            if abs(root.imag) <= 1e-9 * max(1., abs(root)):
+                result.append(real)
+            else:
+                result.append(complex(real, float("%.12g" % root.imag)))
+        return result
+
+    @staticmethod
+    def merge_multiple_roots(coefficients, roots, unsettled=None, distance=0.5, tolerance=1e-10, attempts=3):
+        """
+        A root of multiplicity k is found only with accuracy about eps^(1/k), the approximations
+        form a cluster around it (as wide as a third of the root for k = 20). Clusters are replaced
+        with one refined value if the polynomial and its k - 1 derivatives vanish there
+        :param coefficients: numpy array of coefficients (the lowest degree first)
+        :param roots: numpy array of approximations of all roots
+        :param unsettled: None or a boolean numpy array, only approximations marked there are merged
+        :param distance: the relative distance from the center of a cluster to its approximations
+        :param tolerance: the relative accuracy to which the derivatives must vanish
+        :param attempts: the number of times the farthest approximation is dropped from a cluster which isn't a root
+        :return: numpy array of roots
+        """
+        import numpy
+        from numpy.polynomial import polynomial
+
+        eps = numpy.finfo(float).eps
+        derivatives = [coefficients]        # Derivatives and bounds of their rounding errors computed so far
+        scales = [numpy.abs(coefficients)]
+        result = roots.copy()
+        unused = numpy.ones(len(roots), dtype=bool) if unsettled is None else unsettled.copy()
+        for i in range(len(roots)):
+            if not unused[i]:
+                continue
+            # The cluster is gathered around its center rather than around one of its approximations
+            center = roots[i]
+            for _ in range(3):
+                cluster = numpy.flatnonzero(unused & (numpy.abs(roots - center) <= distance * max(1., abs(center))))
+                center = roots[cluster].mean()
+            cluster = list(cluster[numpy.argsort(numpy.abs(roots[cluster] - center))])
+            # The farthest approximations are dropped until the cluster is as tight as a k-fold root allows
+            while len(cluster) > 1 and abs(roots[cluster[-1]] - center) > \
+                    100 * eps ** (1 / len(cluster)) * max(1., abs(center)):
+                cluster.pop()
+
+            for _ in range(attempts):
+                if len(cluster) <= 1:
+                    break
+                # Distinct roots don't make the polynomial vanish at the mean, this is checked before the derivatives
+                mean = roots[cluster].mean()
+                if not PolynomialSolver.backward_error(coefficients, mean) <= RESIDUAL_TOLERANCE:
+                    break
+                while len(derivatives) <= len(cluster):
+                    derivatives.append(polynomial.polyder(derivatives[-1]))
+                    scales.append(polynomial.polyder(scales[-1]))
+
+                # A k-fold root is a simple root of the (k-1)-th derivative, the mean is refined with Newton's method
+                for _ in range(20):
+                    slope = polynomial.polyval(mean, derivatives[len(cluster)])
+                    if slope == 0:
+                        break
+                    step = polynomial.polyval(mean, derivatives[len(cluster) - 1]) / slope
+                    mean -= step
+                    if not abs(step) > eps * abs(mean):
+                        break
+                # Written so that NaN (of overflowing derivatives) fails the check
+                if all(abs(polynomial.polyval(mean, derivative)) <= tolerance * polynomial.polyval(abs(mean), scale)
+                       for derivative, scale in zip(derivatives[:len(cluster)], scales)):
+                    result[cluster] = mean
+                    unused[cluster] = False
+                    break
+                # A simple root close to the multiple one may have joined its cluster
+                cluster.sort(key=lambda j: abs(roots[j] - mean))
+                cluster.pop()
+        return result
+
+    @staticmethod
+    def backward_error(coefficients, z):
+        """
+        :param coefficients: numpy array of coefficients (the lowest degree first)
+        :param z: a complex number
+        :return: |p(z)| / sum(|c_i| |z|^i), the relative change of coefficients which makes z an exact root
+        """
+        import numpy
+
+        if abs(z) > 1:  # p(z) = z^n q(1/z) for the reversed polynomial q, and the ratio is the same
+            coefficients, z = coefficients[::-1], 1 / z
+        z_powers = numpy.empty(len(coefficients), dtype=complex)
+        z_powers[0] = 1
+        z_powers[1:] = z
+        numpy.cumprod(z_powers, out=z_powers)
+        return abs(z_powers @ coefficients) / (numpy.abs(z_powers) @ numpy.abs(coefficients))
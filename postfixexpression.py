@@ -1,15 +1,89 @@
-from expressionchecker import *
-from operand import *
+import math
+import operator
+from bisect import bisect_left
+from collections import namedtuple
+
+from codegen import LazyProgram, compile_postfix
+from expressionchecker import ExpressionChecker
+from lrucache import LRUCache
+from metrics import metrics
+from operand import Operand
+
+# Everything PostfixExpression derives from an infix string before the actual calculation.
+# Plans are immutable, so one plan may be shared by any number of evaluations.
+ExpressionPlan = namedtuple("ExpressionPlan", ["tokens",                  # tokens in infix order
+                                               "token_places",            # (start_pos, end_pos) of each token
+                                               "postfix",                 # tokens in postfix order
+                                               "postfix_places",          # (start_pos, end_pos) of postfix tokens
+                                               "varname",                 # name of the variable or None
+                                               "variables",               # names of all variables
+                                               "interpreted_expression",
+                                               "error_msg",               # None if the expression is correct
+                                               "error_place",
+                                               "program"])                # LazyProgram or None
+
+OPERATOR_CHARS = frozenset("(),*/^+=~-")
+LETTER_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz")
+NUMBER_CHARS = frozenset("0123456789.")
+ALPHANUMERIC_CHARS = LETTER_CHARS | frozenset("0123456789")
+
+# Limits of the work one expression may cause, None means no limit
+Budget = namedtuple("Budget", ["max_tokens",         # tokens after lexing
+                               "max_depth",          # nesting of parentheses (including function calls)
+                               "max_degree",         # degree of any intermediate polynomial
+                               "max_coefficients"])  # coefficients of all polynomials kept at once
+DEFAULT_BUDGET = Budget(max_tokens=100000, max_depth=1000, max_degree=1000, max_coefficients=100000)
+UNLIMITED_BUDGET = Budget(None, None, None, None)
+
+# Operators which may change their left operand, sums of many sparse terms are built in linear time with them
+IN_PLACE_OPERATORS = {"+": operator.iadd, "-": operator.isub, "=": operator.isub}
+
+PLAN_CACHE_MAX_TOKENS = 500000     # Tokens of all cached plans (infix and postfix), longer plans aren't cached
+# Shared cache of compiled plans keyed by infix strings and budgets
+plan_cache = LRUCache(maxsize=1024, maxweight=PLAN_CACHE_MAX_TOKENS,
+                      weigh=lambda key, plan: len(plan.tokens) + len(plan.postfix))
+
+
+def common_prefix_length(a, b):
+    """
+    :return: the length of the longest common prefix of two strings (found by bisection of slices)
+    """
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
 
 
 class PostfixExpression:
-    def __init__(self, infix_expression):
+    def __init__(self, infix_expression, plan_cache=None, budget=DEFAULT_BUDGET, incremental=False,
+                 several_variables=False):
+        """
+        Compiles (or takes from the cache) and evaluates an infix expression
+        :param infix_expression: string
+        :param plan_cache: an LRUCache of ExpressionPlans, the expression is compiled from scratch if None
+        :param budget: a Budget, exceeding any limit is reported as an error
+        :param incremental: if True, the expression may be edited later with update (the plan cache isn't used)
+        :param several_variables: if True, the expression may contain several variables, the result is then
+        a sparse Operand (expressions with one variable are still evaluated densely, unless in incremental mode).
+        Equations (with '=' on the top level) may contain several variables anyway
+        :return:
+        """
+        self.budget = budget
+        self.several_variables = several_variables
         self.operators = {"+": lambda x, y: x + y,
                           "-": lambda x, y: x - y,
                           "*": lambda x, y: x * y,
                           "/": lambda x, y: x / y,
-                          "~": lambda x: Operand([0]) - x}  # Unary '-' operator
-        self.operator_precedences = {"+": 0, "-": 0, "*": 1, "/": 1, "~": 2}
+                          "^": lambda x, y: x ** y,
+                          "~": lambda x: Operand([0]) - x,  # Unary '-' operator
+                          "=": lambda x, y: x - y}  # An equation is evaluated as lhs - rhs = 0
+        self.operator_precedences = {"=": -1, "+": 0, "-": 0, "*": 1, "/": 1, "~": 2, "^": 3}
+        self.right_associative_operators = ("^",)
+        self.relations = ("=",)
 
         self.functions = {"log": lambda x, y: y.log(x),
                           "ln": lambda x: x.log(Operand([math.e]))}
@@ -18,123 +92,147 @@ class PostfixExpression:
         self.token_places = []  # An array of tuples (start_pos, end_pos) of tokens.
         self.error_msg = None    # Last error in case of incorrect expression
         self.error_place = (None, None)  # Index of incorrect token
-        self.varname = None
-        self.result = self.__process_infix_string(infix_expression)
+        self.error_unsupported = False  # The error is an operation polynomials don't support (like ln(x))
+        self.varname = None     # The first variable
+        self.variables = ()     # All variables in order of their appearance in postfix form
+        self.is_equation = False    # The result is the difference of the sides then
+        if incremental:
+            self.plan = None
+            self.__source = None
+            self.__parser = ExpressionChecker(operators=self.operators,
+                                              functions=self.functions,
+                                              precedences=self.operator_precedences,
+                                              max_depth=self.budget.max_depth,
+                                              several_variables=several_variables,
+                                              right_associative=self.right_associative_operators,
+                                              relations=self.relations)
+            self.__parse_snapshots, self.__evaluation_snapshots = [], []
+            self.__sparse = False   # Representation of variables the evaluation snapshots have
+            self.__parsed_tokens = 0        # Number of leading tokens the parser snapshots are valid for
+            self.__evaluated_tokens = 0     # Number of leading postfix tokens the evaluation snapshots are valid for
+            self.result = self.update(infix_expression)
+            return
+        if plan_cache is None:
+            self.plan = self.compile(infix_expression)
+        else:
+            self.plan = plan_cache.get((infix_expression, budget, several_variables),
+                                       lambda key: self.compile(key[0]))
+        self.result = self.__process_plan(self.plan)
 
-    def __tokenize(self, expr):
+    def __tokenize(self, expr, kept_tokens=0):
         """
+        Splits an expression into tokens in a single pass. Implicit multiplication is added
+        and unary '-' is replaced with '~' on the way
         :param expr: the expression to process
+        :param kept_tokens: the number of tokens taken from the previous call (in incremental mode),
+        only the rest of the expression is processed
         :return: an array of tokens from the string given
         """
-        result = expr.replace(" ", "")
-        match = re.finditer(r'([A-Za-z]+)\(', result)  # Add implicit multiplication
-        for m in match:
-            if m.group(0)[:-1] not in self.functions:  # if we found a variable
-                result = result[:m.end() - 1] + "*" + result[m.end() - 1:]
-
-        result = re.sub(r'((?<=\d)([A-Za-z(]))', r'*\1', result)  # Add implicit multiplication
-        result = re.sub(r'(^|\(|,)-([A-Za-z0-9])', r'\1~\2', result)  # Replace usual - with unary operator
-        result = re.sub(r'([(),*/+=~-])', r' \1 ', result)  # Add spaces around operators
-        result = re.sub(r'([A-Za-z]+)', r' \1 ', result)  # Add spaces around variables and functions
-        result = re.sub(r'(\s{2,})', r' ', result)  # Remove excess spaces
-        result = result.split()
-        self.interpreted_expression = "".join(result).replace("~", "-")
-        start_pos = 0
-
-        self.token_places = []
-        for token in result:
-            end_pos = start_pos + len(token) - 1
-            self.token_places.append((start_pos, end_pos))
-            start_pos = end_pos + 1
+        expr = expr.replace(" ", "")
+        if kept_tokens:
+            result, interpreted, token_places, token_ends = (part[:kept_tokens] for part in self.__lexer_output)
+            pos = sum(map(len, interpreted))
+            i = token_ends[-1]
+        else:
+            result, interpreted, token_places, token_ends = [], [], [], []
+            pos = 0     # Position of the next token in the interpreted expression
+            i = 0
+        length = len(expr)
+        max_tokens = self.budget.max_tokens
+        while i < length:
+            if max_tokens is not None and len(result) >= max_tokens and not expr[i:].isspace():
+                rest = expr[i:]
+                interpreted.append(rest)
+                self.error_msg = "Error: the expression is too long (more than %d tokens)." % max_tokens
+                self.error_place = (pos, pos + len(rest) - 1)
+                break
+            char = expr[i]
+            if char in OPERATOR_CHARS:
+                token = char
+                if char == "-" and (i == 0 or expr[i - 1] in "(,^=") and \
+                        i + 1 < length and expr[i + 1] in ALPHANUMERIC_CHARS:
+                    token = "~"     # Unary '-' operator
+                j = i + 1
+            elif char in LETTER_CHARS:
+                j = i + 1
+                while j < length and expr[j] in LETTER_CHARS:
+                    j += 1
+                token = expr[i:j]
+            elif char.isspace():
+                i += 1
+                continue
+            else:   # Numbers (and anything else the checker will complain about)
+                j = i + 1
+                while j < length:
+                    if expr[j] not in NUMBER_CHARS and (expr[j] in OPERATOR_CHARS or
+                                                        expr[j] in LETTER_CHARS or expr[j].isspace()):
+                        break
+                    j += 1
+                token = expr[i:j]
+
+            result.append(token)
+            if token == "=":    # Sides of an equation are spaced out
+                interpreted.append(" = ")
+                token_places.append((pos + 1, pos + 1))
+                pos += 3
+            else:
+                interpreted.append(token if token != "~" else "-")
+                token_places.append((pos, pos + j - i - 1))
+                pos += j - i
+            token_ends.append(j)
+
+            # Implicit multiplication: "2x", "2(", "x(" unless x is a function name
+            if j < length and (expr[j] == "(" or expr[j] in LETTER_CHARS):
+                if (char in LETTER_CHARS and expr[j] == "(" and token not in self.functions) or \
+                        expr[j - 1].isdecimal():
+                    result.append("*")
+                    interpreted.append("*")
+                    token_places.append((pos, pos))
+                    token_ends.append(j)
+                    pos += 1
+            i = j
+
+        # A token depends on the characters up to its end (inclusive, as the next character is looked at),
+        # so after an edit the tokens ending before the first changed character are kept
+        self.__lexer_output = result, interpreted, token_places, token_ends
+        self.token_places = token_places
+        self.interpreted_expression = "".join(interpreted)
         return result
 
-    def __is_expression_correct(self, token_array):
+    def __parse(self, token_array):
         """
-        Constructs PDA for checking whether arithmetic expression is valid
+        Checks an expression and rewrites it in postfix form in one pass over the tokens
         :param token_array: the value obtained from tokenize function
-        :return: True if the expression is correct
+        :return: an array representing the expression in postfix notation, None if the expression is incorrect
         """
-        checker = ExpressionChecker(operators=self.operators,
-                                    functions=self.functions)
-        result, error_place = checker.consume_token_array(token_array)
+        parser = ExpressionChecker(operators=self.operators,
+                                   functions=self.functions,
+                                   precedences=self.operator_precedences,
+                                   max_depth=self.budget.max_depth,
+                                   several_variables=self.several_variables,
+                                   right_associative=self.right_associative_operators,
+                                   relations=self.relations)
+        postfix, postfix_places, result, error_place = parser.parse(token_array, self.token_places)
         if result is not None:
             self.error_msg = result
             self.error_place = self.token_places[error_place]
-            return False
-        return True
-
-    def __convert_to_postfix(self, token_array):
-        """
-        An implementation of Shunting-yard algorithm for arithmetic expression parsing
-        :param token_array
-        :return: an array representing the expression in postfix notation
-        """
-        result = []
-        stack = []
-        token_places = []
-        token_places_stack = []
-        for token, token_place in zip(token_array, self.token_places):
-            if token.replace(".", "").isalnum() and token not in self.functions:
-                result.append(token)
-                token_places.append(token_place)
-
-            elif token in self.operators:
-                while len(stack) > 0 and stack[-1] in self.operators and \
-                                self.operator_precedences[token] <= self.operator_precedences[stack[-1]]:
-                    result.append(stack.pop())
-                    token_places.append(token_places_stack.pop())
-                stack.append(token)
-                token_places_stack.append(token_place)
-
-            elif token in self.functions:
-                stack.append(token)
-                token_places_stack.append(token_place)
-
-            elif token == "(":
-                stack.append(token)
-                token_places_stack.append(token_place)
-
-            elif token == ")":
-                while len(stack) > 0 and stack[-1] != "(":
-                    result.append(stack.pop())
-                    token_places.append(token_places_stack.pop())
-                stack.pop()  # Get rid of left parenthesis
-                token_places_stack.pop()
-                if len(stack) > 0 and stack[-1] in self.functions:
-                    result.append(stack.pop())
-                    token_places.append(token_places_stack.pop())
-
-            elif token == ",":
-                while len(stack) > 0 and stack[-1] != "(":
-                    result.append(stack.pop())
-                    token_places.append(token_places_stack.pop())
-
-        while len(stack) > 0:
-            result.append(stack.pop())
-            token_places.append(token_places_stack.pop())
-
-        self.token_places = token_places
-        return result
+            return None
+        self.token_places = postfix_places
+        return postfix
 
-    def __process_postfix_array(self, postfix_array):
+    def __process_postfix_array(self, postfix_array, snapshots=None, resume=0, sparse=False):
         """
         Does all calculation within an expression
         :param postfix_array: an array of tokens in postfix form
+        :param snapshots: None or a list receiving the operand stack before every token (and after the last one),
+        the stack is persistent (tuples (operand, start_pos, end_pos, rest)), so snapshots share it
+        :param resume: the number of the first token which differs from the previous call with the same snapshots,
+        the calculation continues from its snapshot
+        :param sparse: variables are sparse Operands if True (needed for several variables), dense otherwise
         :return: an Operand
         """
 
-        def span_error_places(error_array):
-            start, end = -1, -1
-            for err in error_array:
-                if start == -1:
-                    start = self.token_places[err][0]
-                elif start > self.token_places[err][0]:
-                    start = self.token_places[err][0]
-                if end == -1:
-                    end = self.token_places[err][1]
-                elif end < self.token_places[err][1]:
-                    end = self.token_places[err][1]
-
+        def span_error_places(start, end):
             # Parentheses balancing
             tmp_string = self.interpreted_expression[start:end+1]
             left, right = tmp_string.count("("), tmp_string.count(")")
@@ -153,75 +251,344 @@ class PostfixExpression:
                     right += 1
             return start, end
 
-        operand_stack = []
-        operand_tokens = []     # Places of token involved in evaluation of an operand
-        for i, element in enumerate(postfix_array):
+        def exceeds_budget(operands, result_degree, result_size, start, end):
+            """
+            :return: True (and sets the error) if an operation with the result of the degree and the number
+            of coefficients given isn't allowed
+            """
+            budget = self.budget
+            if budget.max_degree is not None and result_degree > budget.max_degree:
+                self.error_msg = "Error: the degree of the polynomial exceeds %d." % budget.max_degree
+            elif budget.max_coefficients is not None and \
+                    coefficients - sum(operand.size for operand in operands) + result_size > budget.max_coefficients:
+                self.error_msg = "Error: the polynomials have more than %d coefficients." % budget.max_coefficients
+            else:
+                return False
+            self.error_place = span_error_places(start, end)
+            return True
+
+        if resume:
+            operand_stack, coefficients, self.varname, self.variables = snapshots[resume]
+            del snapshots[resume:]
+        else:
+            operand_stack = ()      # Nodes (operand, start_pos, end_pos, rest), the places span its tokens
+            coefficients = 0        # Number of coefficients of all operands in the stack
+            if snapshots is not None:
+                del snapshots[:]
+        for i in range(resume, len(postfix_array)):
+            element = postfix_array[i]
+            start, end = self.token_places[i]
+            if snapshots is not None:
+                snapshots.append((operand_stack, coefficients, self.varname, self.variables))
             if element not in self.operators and element not in self.functions:
                 try:
-                    operand_stack.append(Operand([float(element)]))
-                    operand_tokens.append([i])
+                    operand_stack = (Operand([float(element)]), start, end, operand_stack)
+                    coefficients += 1
                 except ValueError:
-                    if self.varname is None:
-                        self.varname = element
-                        operand_stack.append(Operand([0., 1.]))
-                        operand_tokens.append([i])
+                    if sparse:
+                        if element not in self.variables:
+                            self.varname = self.varname or element
+                            self.variables += (element,)
+                        operand_stack = (Operand.variable(element), start, end, operand_stack)
+                        coefficients += 1
+                    elif self.varname is None:
+                        self.varname, self.variables = element, (element,)
+                        operand_stack = (Operand([0., 1.]), start, end, operand_stack)
+                        coefficients += 2
                     elif self.varname == element:
-                        operand_stack.append(Operand([0., 1.]))
-                        operand_tokens.append([i])
+                        operand_stack = (Operand([0., 1.]), start, end, operand_stack)
+                        coefficients += 2
 
             elif element in self.operators:
                 argcount = self.operators[element].__code__.co_argcount
                 operands = []
-                tmp_operand_tokens = [i]
                 for _ in range(argcount):
-                    operands.append(operand_stack.pop())
-                    tmp_operand_tokens.extend(operand_tokens.pop())
+                    operand, operand_start, operand_end, operand_stack = operand_stack
+                    operands.append(operand)
+                    start, end = min(start, operand_start), max(end, operand_end)
 
+                # The degree of a product is known beforehand, so it is rejected without multiplying
+                degrees = [operand.degree for operand in operands]
+                if element == "*":
+                    result_degree = sum(degrees)
+                    result_size = result_degree + 1 if all(operand.terms is None for operand in operands) else \
+                        operands[0].size * operands[1].size
+                elif element == "^" and degrees[1] > 0 and degrees[0] == 0 and operands[0].polynomial[0] >= 0 \
+                        and operands[0].polynomial[0].is_integer():
+                    power = int(operands[0].polynomial[0])
+                    result_degree = degrees[1] * power
+                    result_size = result_degree + 1 if operands[1].terms is None else \
+                        math.comb(operands[1].size + power - 1, power)  # Bound on the number of monomials
+                else:
+                    result_degree = max(degrees)
+                    result_size = result_degree + 1 if all(operand.terms is None for operand in operands) else \
+                        sum(operand.size for operand in operands)
+                if exceeds_budget(operands, result_degree, result_size, start, end):
+                    return
+                operation = self.operators[element]
+                if snapshots is None and element in IN_PLACE_OPERATORS:
+                    # Operands are made by this evaluation and nothing else refers to them without snapshots
+                    operation = IN_PLACE_OPERATORS[element]
                 try:
-                    operand_stack.append(self.operators[element](*operands[::-1]))
-                    operand_tokens.append(tmp_operand_tokens)
+                    operand_stack = (operation(*operands[::-1]), start, end, operand_stack)
                 except (NotImplementedError, ZeroDivisionError) as e:
                     self.error_msg = e.args[0]
-                    self.error_place = span_error_places(tmp_operand_tokens)
+                    self.error_place = span_error_places(start, end)
+                    self.error_unsupported = isinstance(e, NotImplementedError)
                     return
+                coefficients += operand_stack[0].size - sum(op.size for op in operands)
 
             elif element in self.functions:
                 argcount = self.functions[element].__code__.co_argcount
                 operands = []
-                tmp_operand_tokens = []
+                first, last = math.inf, -1     # Errors span the arguments only
                 for _ in range(argcount):
-                    operands.append(operand_stack.pop())
-                    tmp_operand_tokens.extend(operand_tokens.pop())
+                    operand, operand_start, operand_end, operand_stack = operand_stack
+                    operands.append(operand)
+                    first, last = min(first, operand_start), max(last, operand_end)
 
                 try:
-                    operand_stack.append(self.functions[element](*operands[::-1]))
-                    operand_tokens.append(tmp_operand_tokens)
+                    operand_stack = (self.functions[element](*operands[::-1]), min(start, first),
+                                     max(end, last), operand_stack)
                 except Exception as e:
                     self.error_msg = e.args[0]
-                    self.error_place = span_error_places(tmp_operand_tokens)
+                    self.error_place = span_error_places(first, last)
+                    self.error_unsupported = isinstance(e, NotImplementedError)
                     return
-                operand_tokens[-1].append(i)
+                coefficients += operand_stack[0].size - sum(op.size for op in operands)
+
+            if operand_stack and not operand_stack[0].is_finite():
+                self.error_msg = "Error: the value is too large."
+                self.error_place = span_error_places(operand_stack[1], operand_stack[2])
+                return
 
+        if snapshots is not None:
+            snapshots.append((operand_stack, coefficients, self.varname, self.variables))
         return operand_stack[0]
 
-    def __process_infix_string(self, infix_string):
+    def compile(self, infix_string):
         """
-        Does all processing required (tokenize, rewrite in postfix form and evaluate postfix)
+        Does all processing which doesn't depend on the variable
+        (tokenize, check and rewrite in postfix form at once, fold constants)
         :param infix_string:
-        :return: an Operand representing the result of a calculation
+        :return: an ExpressionPlan
+        """
+        self.error_msg, self.error_place = None, (None, None)
+        with metrics.timer("tokenize"):
+            tokenized = self.__tokenize(infix_string)
+        metrics.observe_size("tokens", len(tokenized))
+        tokens, token_places = tuple(tokenized), tuple(self.token_places)
+        postfix, postfix_places, varname, variables = (), (), None, ()
+        # The tokenizer reports expressions exceeding the budget itself
+        if self.error_msg is None and not tokenized:
+            self.error_msg = "Error: expression contains nothing"
+        elif self.error_msg is None:
+            with metrics.timer("parse"):
+                postfix = self.__parse(tokenized)
+            if postfix is None:
+                postfix = ()
+            else:
+                with metrics.timer("fold_constants"):
+                    postfix = tuple(self.__fold_constants(postfix))
+                postfix_places = tuple(self.token_places)
+                variables = tuple(dict.fromkeys(token for token in postfix if token not in self.operators and
+                                                token not in self.functions and not self.__is_number(token)))
+                varname = variables[0] if variables else None
+        return ExpressionPlan(tokens, token_places, postfix, postfix_places, varname, variables,
+                              self.interpreted_expression, self.error_msg, self.error_place,
+                              LazyProgram() if postfix else None)
+
+    def update(self, infix_expression):
         """
-        tokenized = self.__tokenize(infix_string)
+        Evaluates an edited expression (in incremental mode). Lexing, checking and calculation restart
+        from the first token affected by the edit, the tokens, states of the parser and operands
+        before it are taken from the previous evaluation. Constants aren't folded in this mode
+        :param infix_expression: the new expression
+        :return: an Operand representing the result of a calculation or None in case of any error
+        """
+        expr = infix_expression.replace(" ", "")
+        if expr == self.__source:
+            return self.result
+        kept_tokens = 0
+        if self.__source is not None:
+            kept_tokens = bisect_left(self.__lexer_output[3], common_prefix_length(self.__source, expr))
+        self.__source = expr
+        self.error_msg, self.error_place, self.varname, self.result = None, (None, None), None, None
+        self.variables, self.is_equation, self.error_unsupported = (), False, False
+
+        tokenized = self.__tokenize(expr, kept_tokens)
+        self.__parsed_tokens = min(self.__parsed_tokens, kept_tokens)
+        if self.error_msg is not None:
+            return None
         if not tokenized:
             self.error_msg = "Error: expression contains nothing"
+            return None
+
+        resume = max(0, min(self.__parsed_tokens, len(self.__parse_snapshots) - 1))
+        kept_postfix = self.__parse_snapshots[resume][4] if resume else 0
+        self.__evaluated_tokens = min(self.__evaluated_tokens, kept_postfix)
+        postfix, postfix_places, error_msg, error_place = self.__parser.parse(tokenized, self.token_places,
+                                                                              self.__parse_snapshots, resume)
+        self.__parsed_tokens = len(tokenized)
+        if error_msg is not None:
+            self.error_msg = error_msg
+            self.error_place = self.token_places[error_place]
+            return None
+
+        self.token_places = postfix_places
+        self.is_equation = self.__parser.relation is not None
+        # Equations with several variables are evaluated sparsely, snapshots of the other representation are useless
+        sparse = self.several_variables or self.__parser.name_mismatch is not None
+        if sparse != self.__sparse:
+            self.__sparse, self.__evaluated_tokens = sparse, 0
+        resume = max(0, min(self.__evaluated_tokens, len(self.__evaluation_snapshots) - 1))
+        self.result = self.__process_postfix_array(postfix, self.__evaluation_snapshots, resume, sparse=sparse)
+        self.__evaluated_tokens = len(postfix)
+        return self.result
+
+    def __fold_constants(self, postfix_array):
+        """
+        Pre-evaluates constant subexpressions and removes identities (x*1, 1*x, x/1, x+0, 0+x, x-0, -(-x)).
+        Relations aren't folded, so that an equation remains one.
+        A folded token gets the place spanning all tokens it replaces, so error spans don't change
+        :param postfix_array: an array of tokens in postfix form, self.token_places must be their places
+        :return: an array of tokens in postfix form, self.token_places are updated
+        """
+        result = []
+        places = []
+        stack = []  # Tuples (index of the first token in result, value if constant or None, start_pos, end_pos)
+        for element, place in zip(postfix_array, self.token_places):
+            if element not in self.operators and element not in self.functions:
+                value = Operand([float(element)]) if self.__is_number(element) else None
+                stack.append((len(result), value, place[0], place[1]))
+                result.append(element)
+                places.append(place)
+                continue
+
+            function = self.operators[element] if element in self.operators else self.functions[element]
+            argcount = function.__code__.co_argcount
+            operands = stack[-argcount:]
+            del stack[-argcount:]
+            start = operands[0][0]
+            span = (min([place[0]] + [operand[2] for operand in operands]),
+                    max([place[1]] + [operand[3] for operand in operands]))
+
+            values = [operand[1] for operand in operands]
+            if all(value is not None for value in values) and element not in self.relations:
+                try:
+                    value = function(*values)
+                except Exception:   # The error is reported (with its span) when the plan is evaluated
+                    pass
+                else:
+                    del result[start:], places[start:]
+                    result.append(repr(value.polynomial[0]))
+                    places.append(span)
+                    stack.append((start, value) + span)
+                    continue
+
+            # Identities: the kept subexpression takes the place of the whole one. Its root token is widened,
+            # unless that token can fail itself (then its error span would change)
+            kept = self.__identity_operand(element, values, result)
+            if kept is not None:
+                if element == "~":
+                    kept_tokens = result[start:-1]     # Operand of the inner '~'
+                    kept_places = places[start:-1]
+                else:
+                    end = operands[kept + 1][0] if kept + 1 < len(operands) else len(result)
+                    kept_tokens = result[operands[kept][0]:end]
+                    kept_places = places[operands[kept][0]:end]
+                if kept_tokens[-1] in ("+", "-", "~") or \
+                        (kept_tokens[-1] not in self.operators and kept_tokens[-1] not in self.functions):
+                    kept_places[-1] = span
+                    del result[start:], places[start:]
+                    result.extend(kept_tokens)
+                    places.extend(kept_places)
+                    stack.append((start, None) + span)
+                    continue
+
+            stack.append((start, None) + span)
+            result.append(element)
+            places.append(place)
+
+        self.token_places = places
+        return result
+
+    @staticmethod
+    def __identity_operand(operator, values, postfix_array):
+        """
+        :param operator: token
+        :param values: values of the operands (None for non-constant ones)
+        :param postfix_array: tokens in postfix form up to the operator
+        :return: index of the operand equal to the whole operation if it is an identity, None otherwise
+        """
+        zero, one = Operand([0]), Operand([1])
+        if operator == "*":
+            if values[1] is not None and values[1] == one:
+                return 0
+            if values[0] is not None and values[0] == one:
+                return 1
+        elif operator == "/" and values[1] is not None and values[1] == one:
+            return 0
+        elif operator == "+":
+            if values[1] is not None and values[1] == zero:
+                return 0
+            if values[0] is not None and values[0] == zero:
+                return 1
+        elif operator == "-" and values[1] is not None and values[1] == zero:
+            return 0
+        elif operator == "^" and values[1] is not None and values[1] == one:
+            return 0
+        elif operator == "~" and postfix_array[-1] == "~":
+            return 0
+        return None
+
+    @staticmethod
+    def __is_number(token):
+        try:
+            float(token)
+        except ValueError:
+            return False
+        return True
+
+    def __process_plan(self, plan):
+        """
+        Evaluates a compiled expression
+        :param plan: an ExpressionPlan
+        :return: an Operand representing the result of a calculation or None in case of any error
+        """
+        self.interpreted_expression = plan.interpreted_expression
+        self.error_msg, self.error_place = plan.error_msg, plan.error_place
+        self.error_unsupported = False
+        if plan.error_msg is not None:
+            self.token_places = list(plan.token_places)
             return
-        if not self.__is_expression_correct(tokenized):
-            return
-        postfix_array = self.__convert_to_postfix(tokenized)
-        result = self.__process_postfix_array(postfix_array)
-        if result is None:
-            return
+        self.token_places = list(plan.postfix_places)
+        self.varname, self.variables = plan.varname, plan.variables
+        self.is_equation = plan.postfix[-1] in self.relations     # A relation is the root if there is one
+        program = plan.program
+        if program is not None and program.function is not None:
+            try:
+                with metrics.timer("evaluate_postfix"):
+                    result = program.function(*self.__variable_operands(plan))
+                if result.is_finite():
+                    return result
+            except (NotImplementedError, ZeroDivisionError, ValueError):
+                pass    # The interpreter finds the place of the error (overflows too)
+        with metrics.timer("evaluate_postfix"):
+            result = self.__process_postfix_array(plan.postfix, sparse=len(plan.variables) > 1)
+        # Evaluation depends on the plan only, so a program which was once interpreted within the budget
+        # doesn't exceed it when compiled
+        if result is not None and program is not None:
+            program.evaluated(lambda: compile_postfix(plan.postfix, dict(self.operators, **self.functions),
+                                                      lambda token: Operand([float(token)]), plan.variables))
         return result
 
+    @staticmethod
+    def __variable_operands(plan):
+        if len(plan.variables) > 1:
+            return [Operand.variable(name) for name in plan.variables]
+        return [Operand([0., 1.])] * len(plan.variables)
+
     def get_error(self):
         if self.error_msg is not None:
             return self.error_msg, self.error_place
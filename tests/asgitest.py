@@ -0,0 +1,122 @@
+import asyncio
+import json
+import time
+import unittest
+from urllib.parse import urlencode
+
+from asgi import ASGIApplication, WorkerPool
+from calculator import app
+from metrics import metrics
+
+# Solving takes about a second
+SLOW_EQUATION = "(x^2 + x + 1)^400 = 3"
+
+
+def request(application, method, path, body=b"", headers=()):
+    """
+    Sends one HTTP request to an ASGI application
+    :return: status, dictionary of headers, body
+    """
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": b"", "http_version": "1.1",
+             "headers": [(name.encode(), value.encode()) for name, value in headers]}
+    asyncio.run(application(scope, receive, send))
+    return sent[0]["status"], dict(sent[0]["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def post_expression(application, expression):
+    return request(application, "POST", "/", urlencode({"expression": expression}).encode(),
+                   [("content-type", "application/x-www-form-urlencoded")])
+
+
+def post_json(application, path, data):
+    status, _, body = request(application, "POST", path, json.dumps(data).encode(),
+                              [("content-type", "application/json")])
+    return status, json.loads(body)
+
+
+class ASGITest(unittest.TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(workers=2, timeout=0.3)
+        self.application = ASGIApplication(app, self.pool)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_wsgi_bridge(self):
+        status, headers, body = request(self.application, "GET", "/")
+        self.assertEqual(status, 200)
+        self.assertTrue(headers[b"content-type"].startswith(b"text/html"))
+        self.assertIn(b"Scientific calculator", body)
+        status, _, _ = request(self.application, "GET", "/nothing")
+        self.assertEqual(status, 404)
+
+    def test_evaluation(self):
+        status, _, body = post_expression(self.application, "(3+(4-1))*5")
+        self.assertEqual(status, 200)
+        self.assertIn(b"30", body)
+
+    def test_timeout(self):
+        start = time.monotonic()
+        result = self.pool.evaluate(SLOW_EQUATION)
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertEqual(result[:3], (-1, -1, "Error: evaluation took more than 0.3 seconds and was cancelled."))
+        # The killed worker is replaced
+        self.assertEqual(self.pool.evaluate("2+2", timeout=5)[2], "4")
+
+        _, _, body = post_expression(self.application, SLOW_EQUATION)
+        self.assertIn(b"was cancelled", body)
+
+    def test_api(self):
+        # API routes are evaluated on the pool too
+        status, data = post_json(self.application, "/api/batch", [SLOW_EQUATION, "2+2"])
+        self.assertEqual(status, 200)
+        self.assertIn("was cancelled", data[0]["error"]["message"])
+        self.assertEqual(data[1]["result"], "4")
+        status, data = post_json(self.application, "/api/system", ["x + y = 3", "x - y = 1"])
+        self.assertEqual((status, data["result"]), (200, "x = 2, y = 1"))
+        status, data = post_json(self.application, "/api/evaluate_array", {"expression": "x^2", "values": [1, 2]})
+        self.assertEqual((status, data["result"]), (200, [1., 4.]))
+
+    def test_metrics(self):
+        # Metrics collected by workers are served by the server process
+        metrics.enable()
+        try:
+            post_expression(self.application, "2x = 1")
+            post_expression(self.application, "1/0")
+            status, _, body = request(self.application, "GET", "/metrics")
+        finally:
+            metrics.disable()
+            metrics.reset()
+        self.assertEqual(status, 200)
+        text = body.decode()
+        for stage in ("evaluate_infix", "solve", "render"):
+            self.assertIn('calculator_stage_seconds_count{stage="%s"} ' % stage, text)
+        self.assertIn('calculator_input_size_count{unit="characters"} 2', text)
+        self.assertIn('calculator_errors_total{message="Error: division by zero."} 1', text)
+
+    def test_busy(self):
+        pool = WorkerPool(workers=1, timeout=0.3)
+        try:
+            async def both():
+                loop = asyncio.get_running_loop()
+                slow = loop.run_in_executor(None, pool.evaluate, SLOW_EQUATION)
+                await asyncio.sleep(0.05)
+                fast = loop.run_in_executor(None, pool.evaluate, "2+2", 0.1)
+                return await asyncio.gather(slow, fast)
+            slow, fast = asyncio.run(both())
+        finally:
+            pool.shutdown()
+        self.assertIn("cancelled", slow[2])
+        self.assertEqual(fast[2], "Error: the server is busy, try again later.")
+
+if __name__ == "__main__":
+    unittest.main()
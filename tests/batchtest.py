@@ -0,0 +1,96 @@
+import io
+import json
+import os
+import unittest
+
+from batch import BatchEvaluator, evaluate_lines, result_to_dict
+from postfixexpression import Budget
+
+
+class WorkerKiller(str):
+    # An expression which kills the worker process receiving it
+    def __reduce__(self):
+        return os._exit, (1,)
+
+
+class BatchEvaluatorTest(unittest.TestCase):
+    expressions = ["(3+(4-1))*5", "2x + 1 = 2(1-x)", "1/0", "2 +", "x + 1"] * 5
+
+    def test_result_to_dict(self):
+        self.assertEqual(result_to_dict((None, None, "4", "2+2")), {"expression": "2+2", "result": "4"})
+        self.assertEqual(result_to_dict((0, 2, "Error: division by zero.", "1/0")),
+                         {"expression": "1/0", "error": {"message": "Error: division by zero.", "start": 0, "end": 2}})
+
+    def test_inline(self):
+        results = BatchEvaluator(workers=0).evaluate(self.expressions)
+        self.assertEqual(len(results), len(self.expressions))
+        self.assertEqual(results[0], {"expression": "(3+(4-1))*5", "result": "30"})
+        self.assertEqual(results[1]["result"], "x = 0.25")
+        self.assertEqual(results[2]["error"]["start"], 0)
+
+        results = BatchEvaluator(workers=0).evaluate(["2+2", None, "3*3"])
+        self.assertEqual([result.get("result") for result in results], ["4", None, "9"])
+        self.assertTrue(results[1]["error"]["message"].startswith("Something has gone terribly wrong"))
+
+    def test_budget(self):
+        budget = Budget(max_tokens=5, max_depth=None, max_degree=None, max_coefficients=None)
+        for workers in (0, 2):
+            evaluator = BatchEvaluator(workers=workers, chunk_size=1, budget=budget)
+            try:
+                results = evaluator.evaluate(["1 + 2", "1 + 2 + 3 + 4"])
+            finally:
+                evaluator.shutdown()
+            self.assertEqual(results[0], {"expression": "1+2", "result": "3"})
+            self.assertIn("error", results[1])
+
+    def test_process_pool_keeps_order(self):
+        evaluator = BatchEvaluator(workers=2, chunk_size=3)
+        try:
+            self.assertEqual(evaluator.evaluate(self.expressions), BatchEvaluator(workers=0).evaluate(self.expressions))
+        finally:
+            evaluator.shutdown()
+
+    def test_stream(self):
+        expected = BatchEvaluator(workers=0).evaluate(self.expressions)
+        self.assertEqual(list(BatchEvaluator(workers=0, chunk_size=4).stream(iter(self.expressions))), expected)
+        evaluator = BatchEvaluator(workers=2, chunk_size=3)
+        try:
+            self.assertEqual(list(evaluator.stream(iter(self.expressions), max_pending_chunks=1)), expected)
+        finally:
+            evaluator.shutdown()
+
+    def test_stream_killed_worker(self):
+        evaluator = BatchEvaluator(workers=2, chunk_size=1)
+        try:
+            results = list(evaluator.stream(["2+2", WorkerKiller("1"), "3*3", "4*4"]))
+        finally:
+            evaluator.shutdown()
+        self.assertEqual([result.get("result") for result in results], ["4", None, "9", "16"])
+        self.assertIn("error", results[1])
+
+    def test_evaluate_killed_worker(self):
+        evaluator = BatchEvaluator(workers=2, chunk_size=1)
+        try:
+            results = evaluator.evaluate(["2+2", WorkerKiller("1"), "3*3", "4*4"])
+            self.assertEqual([result.get("result") for result in results], ["4", None, "9", "16"])
+            self.assertIn("error", results[1])
+            # The pool is recreated for the next batch
+            self.assertEqual(evaluator.evaluate(["1+1", "2+2"]), BatchEvaluator(workers=0).evaluate(["1+1", "2+2"]))
+        finally:
+            evaluator.shutdown()
+
+    def test_evaluate_lines(self):
+        source = io.StringIO("2+2\r\n2x = 1\n\n1/0")
+        target, progress = io.StringIO(), io.StringIO()
+        self.assertEqual(evaluate_lines(source, target, BatchEvaluator(workers=0), progress), 4)
+        results = [json.loads(line) for line in target.getvalue().splitlines()]
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0], {"expression": "2+2", "result": "4"})
+        self.assertEqual(results[1]["result"], "x = 0.5")
+        self.assertEqual(results[2], {"expression": "",
+                                      "error": {"message": "Error: expression contains nothing", "start": -1, "end": -1}})
+        self.assertEqual(results[3]["error"], {"message": "Error: division by zero.", "start": 0, "end": 2})
+        self.assertTrue(progress.getvalue().startswith("4 expressions in "))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,10 @@
 import random
 import unittest
 
-from calculator import evaluate_infix
+import calculator
+from asgi import PoolFailure
+from calculator import app, evaluate_infix
+from metrics import metrics
 
 
 class CalculatorTest(unittest.TestCase):
@@ -20,6 +23,60 @@ class CalculatorTest(unittest.TestCase):
         exp_output = "x = 0.25"
         self.assertEqual(evaluate_infix(input_string)[2], exp_output)
 
+    def testCase_3a(self):
+        self.assertEqual(evaluate_infix("x*x + 2 = 3x")[2], "x = 1, x = 2")
+        self.assertEqual(evaluate_infix("x*x + 1 = 0")[2], "x = -i, x = i")
+        self.assertEqual(evaluate_infix("(x-1)*(x-1)*(x+3) = 0")[2], "x = -3, x = 1")
+
+    def testCase_3c(self):
+        self.assertEqual(evaluate_infix("(x - 1)^2 = 4")[2], "x = -1, x = 3")
+        self.assertEqual(evaluate_infix("x^3 = 8")[2].split(", ")[0], "x = 2")
+        self.assertEqual(evaluate_infix("10^400")[:3], (0, 5, "Error: the value is too large."))
+        self.assertEqual(evaluate_infix("2*(9999999999^99 - 1)")[:3], (0, 18, "Error: the value is too large."))
+        self.assertEqual(evaluate_infix("x*10^400 = 1")[:3], (2, 7, "Error: the value is too large."))
+        self.assertEqual(evaluate_infix("x*x + 10^200 x + 1 = 0")[2].split(", ")[1], "x = -1e-200")
+        self.assertEqual(evaluate_infix("10^-300 x = 10^300")[2], "Error: roots of the polynomial are too large.")
+        self.assertEqual(evaluate_infix("x^-1 = 2")[2], "x = 0.5")    # Solved numerically
+
+    def testCase_3b(self):
+        self.assertEqual(evaluate_infix("2x + y = y + 1")[2], "x = 0.5")
+        self.assertEqual(evaluate_infix("x*y + x = x*y + 4")[2], "x = 4")
+        self.assertEqual(evaluate_infix("x = y")[2],
+                         "Error: the equation has several variables (x, y), it can't be solved alone.")
+        self.assertEqual(evaluate_infix("+".join("abcdefghijkl") + " = 1")[2],
+                         "Error: the equation has several variables (a, b, c, d, e, f, g, h, i, j, ...), "
+                         "it can't be solved alone.")
+        self.assertEqual(evaluate_infix("x = 1/(x - x)")[:3], (4, 10, "Error: division by zero."))
+
+    def testCase_3e(self):
+        # Equations which aren't polynomial are solved numerically
+        self.assertEqual(evaluate_infix("ln(x) + x = 3")[2], "x = 2.20794003157 (found by a numerical search "
+                                                              "between -1e+06 and 1e+06, other roots may be missed)")
+        self.assertEqual(evaluate_infix("2^x = 8")[2], "x = 3 (found by a numerical search between -1e+06 and "
+                                                       "1e+06, other roots may be missed)")
+        self.assertEqual(evaluate_infix("x^0.5 = 0")[2], "x = 0 (found by a numerical search between -1e+06 and "
+                                                         "1e+06, other roots may be missed)")
+        self.assertEqual(evaluate_infix("2^x = -1")[2], "Error: no real roots were found between -1e+06 and 1e+06, "
+                                                        "but the numerical search may miss some.")
+        # Rational equations are solved as polynomial ones, whatever their roots are
+        self.assertEqual(evaluate_infix("(x - 1)/(x + 1) = 0.5")[2], "x = 3")
+        self.assertEqual(evaluate_infix("(x - 2)*(x - 2)/(x + 5) = 0")[2], "x = 2")
+        self.assertEqual(evaluate_infix("1/(x^2 + 1) = 0.5")[2], "x = -1, x = 1")
+        self.assertEqual(evaluate_infix("1/(x - 1) = 0")[2], "Error: the equation has no roots.")
+        self.assertEqual(evaluate_infix("(x - 1)^2/((x - 1)*(x + 2)) = 0")[2], "Error: the equation has no roots.")
+        self.assertEqual(evaluate_infix("ln(x) + y = 1")[2],
+                         "Error: logarithms are supported only for plain numbers.")
+
+    def testCase_3d(self):
+        self.assertEqual(evaluate_infix("x + y = 3; x - y = 1")[2], "x = 2, y = 1")
+        self.assertEqual(evaluate_infix("x = 1; y = 10^11")[2], "x = 1, y = 100000000000")
+        self.assertEqual(evaluate_infix("x + y = 10^12; x - y = 0")[2], "x = 500000000000, y = 500000000000")
+        self.assertEqual(evaluate_infix("x + y = 1; x + y = 2")[:3],
+                         (9, 15, "Error: equation 2 contradicts the others."))
+        self.assertEqual(evaluate_infix("x*y = 1; x = 2")[:3], (0, 6, "Error: equation 1 isn't linear."))
+        self.assertEqual(evaluate_infix("x + y = 1; 2x + 2y = 2")[2],
+                         "Error: the system is underdetermined, values of (y) may be chosen freely.")
+
     def testCase_4(self):
         possible_chars = list("1234567890-+=*/.,()logn")
         for i in range(10):
@@ -29,5 +86,117 @@ class CalculatorTest(unittest.TestCase):
             evaluate_infix(random_string)
         self.assertTrue(True)
 
+    def testCase_5(self):
+        client = app.test_client()
+        response = client.post("/api/evaluate_array", json={"expression": "2x + 1", "values": [0, 1, 2]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {"expression": "2*x+1", "result": [1., 3., 5.]})
+
+        response = client.post("/api/evaluate_array", json={"expression": "ln(x)", "values": [-1]})
+        self.assertEqual(response.get_json()["result"], [None])
+
+        response = client.post("/api/evaluate_array", json={"expression": "2x +", "values": [0]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"]["start"], 3)
+
+        response = client.post("/api/evaluate_array", json={"expression": "2x"})
+        self.assertEqual(response.status_code, 400)
+
+    def testCase_6(self):
+        client = app.test_client()
+        response = client.post("/api/batch", json=["2+2", "2x = 1", "1/0"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), [{"expression": "2+2", "result": "4"},
+                                               {"expression": "2*x = 1", "result": "x = 0.5"},
+                                               {"expression": "1/0",
+                                                "error": {"message": "Error: division by zero.", "start": 0, "end": 2}}])
+        self.assertEqual(client.post("/api/batch", json={"expression": "2+2"}).status_code, 400)
+        self.assertEqual(client.post("/api/batch", json=[1, 2]).status_code, 400)
+
+    def testCase_7(self):
+        client = app.test_client()
+        metrics.enable()
+        try:
+            client.post("/", data={"expression": "2x = 1"})
+            client.post("/", data={"expression": "1/0"})
+            response = client.get("/metrics")
+        finally:
+            metrics.disable()
+            metrics.reset()
+        self.assertEqual(response.status_code, 200)
+        text = response.get_data(as_text=True)
+        for stage in ("evaluate_infix", "solve", "render"):
+            self.assertIn('calculator_stage_seconds_count{stage="%s"} ' % stage, text)
+        self.assertIn('calculator_input_size_count{unit="characters"} 2', text)
+        self.assertIn('calculator_errors_total{message="Error: division by zero."} 1', text)
+
+    def testCase_8(self):
+        client = app.test_client()
+        response = client.post("/api/session", json={"expression": "2(3"})
+        self.assertEqual(response.status_code, 200)
+        session = response.get_json()["session"]
+        self.assertEqual(response.get_json()["error"]["message"], "Error: unbalanced parentheses.")
+
+        response = client.post("/api/session", json={"expression": "2(3+1)", "session": session})
+        self.assertEqual(response.get_json(), {"expression": "2*(3+1)", "result": "8", "session": session})
+        response = client.post("/api/session", json={"expression": "2(3+1)*x = 1", "session": session})
+        self.assertEqual(response.get_json()["result"], "x = 0.125")
+        response = client.post("/api/session", json={"expression": "2(3+1)/0", "session": "unknown"})
+        self.assertNotEqual(response.get_json()["session"], "unknown")
+        self.assertEqual(response.get_json()["error"]["message"], "Error: division by zero.")
+        self.assertEqual(client.post("/api/session", json=["2"]).status_code, 400)
+        response = client.post("/api/session", json={"expression": "1+" * app.config["SESSION_MAX_LENGTH"]})
+        self.assertEqual(response.status_code, 413)
+
+    def testCase_9(self):
+        client = app.test_client()
+        response = client.post("/api/system", json=["a + b + c = 6", "a - b = 0", "", "c = 4"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {"expression": "a+b+c = 6; a-b = 0; c = 4",
+                                               "result": "a = 1, b = 1, c = 4"})
+        response = client.post("/api/system", json=["x = 1", "x ? 2"])
+        self.assertEqual(response.get_json()["error"],
+                         {"message": "Unallowed symbol detected: ?", "start": 9, "end": 9})
+        self.assertEqual(client.post("/api/system", json="x = 1").status_code, 400)
+
+    def testCase_10(self):
+        client = app.test_client()
+        response = client.get("/evaluate", query_string={"expression": "(3+(4-1))*5"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("30", response.get_data(as_text=True))
+        self.assertEqual(response.cache_control.max_age, app.config["RESPONSE_MAX_AGE"])
+        etag = response.headers["ETag"]
+
+        hits = calculator.responses.hits
+        response = client.get("/evaluate", query_string={"expression": "(3 + (4 - 1)) * 5"})
+        self.assertEqual((response.headers["ETag"], calculator.responses.hits), (etag, hits + 1))
+        response = client.get("/evaluate", query_string={"expression": "(3+(4-1))*5"}, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(client.get("/evaluate", query_string={"expression": "1/0"}).headers["ETag"], etag)
+        self.assertGreater(calculator.responses.weight, 0)
+        self.assertEqual(calculator.responses.maxweight, app.config["RESPONSES_MAX_BYTES"])
+
+        # A page larger than the cache is served, but not kept
+        responses, max_bytes = calculator.responses, app.config["RESPONSES_MAX_BYTES"]
+        calculator.responses, app.config["RESPONSES_MAX_BYTES"] = None, 1000
+        try:
+            response = client.get("/evaluate", query_string={"expression": "+".join(["1"] * 500)})
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("500", response.get_data(as_text=True))
+            self.assertEqual((len(calculator.responses), calculator.responses.weight), (0, 0))
+        finally:
+            calculator.responses, app.config["RESPONSES_MAX_BYTES"] = responses, max_bytes
+
+    def testCase_11(self):
+        # Failures of the server aren't cached
+        client = app.test_client()
+        pool = type("Pool", (), {"evaluate": lambda self, e, budget: PoolFailure((-1, -1, "Error: busy.", e))})()
+        response = client.get("/evaluate", query_string={"expression": "7*6"},
+                              environ_base={"calculator.worker_pool": pool})
+        self.assertIn("Error: busy.", response.get_data(as_text=True))
+        self.assertNotIn("ETag", response.headers)
+        self.assertTrue(response.cache_control.no_store)
+        self.assertIn("42", client.get("/evaluate", query_string={"expression": "7*6"}).get_data(as_text=True))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from codegen import LazyProgram, compile_postfix
+
+callables = {"+": lambda x, y: x + y,
+             "-": lambda x, y: x - y,
+             "*": lambda x, y: x * y,
+             "^": lambda x, y: x ** y,
+             "~": lambda x: -x,
+             "max": lambda x, y: max(x, y)}
+
+
+class CodegenTest(unittest.TestCase):
+    def test_compile_postfix(self):
+        program = compile_postfix(["2", "x", "*", "y", "~", "max", "3", "2", "^", "+"], callables, float, ("x", "y"))
+        self.assertEqual(program(1., 5.), 11.)
+        self.assertEqual(program(4., 1.), 17.)
+        self.assertEqual(compile_postfix(["7"], callables, float)(), 7.)
+        self.assertRaises(ValueError, compile_postfix, ["1", "2"], callables, float)
+
+    def test_deep_program(self):
+        # Right-nested sums keep every operand on the stack, Python's limits on nesting don't apply
+        postfix = ["x"] * 3000 + ["+"] * 2999
+        self.assertEqual(compile_postfix(postfix, callables, float, ("x",))(2.), 6000.)
+
+    def test_lazy_program(self):
+        program = LazyProgram(threshold=2)
+        program.evaluated(lambda: len)
+        self.assertIsNone(program.function)
+        program.evaluated(lambda: len)
+        self.assertIs(program.function, len)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from engine import evaluate_infix, format_number
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+IMPORT_BUDGET = 0.5  # Seconds, generous since the test may run on a loaded machine
+
+
+class EngineTest(unittest.TestCase):
+    def test_evaluate_infix(self):
+        self.assertEqual(evaluate_infix("2(3 + 1)"), (None, None, "8", "2*(3+1)"))
+        self.assertEqual(evaluate_infix("2x = 1")[2], "x = 0.5")
+        self.assertEqual(evaluate_infix("1 # 2")[:3], (2, 2, "Unallowed symbol detected: #"))
+        self.assertEqual(format_number(complex(1, -2)), "1 - 2i")
+
+    def test_import(self):
+        code = ("import sys, time\n"
+                "start = time.perf_counter()\n"
+                "import engine\n"
+                "print(time.perf_counter() - start, 'flask' in sys.modules, 'numpy' in sys.modules)\n")
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True).stdout.split()
+        self.assertLess(float(output[0]), IMPORT_BUDGET)
+        self.assertEqual(output[1:], ["False", "False"])
+
+if __name__ == "__main__":
+    unittest.main()
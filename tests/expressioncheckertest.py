@@ -39,6 +39,35 @@ class ExpressionCheckerTest(unittest.TestCase):
         self.assertEqual(checker.consume_token_array(expr_1), ("Error: several names for variable: a and b.", 2))
         expr_2 = ["log", "(", "2", ",", "a", ")", "+", "(", "b"]
         self.assertEqual(checker.consume_token_array(expr_2), ("Error: several names for variable: a and b.", 8))
+        checker = ExpressionChecker(operators=operators, functions=functions, several_variables=True)
+        self.assertEqual(checker.consume_token_array(expr_1), (None, None))
+        self.assertEqual(checker.consume_token_array(expr_2 + [")"]), (None, None))
+
+    def test_right_associative(self):
+        power_operators = dict(operators, **{"^": lambda x, y: x ** y})
+        precedences = {"+": 0, "-": 0, "*": 1, "/": 1, "~": 2, "^": 3}
+        checker = ExpressionChecker(operators=power_operators, functions=functions, precedences=precedences,
+                                    right_associative=("^",))
+        self.assertEqual(checker.parse(["2", "^", "3", "^", "2"])[0], ["2", "3", "2", "^", "^"])
+        self.assertEqual(checker.parse(["~", "x", "^", "2", "*", "3"])[0], ["x", "2", "^", "~", "3", "*"])
+        self.assertEqual(checker.parse(["2", "^", "~", "x", "^", "2"])[0], ["2", "x", "2", "^", "~", "^"])
+        self.assertEqual(checker.parse(["2", "-", "3", "-", "4"])[0], ["2", "3", "-", "4", "-"])
+
+    def test_relations(self):
+        relation_operators = dict(operators, **{"=": lambda x, y: x - y})
+        precedences = {"=": -1, "+": 0, "-": 0, "*": 1, "/": 1, "~": 2}
+        checker = ExpressionChecker(operators=relation_operators, functions=functions, precedences=precedences,
+                                    relations=("=",))
+        self.assertEqual(checker.parse(["a", "+", "1", "=", "2", "*", "b"])[0], ["a", "1", "+", "2", "b", "*", "="])
+        self.assertEqual(checker.consume_token_array(["a", "+", "b", "=", "1"]), (None, None))
+        self.assertEqual(checker.consume_token_array(["a", "+", "b", "-", "1"]),
+                         ("Error: several names for variable: a and b.", 2))
+        self.assertEqual(checker.consume_token_array(["a", "+", "b", "-", ")"]),
+                         ("Error: several names for variable: a and b.", 2))
+        self.assertEqual(checker.consume_token_array(["a", "=", "1", "=", "2"]),
+                         ("More than one '=' symbols in expression can't be interpreted", 3))
+        self.assertEqual(checker.consume_token_array(["(", "a", "=", "1", ")"]),
+                         ("Error: '=' can't be put inside parentheses.", 2))
 
     def test_two_unary_minus(self):
         checker = ExpressionChecker(operators=operators, functions=functions)
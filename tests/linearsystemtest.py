@@ -0,0 +1,81 @@
+import random
+import unittest
+
+from linearsystem import _solve_dense, _solve_sparse, solve_linear_system
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class LinearSystemTest(unittest.TestCase):
+    def solvers(self):
+        if numpy is not None:
+            yield lambda rows, rhs, columns: _solve_dense(rows, rhs, columns, numpy)
+        yield _solve_sparse
+
+    def test_solve(self):
+        rows = [{0: 1., 1: 1.}, {0: 1., 1: -1.}, {1: 2., 2: 1.}]
+        for solve in self.solvers():
+            solution, inconsistent, free = solve(rows, [3., 1., 5.], 3)
+            self.assertEqual((inconsistent, free), (None, []))
+            for value, expected in zip(solution, [2., 1., 3.]):
+                self.assertAlmostEqual(value, expected)
+
+    def test_inconsistent(self):
+        rows = [{0: 1., 1: 1.}, {0: 2., 1: 2.}, {0: 1.}, {1: 1.}]
+        for solve in self.solvers():
+            self.assertEqual(solve(rows, [1., 2., 0., 0.], 2), (None, 3, []))
+            self.assertEqual(solve([{0: 1.}, {}], [1., 1.], 1), (None, 1, []))
+
+    def test_underdetermined(self):
+        rows = [{0: 1., 1: 1., 2: 1.}, {0: 2., 1: 2., 2: 2.}]
+        for solve in self.solvers():
+            solution, inconsistent, free = solve(rows, [1., 2.], 3)
+            self.assertEqual((solution, inconsistent, len(free)), (None, None, 2))
+            self.assertEqual(solve([{0: 1.}], [1.], 2), (None, None, [1]))
+
+    def test_scaling(self):
+        # Large right-hand sides and coefficients of other rows don't make coefficients look like noise
+        for solve in self.solvers():
+            self.assertEqual(solve([{0: 1.}, {1: 1.}], [1., 1e11], 2), ([1., 1e11], None, []))
+            solution, inconsistent, free = solve([{0: 1., 1: 1.}, {0: 1., 1: -1.}], [1e12, 0.], 2)
+            self.assertEqual((inconsistent, free), (None, []))
+            self.assertAlmostEqual(solution[0] / 5e11, 1.)
+            self.assertEqual(solve([{0: 1e-20}, {1: 1e20}], [1e-20, 1e20], 2), ([1., 1.], None, []))
+            self.assertEqual(solve([{0: 1e12}, {0: 1e12}], [1e12, 1e12 + 1e4], 1), (None, 1, []))
+
+    def test_random(self):
+        random.seed(21)
+        for _ in range(50):
+            size = random.randint(1, 8)
+            expected = [random.randint(-5, 5) for _ in range(size)]
+            rows = [{c: float(random.randint(-3, 3)) for c in random.sample(range(size), random.randint(1, size))}
+                    for _ in range(size)]
+            rhs = [sum(coefficient * expected[c] for c, coefficient in row.items()) for row in rows]
+            results = [solve(rows, rhs, size) for solve in self.solvers()]
+            for solution, inconsistent, free in results:
+                self.assertIsNone(inconsistent)
+                self.assertEqual(len(free), len(results[0][2]))
+                if solution is not None:
+                    for value, x in zip(solution, expected):
+                        self.assertAlmostEqual(value, x)
+
+    def test_large_sparse(self):
+        # x0 = 1, x(i) - x(i-1) = 1: a chain far too large for dense elimination
+        size = 20000
+        rows = [{0: 1.}] + [{i: 1., i - 1: -1.} for i in range(1, size)]
+        solution, inconsistent, free = solve_linear_system(rows, [1.] * size, size)
+        self.assertEqual((inconsistent, free), (None, []))
+        self.assertAlmostEqual(solution[-1], size)
+
+    def test_fill_in_limit(self):
+        random.seed(13)
+        size = 3000
+        rows = [{c: float(random.randint(1, 9)) for c in random.sample(range(size), 4)} for _ in range(size)]
+        self.assertRaises(NotImplementedError, solve_linear_system, rows, [1.] * size, size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from lrucache import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_hits_and_misses(self):
+        cache = LRUCache(maxsize=2)
+        calls = []
+        factory = lambda key: calls.append(key) or key * 2
+        self.assertEqual(cache.get(1, factory), 2)
+        self.assertEqual(cache.get(1, factory), 2)
+        self.assertEqual(calls, [1])
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (1, 1, 0))
+
+    def test_eviction_order(self):
+        cache = LRUCache(maxsize=2)
+        cache.get("a", str.upper)
+        cache.get("b", str.upper)
+        cache.get("a", str.upper)   # "b" is the least recently used now
+        cache.get("c", str.upper)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_discard(self):
+        cache = LRUCache(maxsize=2)
+        cache.get("a", str.upper)
+        cache.discard("a")
+        cache.discard("b")
+        self.assertNotIn("a", cache)
+        self.assertEqual(len(cache), 0)
+
+    def test_disabled(self):
+        cache = LRUCache(maxsize=0)
+        cache.get("a", str.upper)
+        cache.get("a", str.upper)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.misses, 2)
+
+    def test_weight(self):
+        cache = LRUCache(maxsize=10, maxweight=5, weigh=lambda key, value: len(value))
+        cache.get("ab", str.upper)
+        cache.get("cd", str.upper)
+        cache.get("efg", str.upper)     # "ab" is evicted to keep the total weight
+        self.assertNotIn("ab", cache)
+        self.assertEqual((len(cache), cache.weight, cache.evictions), (2, 5, 1))
+        cache.get("abcdef", str.upper)  # Heavier than the whole cache
+        self.assertNotIn("abcdef", cache)
+        self.assertEqual(cache.weight, 5)
+        cache.discard("cd")
+        self.assertEqual(cache.weight, 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from metrics import Histogram, Metrics, NULL_TIMER
+
+
+class MetricsTest(unittest.TestCase):
+    def test_histogram(self):
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 100):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.cumulative_counts()), [(1, 2), (10, 3), (float("inf"), 4)])
+        self.assertEqual((histogram.count, histogram.sum), (4, 106.5))
+
+    def test_disabled(self):
+        metrics = Metrics()
+        self.assertIs(metrics.timer("tokenize"), NULL_TIMER)
+        metrics.observe_size("tokens", 10)
+        metrics.count_error("Error: division by zero.")
+        self.assertNotIn("tokens", metrics.render())
+        self.assertNotIn("division", metrics.render())
+
+    def test_render(self):
+        metrics = Metrics(enabled=True)
+        with metrics.timer("tokenize"):
+            pass
+        metrics.observe_size("tokens", 5)
+        metrics.count_error('Error: expected operand, but ")" is given.')
+        metrics.count_error('Error: expected operand, but ")" is given.')
+        text = metrics.render()
+        self.assertIn('calculator_stage_seconds_count{stage="tokenize"} 1', text)
+        self.assertIn('calculator_input_size_bucket{unit="tokens",le="10.0"} 1', text)
+        self.assertIn('calculator_input_size_bucket{unit="tokens",le="+Inf"} 1', text)
+        self.assertIn('calculator_errors_total{message="Error: expected operand, but \\")\\" is given."} 2', text)
+        self.assertIn("# TYPE calculator_errors_total counter", text)
+
+    def test_error_labels_limit(self):
+        metrics = Metrics(enabled=True, max_error_labels=2)
+        for message in ("a", "b", "c", "d", "a"):
+            metrics.count_error(message)
+        text = metrics.render()
+        self.assertIn('calculator_errors_total{message="a"} 2', text)
+        self.assertIn('calculator_errors_total{message="other"} 2', text)
+
+    def test_merge(self):
+        worker = Metrics(enabled=True)
+        self.assertIsNone(worker.drain())
+        with worker.timer("tokenize"):
+            pass
+        worker.observe_size("tokens", 5)
+        worker.count_error("a")
+        metrics = Metrics(enabled=True)
+        metrics.observe_size("tokens", 50)
+        metrics.merge(worker.drain())
+        self.assertIsNone(worker.drain())
+        text = metrics.render()
+        self.assertIn('calculator_stage_seconds_count{stage="tokenize"} 1', text)
+        self.assertIn('calculator_input_size_bucket{unit="tokens",le="10.0"} 1', text)
+        self.assertIn('calculator_input_size_sum{unit="tokens"} 55.0', text)
+        self.assertIn('calculator_errors_total{message="a"} 1', text)
+
+if __name__ == "__main__":
+    unittest.main()
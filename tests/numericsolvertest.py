@@ -0,0 +1,73 @@
+import math
+import unittest
+
+from numericsolver import Dual, NumericSolver, compile_dual, dual_power, evaluate_rational
+
+
+class NumericSolverTest(unittest.TestCase):
+    def assertDual(self, dual, value, derivative):
+        self.assertAlmostEqual(dual.value, value)
+        self.assertAlmostEqual(dual.derivative, derivative)
+
+    def test_dual(self):
+        x = Dual(2., 1.)
+        self.assertDual(3 * x * x - 1 / x + 1, 12.5, 12.25)
+        self.assertDual((x - 1) / (x + 1), 1 / 3, 2 / 9)
+        self.assertDual(dual_power(x, 0.5), math.sqrt(2), 0.25 * math.sqrt(2))
+        self.assertDual(dual_power(2., x), 4., 4 * math.log(2))
+        self.assertDual(dual_power(x, x), 4., 4 * (math.log(2) + 1))
+        self.assertRaises(ValueError, dual_power, Dual(-8., 1.), 1 / 3)
+        self.assertDual(dual_power(Dual(0., 0.), 0.5), 0., 0.)
+        self.assertEqual(dual_power(Dual(0., 1.), 0.5).derivative, math.inf)
+
+    def test_compile_dual(self):
+        function = compile_dual(["x", "ln", "x", "+", "3", "="], "x")
+        value, derivative = function(1.)
+        self.assertEqual((value, derivative), (-2., 2.))
+        self.assertTrue(all(map(math.isnan, function(-1.))))
+        self.assertTrue(all(map(math.isnan, compile_dual(["1", "x", "/"], "x")(0.))))
+
+    def test_solve(self):
+        roots, defined = NumericSolver.solve(compile_dual(["x", "ln", "x", "+", "3", "="], "x"))
+        self.assertTrue(defined)
+        self.assertEqual(len(roots), 1)
+        self.assertAlmostEqual(math.log(roots[0]) + roots[0], 3., places=10)
+        self.assertEqual(NumericSolver.solve(compile_dual(["x", "2", "^", "4", "="], "x")), ([-2., 2.], True))
+        # A sign change across a pole isn't a root
+        self.assertEqual(NumericSolver.solve(compile_dual(["1", "x", "1", "-", "/"], "x")), ([], True))
+        self.assertEqual(NumericSolver.solve(compile_dual(["x", "ln", "x", "ln", "="], "x")), (None, True))
+        self.assertEqual(NumericSolver.solve(compile_dual(["x", "x", "-", "ln"], "x")), ([], False))
+        # 2^x underflows to 0 far from 0, those points aren't roots
+        self.assertEqual(NumericSolver.solve(compile_dual(["2", "x", "^"], "x")), ([], True))
+
+    def test_solve_extrema(self):
+        # Roots where the function touches zero, close roots and roots at the edge of the domain
+        self.assertEqual(NumericSolver.solve(compile_dual(["x", "ln", "x", "ln", "*"], "x")), ([1.], True))
+        self.assertEqual(NumericSolver.solve(compile_dual(["x", "2", "-", "2", "^", "2", "x", "^", "*"], "x")),
+                         ([2.], True))
+        self.assertEqual(NumericSolver.solve(compile_dual(["x", "1.5", "-", "x", "1.5001", "-", "*", "2", "x", "^",
+                                                           "*"], "x")), ([1.5, 1.5001], True))
+        self.assertEqual(NumericSolver.solve(compile_dual(["x", "0.5", "^"], "x")), ([0.], True))
+
+    def test_evaluate_rational(self):
+        numerator, denominator = evaluate_rational(["x", "1", "-", "x", "1", "+", "/", "0.5", "="], "x", 1000)
+        self.assertEqual((list(numerator.polynomial), list(denominator.polynomial)), ([-1.5, 0.5], [1., 1.]))
+        numerator, denominator = evaluate_rational(["x", "~", "2", "~", "^", "3", "+"], "x", 1000)
+        self.assertEqual((list(numerator.polynomial), list(denominator.polynomial)), ([1., 0., 3.], [0., 0., 1.]))
+        self.assertIsNone(evaluate_rational(["x", "ln", "1", "="], "x", 1000))
+        self.assertIsNone(evaluate_rational(["x", "0.5", "^"], "x", 1000))
+        self.assertIsNone(evaluate_rational(["1", "x", "1", "+", "3", "^", "/"], "x", 2))
+
+    def test_safeguarded_newton(self):
+        calls = []
+
+        def function(x):
+            calls.append(x)
+            return x ** 3 - 2 * x - 5, 3 * x * x - 2
+        root = NumericSolver.safeguarded_newton(function, 2., 3., -1., 16.)
+        self.assertAlmostEqual(root, 2.0945514815423265, places=12)
+        self.assertLess(len(calls), 10)     # Bisection alone would need about 40 steps
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
+import math
+import random
 import unittest
 
-from operand import Operand
+from operand import Operand, _karatsuba_multiply, _schoolbook_multiply
 
 
 class OperandTest(unittest.TestCase):
@@ -63,6 +65,23 @@ class OperandTest(unittest.TestCase):
         result = Operand([0])
         self.assertEqual(op_1 * op_2, result)
 
+    def test_mul_large(self):
+        random.seed(0)
+        for length in (40, 100, 1000):
+            first = [random.randint(-100, 100) for _ in range(length)]
+            second = [random.randint(-100, 100) for _ in range(length // 3 + 1)]
+            expected = _schoolbook_multiply(first, second).tolist()
+            self.assertEqual(_karatsuba_multiply(first, second), expected)
+            self.assertEqual((Operand(first) * Operand(second)).polynomial.tolist(), expected)
+
+    def test_mul_binomial(self):
+        result = Operand([1])
+        for _ in range(50):
+            result = result * Operand([1, 1])
+        self.assertEqual(len(result.polynomial), 51)
+        self.assertEqual(result.polynomial[25], 126410606437752)
+        self.assertAlmostEqual((result * result).polynomial[50] / sum(c * c for c in result.polynomial), 1)
+
     def test_div_trivial(self):
         op_1 = Operand([0, 3, 3])
         op_2 = Operand([3])
@@ -87,6 +106,33 @@ class OperandTest(unittest.TestCase):
         with self.assertRaises(NotImplementedError):
             op_1 / op_2
 
+    def test_divmod(self):
+        quotient, remainder = divmod(Operand([1, 0, 1]), Operand([1, 1]))
+        self.assertEqual(quotient, Operand([-1, 1]))
+        self.assertEqual(remainder, Operand([2]))
+
+        quotient, remainder = divmod(Operand([1, 2]), Operand([0, 0, 1]))
+        self.assertEqual(quotient, Operand([0]))
+        self.assertEqual(remainder, Operand([1, 2]))
+
+    def test_div_remainder(self):
+        with self.assertRaises(NotImplementedError):
+            Operand([0, 1]) / Operand([1, 1])
+        self.assertEqual(Operand([0.3, 0.1]) / Operand([3, 1]), Operand([0.1]))
+
+    def test_div_large(self):
+        random.seed(0)
+        for divisor_length in (3, 40, 300):
+            quotient = Operand([random.randint(-9, 9) for _ in range(500)] + [1])
+            remainder = Operand([random.randint(-9, 9) for _ in range(divisor_length - 1)])
+            for divisor in (Operand([random.randint(-9, 9) for _ in range(divisor_length - 1)] + [1]),
+                            Operand([random.uniform(-0.01, 0.01) for _ in range(divisor_length - 1)] + [1])):
+                result = divmod(quotient * divisor + remainder, divisor)
+                for actual, expected in ((result[0], quotient), (result[1], remainder)):
+                    self.assertEqual(len(actual.polynomial), len(expected.polynomial))
+                    for term, expected_term in zip(actual.polynomial, expected.polynomial):
+                        self.assertAlmostEqual(term, expected_term, places=8)
+
     def test_log_polynomial(self):
         op_1 = Operand([0, 1])
         op_2 = Operand([2])
@@ -108,5 +154,60 @@ class OperandTest(unittest.TestCase):
         self.assertEqual(op_0.varstring("a"), result)
         self.assertEqual(op_0.varstring("a"), op_1.varstring("a"))
 
+    def test_sparse(self):
+        x, y = Operand.variable("x"), Operand.variable("y")
+        self.assertEqual((x + y) * (x - y), Operand.sparse({(("x", 2),): 1, (("y", 2),): -1}))
+        self.assertEqual(x * y - y * x + Operand([2]), Operand([2]))
+        self.assertIsNone((x * y - y * x).terms)  # Constants are dense
+        self.assertEqual(((x + y) * (x + y)).degree, 2)
+        self.assertEqual(((x + y) * (x + y)).size, 3)
+        self.assertEqual((x * x * y + y).variable_names(), ("x", "y"))
+        self.assertEqual((x * y * Operand([2])) / (Operand([4]) * y), x * Operand([0.5]))
+        self.assertRaises(NotImplementedError, lambda: x / y)
+        self.assertRaises(NotImplementedError, lambda: x / (x + y))
+        self.assertRaises(ZeroDivisionError, lambda: x / Operand([0]))
+        self.assertRaises(ValueError, lambda: x + Operand([0, 1]))
+
+    def test_power(self):
+        self.assertEqual(Operand([1, 1]) ** Operand([3]), Operand([1, 3, 3, 1]))          # Binomial
+        self.assertEqual(Operand([0, 0, 2]) ** Operand([3]), Operand([0, 0, 0, 0, 0, 0, 8]))
+        self.assertEqual(Operand([1, 1, 1]) ** Operand([3]), Operand([1, 3, 6, 7, 6, 3, 1]))  # Repeated squaring
+        self.assertEqual(Operand([1, 2]) ** Operand([0]), Operand([1]))
+        self.assertEqual(Operand([4]) ** Operand([-0.5]), Operand([0.5]))
+        self.assertEqual(Operand([10]) ** Operand([400]), Operand([math.inf]))
+        x, y = Operand.variable("x"), Operand.variable("y")
+        self.assertEqual((x + y) ** Operand([2]), x * x + Operand([2]) * x * y + y * y)
+        self.assertEqual((x + y + Operand([1])) ** Operand([3]),
+                         (x + y + Operand([1])) * (x + y + Operand([1])) * (x + y + Operand([1])))
+        self.assertRaises(NotImplementedError, lambda: Operand([0, 1]) ** Operand([-1]))
+        self.assertRaises(NotImplementedError, lambda: Operand([0, 1]) ** Operand([0.5]))
+        self.assertRaises(NotImplementedError, lambda: Operand([2]) ** Operand([0, 1]))
+        self.assertRaises(NotImplementedError, lambda: Operand([-8]) ** Operand([1 / 3]))
+        self.assertRaises(ZeroDivisionError, lambda: Operand([0]) ** Operand([-1]))
+
+    def test_sparse_dense_conversion(self):
+        dense = Operand([1, 0, 3])
+        sparse = dense.to_sparse("x")
+        self.assertEqual(sparse.terms, {(): 1, (("x", 2),): 3})
+        self.assertEqual(sparse.to_dense("x"), dense)
+        self.assertEqual((sparse + Operand.variable("y") - Operand.variable("y")).to_dense("x"), dense)
+        self.assertRaises(ValueError, lambda: (sparse + Operand.variable("y")).to_dense("x"))
+        self.assertIsNone(Operand([5]).to_sparse().terms)
+
+    def test_in_place(self):
+        x, y = Operand.variable("x"), Operand.variable("y")
+        total = x * x + y
+        changed = total
+        changed += x
+        self.assertIs(changed, total)
+        self.assertEqual(changed, x * x + y + x)
+        changed -= x * x
+        self.assertEqual((changed, changed.degree), (y + x, 1))     # The cached degree drops with its term
+        changed -= x + y - Operand([2])
+        self.assertEqual((changed, changed.terms), (Operand([2]), None))
+        dense = Operand([1, 2])
+        dense += Operand([1])
+        self.assertEqual(dense, Operand([2, 2]))
+
 if __name__ == "__main__":
     unittest.main()
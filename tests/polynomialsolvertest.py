@@ -0,0 +1,68 @@
+import cmath
+import math
+import unittest
+
+from polynomialsolver import PolynomialSolver
+
+
+class PolynomialSolverTest(unittest.TestCase):
+    def test_constant(self):
+        self.assertEqual(PolynomialSolver.solve([3]), [[3, 0]])
+
+    def test_linear(self):
+        self.assertEqual(PolynomialSolver.solve([-1, 4]), [[0.25, 1]])
+
+    def test_quadratic(self):
+        self.assertEqual(PolynomialSolver.solve([-4, 0, 1]), [[-2., 1], [2., 1]])
+        self.assertEqual(PolynomialSolver.solve([5, 2, 1]), [[complex(-1, -2), 1], [complex(-1, 2), 1]])
+        self.assertEqual(PolynomialSolver.solve([0, 0, 3]), [[0., 1], [0., 1]])
+        # b^2 overflows, the discriminant is computed scaled
+        self.assertEqual(PolynomialSolver.solve([1e200, 1e200, 1]), [[-1e200, 1], [-1., 1]])
+        self.assertEqual(PolynomialSolver.solve([1, 1e200, 1e200]), [[-1., 1], [-1e-200, 1]])
+
+    def test_cubic(self):
+        roots = [root for root, _ in PolynomialSolver.solve([-6, 11, -6, 1])]
+        self.assertEqual(roots, [1., 2., 3.])
+
+    def test_multiple_roots(self):
+        # (x - 1)^5 (x + 2)
+        roots = [root for root, _ in PolynomialSolver.solve([-2, 9, -15, 10, 0, -3, 1])]
+        self.assertEqual(roots, [-2., 1., 1., 1., 1., 1.])
+
+    def test_high_multiplicity(self):
+        # (x + 1)^10 (x - 2) and (x - 1)^8 (x + 2)^3
+        roots = [root for root, _ in PolynomialSolver.solve([-2, -19, -80, -195, -300, -294, -168, -30, 30, 25, 8, 1])]
+        self.assertEqual(sorted(set(roots)), [-1., 2.])
+        roots = [root for root, _ in PolynomialSolver.solve([8, -52, 134, -159, 48, 84, -84, 6, 24, -8, -2, 1])]
+        self.assertEqual(sorted(set(roots)), [-2., 1.])
+
+    def test_power(self):
+        coefficients = [float(math.comb(999, i)) * 0.5 ** (999 - i) for i in range(1000)]
+        self.assertEqual(PolynomialSolver.solve(coefficients), [[-0.5, 1]] * 999)
+        self.assertIsNone(PolynomialSolver.solve_power([-1, 0, 0, 1]))
+
+    def test_inaccurate(self):
+        # (x + 1)^999 (x - 1): the 999 approximations of -1 form a circle where the polynomial doesn't vanish
+        binomials = [0.] + [float(math.comb(999, i)) for i in range(1000)] + [0.]
+        coefficients = [lower - higher for lower, higher in zip(binomials, binomials[1:])]
+        with self.assertRaises(NotImplementedError):
+            PolynomialSolver.solve(coefficients)
+
+    def test_high_degree(self):
+        degree = 600
+        roots = [root for root, _ in PolynomialSolver.solve([-1] + [0] * (degree - 1) + [1])]
+        self.assertEqual(len(roots), degree)
+        for root in roots:
+            self.assertAlmostEqual(abs(root), 1, places=9)
+        self.assertEqual(len(set(round(cmath.phase(root), 6) for root in roots)), degree)
+
+    def test_overflow(self):
+        with self.assertRaises(NotImplementedError):
+            PolynomialSolver.solve([1., float("inf"), 1.])
+        # Roots beyond the range of floats
+        self.assertRaises(NotImplementedError, PolynomialSolver.solve, [1e300, 1e-300])
+        self.assertRaises(NotImplementedError, PolynomialSolver.solve, [1., 1e300, 1e-300])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,8 @@
 import unittest
 
+from lrucache import LRUCache
 from operand import Operand
-from postfixexpression import PostfixExpression
+from postfixexpression import Budget, PostfixExpression, UNLIMITED_BUDGET
 
 
 class PostfixExpressionTest(unittest.TestCase):
@@ -111,5 +112,176 @@ class PostfixExpressionTest(unittest.TestCase):
         self.assertEqual(expr_5.error_place, (0, 43))
         self.assertIsNone(expr_5.result)
 
+    def test_div_remainder(self):
+        expr_1 = PostfixExpression("2 + 6a/(a+1)")
+        self.assertEqual(expr_1.error_msg, "Error: division of polynomials leaves a remainder [-6.0], "
+                                           "rational functions aren't implemented yet.")
+        self.assertEqual(expr_1.error_place, (2, 10))
+        self.assertIsNone(expr_1.result)
+
+        expr_2 = PostfixExpression("(a*a - 1)/(a + 1)")
+        self.assertEqual(expr_2.result, Operand([-1, 1]))
+
+    def test_tokens(self):
+        expr_1 = PostfixExpression("-2a(a(1.5)) + ln (2)")
+        self.assertEqual(expr_1.plan.tokens, ("~", "2", "*", "a", "*", "(", "a", "*", "(", "1.5", ")", ")",
+                                              "+", "ln", "(", "2", ")"))
+        self.assertEqual(expr_1.plan.token_places[9], (9, 11))
+        self.assertEqual(expr_1.interpreted_expression, "-2*a*(a*(1.5))+ln(2)")
+        self.assertEqual(expr_1.result.polynomial[2], -3)
+
+        expr_2 = PostfixExpression("(-3, -(2")
+        self.assertEqual(expr_2.plan.tokens, ("(", "~", "3", ",", "-", "(", "2"))
+
+    def test_constant_folding(self):
+        expr_1 = PostfixExpression("3*log(2(1+1),16)*a - 2")
+        self.assertEqual(expr_1.plan.postfix, ("6.0", "a", "*", "2", "-"))
+        self.assertEqual(expr_1.plan.postfix_places[0], (0, 15))
+        self.assertEqual(expr_1.result, Operand([-2, 6]))
+
+        expr_2 = PostfixExpression("1*(a+0)/1 - 0")
+        self.assertEqual(expr_2.plan.postfix, ("a",))
+        self.assertEqual(expr_2.result, Operand([0, 1]))
+
+        expr_3 = PostfixExpression("log(2, a*1)")
+        self.assertEqual(expr_3.plan.postfix, ("2", "a", "log"))
+        self.assertEqual(expr_3.error_place, (4, 8))
+
+        expr_4 = PostfixExpression("(a + 1/0)*1")
+        self.assertEqual(expr_4.error_msg, "Error: division by zero.")
+        self.assertEqual(expr_4.error_place, (3, 5))
+
+    def test_plan_cache(self):
+        cache = LRUCache(maxsize=8)
+        expr_1 = PostfixExpression("2a + log(2, 8)", plan_cache=cache)
+        expr_2 = PostfixExpression("2a + log(2, 8)", plan_cache=cache)
+        self.assertIs(expr_1.plan, expr_2.plan)
+        self.assertEqual(expr_2.result, Operand([3, 2]))
+        self.assertEqual(expr_2.varname, "a")
+        self.assertEqual(expr_2.interpreted_expression, "2*a+log(2,8)")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        expr_3 = PostfixExpression("1/0", plan_cache=cache)
+        expr_4 = PostfixExpression("1/0", plan_cache=cache)
+        self.assertEqual(expr_4.error_msg, "Error: division by zero.")
+        self.assertEqual(expr_4.error_place, expr_3.error_place)
+
+        expr_5 = PostfixExpression("((1)", plan_cache=cache)
+        expr_6 = PostfixExpression("((1)", plan_cache=cache)
+        self.assertEqual(expr_6.error_msg, "Error: unbalanced parentheses.")
+        self.assertEqual(expr_6.error_place, expr_5.error_place)
+        self.assertIsNone(expr_6.result)
+
+    def test_compiled_plan(self):
+        cache = LRUCache(maxsize=8)
+        for expr in ["2x + 3(x - 1)*(x + 2) - ln(2)*x", "(x + 1)^3 - log(2, 8)", "(x + y)^2 - 2x*y"]:
+            interpreted = PostfixExpression(expr, plan_cache=cache, several_variables=True)
+            self.assertIsNone(interpreted.plan.program.function)
+            PostfixExpression(expr, plan_cache=cache, several_variables=True)
+            compiled = PostfixExpression(expr, plan_cache=cache, several_variables=True)
+            self.assertIsNotNone(compiled.plan.program.function)
+            self.assertEqual(compiled.result, interpreted.result)
+            self.assertEqual((compiled.varname, compiled.variables), (interpreted.varname, interpreted.variables))
+        # Plans failing in evaluation are never compiled, errors keep their places
+        for _ in range(3):
+            expression = PostfixExpression("x + 1/(x - x)", plan_cache=cache)
+            self.assertEqual(expression.get_error(), ("Error: division by zero.", (2, 8)))
+        self.assertIsNone(expression.plan.program.function)
+
+    def test_budget(self):
+        expr_1 = PostfixExpression("1 + 2 + 3 + 4", budget=Budget(5, None, None, None))
+        self.assertEqual(expr_1.error_msg, "Error: the expression is too long (more than 5 tokens).")
+        self.assertEqual(expr_1.error_place, (5, 6))
+        self.assertEqual(expr_1.interpreted_expression, "1+2+3+4")
+
+        budget = Budget(None, 2, None, None)
+        expr_2 = PostfixExpression("((((1))))", budget=budget)
+        self.assertEqual(expr_2.error_msg, "Error: parentheses are nested too deep (more than 2 levels).")
+        self.assertEqual(expr_2.error_place, (2, 2))
+        self.assertEqual(PostfixExpression("ln(ln(ln(x)))", budget=budget).error_place, (8, 8))
+
+        expr_3 = PostfixExpression("x*x*(x*x)", budget=Budget(None, None, 3, None))
+        self.assertEqual(expr_3.error_msg, "Error: the degree of the polynomial exceeds 3.")
+        self.assertEqual(expr_3.error_place, (0, 8))
+
+        expr_4 = PostfixExpression("x*x+(x*x)", budget=Budget(None, None, None, 5))
+        self.assertEqual(expr_4.error_msg, "Error: the polynomials have more than 5 coefficients.")
+        self.assertEqual(expr_4.error_place, (5, 7))
+        self.assertEqual(PostfixExpression("x*x+(x*x)", budget=Budget(None, None, None, 6)).result,
+                         Operand([0, 0, 2]))
+
+    def test_budget_cache_key(self):
+        cache = LRUCache(maxsize=8)
+        expr = "1+2+3"
+        self.assertIsNotNone(PostfixExpression(expr, plan_cache=cache, budget=Budget(3, None, None, None)).error_msg)
+        self.assertIsNone(PostfixExpression(expr, plan_cache=cache, budget=UNLIMITED_BUDGET).error_msg)
+        self.assertEqual(len(cache), 2)
+
+    def test_incremental(self):
+        session = PostfixExpression("", incremental=True)
+        self.assertEqual(session.error_msg, "Error: expression contains nothing")
+        edits = ["2", "2x", "2x(", "2x(1", "2x(1 +", "2x(1 + x)", "2x(1 + x) / 0", "2x(1 + x) / 2",
+                 "2x(3 + x) / 2", "ln(2x(3 + x) / 2", "-2x(3 + x) / 2 - 1", "2x(3 + x) / 2 - log(2, 8)", "y - 1"]
+        for edit in edits:
+            session.update(edit)
+            expected = PostfixExpression(edit)
+            self.assertEqual(session.interpreted_expression, expected.interpreted_expression)
+            self.assertEqual(session.get_error(), expected.get_error())
+            self.assertEqual(session.result, expected.result)
+            self.assertEqual(session.varname, expected.varname)
+        self.assertEqual(session.result, Operand([-1, 1]))
+
+    def test_power(self):
+        self.assertEqual(PostfixExpression("2^3^2").result, Operand([512]))
+        self.assertEqual(PostfixExpression("-2^2").result, Operand([-4]))
+        self.assertEqual(PostfixExpression("2^-1").result, Operand([0.5]))
+        self.assertEqual(PostfixExpression("2(x + 1)^2").result, Operand([2, 4, 2]))
+        self.assertEqual(PostfixExpression("x^1").plan.postfix, ("x",))
+        self.assertEqual(PostfixExpression("1 + x^-1").get_error(),
+                         ("Error: polynomials may be raised only to non-negative integer powers.", (2, 5)))
+        self.assertEqual(PostfixExpression("(x + 1)^0.5").get_error(),
+                         ("Error: polynomials may be raised only to non-negative integer powers.", (0, 8)))
+        self.assertEqual(PostfixExpression("2^x").get_error(),
+                         ("Error: exponents must be numbers, not polynomials.", (0, 2)))
+        self.assertEqual(PostfixExpression("x^1001").get_error(), ("Error: the degree of the polynomial exceeds 1000.",
+                                                                   (0, 5)))
+
+    def test_several_variables(self):
+        self.assertIsNotNone(PostfixExpression("x*y + 1").error_msg)
+        expression = PostfixExpression("(x + y)*(x - y) + 2y*y", several_variables=True)
+        self.assertIsNone(expression.error_msg)
+        self.assertEqual(expression.result, Operand.sparse({(("x", 2),): 1, (("y", 2),): 1}))
+        self.assertEqual((expression.varname, expression.variables), ("x", ("x", "y")))
+        # One variable is evaluated densely
+        self.assertEqual(PostfixExpression("(x + 1)*(x + 1)", several_variables=True).result, Operand([1, 2, 1]))
+        self.assertEqual(PostfixExpression("x/y", several_variables=True).get_error(),
+                         ("Error: negative degrees aren't implemented yet.", (0, 2)))
+        self.assertEqual(PostfixExpression("x*x*x*y", several_variables=True, budget=Budget(None, None, 3, None))
+                         .get_error(), ("Error: the degree of the polynomial exceeds 3.", (0, 6)))
+
+    def test_equation(self):
+        expression = PostfixExpression("2x+1=x")
+        self.assertTrue(expression.is_equation)
+        self.assertEqual(expression.interpreted_expression, "2*x+1 = x")
+        self.assertEqual(expression.result, Operand([1, 1]))
+        self.assertFalse(PostfixExpression("2x+1").is_equation)
+        # Equations aren't folded to constants and may have several variables
+        self.assertTrue(PostfixExpression("1 = 1").is_equation)
+        self.assertEqual(PostfixExpression("x + y = y + 1").result, Operand.sparse({(("x", 1),): 1, (): -1}))
+        self.assertEqual(PostfixExpression("x = -1/0").get_error(), ("Error: division by zero.", (4, 7)))
+        self.assertEqual(PostfixExpression("x = 1 = 2").get_error(),
+                         ("More than one '=' symbols in expression can't be interpreted", (6, 6)))
+        self.assertEqual(PostfixExpression("2(x = 1)").get_error(),
+                         ("Error: '=' can't be put inside parentheses.", (5, 5)))
+
+        expression = PostfixExpression("x = 1", incremental=True)
+        expression.update("x = y + 1")
+        self.assertEqual(expression.result, Operand.sparse({(("x", 1),): 1, (("y", 1),): -1, (): -1}))
+        expression.update("x = y")
+        self.assertEqual(expression.interpreted_expression, "x = y")
+        self.assertEqual(expression.result, Operand.sparse({(("x", 1),): 1, (("y", 1),): -1}))
+        expression.update("x + y")
+        self.assertEqual(expression.error_msg, "Error: several names for variable: x and y.")
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,39 @@
+import math
+import unittest
+
+import numpy
+
+from vectorized import evaluate_array, horner
+
+
+class VectorizedTest(unittest.TestCase):
+    def test_horner(self):
+        values = numpy.array([0., 1., 2.])
+        self.assertEqual(horner([1, 2, 3], values).tolist(), [1., 6., 17.])
+        self.assertEqual(horner([5], values).tolist(), [5., 5., 5.])
+
+    def test_polynomial(self):
+        err_start, _, result, expression = evaluate_array("3x + log(2, 8)", [0, 1, 2.5])
+        self.assertIsNone(err_start)
+        self.assertEqual(expression, "3*x+log(2,8)")
+        self.assertEqual(result.tolist(), [3., 6., 10.5])
+
+    def test_constant(self):
+        self.assertEqual(evaluate_array("2(1+1)", [1, 2])[2].tolist(), [4., 4.])
+
+    def test_not_polynomial(self):
+        err_start, _, result, _ = evaluate_array("ln(x) + 1/x", [1, math.e, -1])
+        self.assertIsNone(err_start)
+        self.assertAlmostEqual(result[0], 1)
+        self.assertAlmostEqual(result[1], 1 + 1 / math.e)
+        self.assertTrue(math.isnan(result[2]))
+        self.assertEqual(evaluate_array("x^-1 + ln(x)^2", [1, 2])[2].tolist(), [1, 0.5 + math.log(2) ** 2])
+
+    def test_errors(self):
+        self.assertEqual(evaluate_array("1/0 + x", [1]), (0, 2, "Error: division by zero.", "1/0+x"))
+        self.assertEqual(evaluate_array("x + $", [1])[:3], (4, 4, "Unallowed symbol detected: $"))
+        self.assertEqual(evaluate_array("x = 1", [1])[:2], (2, 2))
+        self.assertEqual(evaluate_array("(x", [1])[2], "Error: unbalanced parentheses.")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import numpy
+
+from engine import pat_unallowed_equation
+from postfixexpression import DEFAULT_BUDGET, PostfixExpression, plan_cache
+
+operators = {"+": numpy.add,
+             "-": numpy.subtract,
+             "*": numpy.multiply,
+             "/": numpy.true_divide,
+             "^": numpy.power,
+             "~": numpy.negative}
+
+functions = {"log": lambda x, y: numpy.log(y) / numpy.log(x),
+             "ln": numpy.log}
+
+arities = {"+": 2, "-": 2, "*": 2, "/": 2, "^": 2, "~": 1, "log": 2, "ln": 1}
+
+
+def horner(polynomial, values):
+    """
+    Evaluates a polynomial for every value of an array
+    :param polynomial: array of coefficients, the lowest degree first
+    :param values: numpy array
+    :return: numpy array of the same shape as values
+    """
+    result = numpy.full(values.shape, float(polynomial[-1]))
+    for coefficient in reversed(polynomial[:-1]):
+        result *= values
+        result += coefficient
+    return result
+
+
+def evaluate_postfix(plan, values):
+    """
+    Walks a postfix program applying every operation to whole arrays
+    :param plan: a correct ExpressionPlan
+    :param values: numpy array of the variable values
+    :return: numpy array, invalid operations (like log of a negative number) give nan
+    """
+    stack = []
+    with numpy.errstate(all="ignore"):
+        for element in plan.postfix:
+            if element in operators or element in functions:
+                function = operators[element] if element in operators else functions[element]
+                argcount = arities[element]
+                operands = stack[-argcount:]
+                del stack[-argcount:]
+                stack.append(function(*operands))
+            elif element == plan.varname:
+                stack.append(values)
+            else:
+                stack.append(float(element))
+    return numpy.broadcast_to(numpy.asarray(stack[0], dtype=float), values.shape).copy()
+
+
+def evaluate_array(expression, values, budget=DEFAULT_BUDGET):
+    """
+    Evaluates an expression with (at most) one variable for every value of an array.
+    Polynomials are evaluated with Horner's scheme, anything else (e.g. logarithms of the variable)
+    is evaluated by walking the postfix program elementwise, so points where the expression
+    is undefined give nan or inf. Errors in constant subexpressions are reported as usual
+    :param expression: string representing an infix expression
+    :param values: array-like of the variable values
+    :param budget: a Budget of the expression
+    :return: err_start, err_end, message, interpreted expression in case of any error,
+    None, None, numpy array of results, interpreted_expression otherwise
+    """
+    values = numpy.asarray(values, dtype=float)
+
+    match = pat_unallowed_equation.search(expression)  # No systems (';') here
+    if match is not None:
+        pos = match.start()
+        return pos, pos, "Unallowed symbol detected: %s" % expression[pos], expression
+    if "=" in expression:
+        pos = expression.index("=")
+        return pos, pos, "Equations can't be evaluated for an array of values.", expression
+
+    postfix_expression = PostfixExpression(expression, plan_cache=plan_cache, budget=budget)
+    interpreted_expression = postfix_expression.interpreted_expression
+    if postfix_expression.error_msg is None:
+        return None, None, horner(postfix_expression.result.polynomial, values), interpreted_expression
+
+    plan = postfix_expression.plan
+    pos = postfix_expression.error_place
+    if plan.error_msg is None and any(token == plan.varname and pos[0] <= start and end <= pos[1]
+                                      for token, (start, end) in zip(plan.tokens, plan.token_places)):
+        # The failed subexpression depends on the variable, i.e. the result isn't a polynomial
+        # (like 1/x or ln(x)), so it is computed pointwise
+        return None, None, evaluate_postfix(plan, values), interpreted_expression
+    pos = pos if pos != (None, None) else (-1, -1)
+    return pos[0], pos[1], postfix_expression.error_msg, interpreted_expression